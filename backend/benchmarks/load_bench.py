@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+"""
+엔드투엔드 부하 벤치마크
+
+/api/chat/qna, /api/chat/compare, /api/chat/rag, /api/chat/embed, /api/quality/pipeline 을 목표 동시성으로 호출하고
+엔드포인트별 처리량(req/s), p50/p95/p99 지연, 오류 수를 보고한다.
+- JSON 응답 엔드포인트(qna / compare / rag / embed)는 첫 바이트까지의 시간(TTFB)을 보고한다.
+  본문을 한 번에 보내므로 사실상 전체 지연과 같다.
+- pipeline은 NDJSON 스트림이므로 첫 token 이벤트까지의 시간(TTFT)을 보고한다.
+  서버의 QUALITY_DRAFT_MODEL로 초안을 만든다 (--in-process에서는 --model 값).
+
+오프라인(CPU) 실행 - 가짜 모델/임베딩으로 백엔드 자체 오버헤드만 측정:
+    python benchmarks/load_bench.py --in-process --concurrency 16 --requests 200
+
+실행 중인 서버 대상:
+    python benchmarks/load_bench.py --base-url http://localhost:8001 --model mock
+
+회귀 검사 - 이전 결과 대비 p95가 20% 이상 느려지거나 처리량이 20% 이상 줄면 종료 코드 1:
+    python benchmarks/load_bench.py --in-process --output result.json --baseline baseline.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from pdf_fixture import sample_pdf  # noqa: E402
+
+
+ENDPOINTS = ["qna", "compare", "rag", "embed", "pipeline"]
+# 스트리밍 엔드포인트 - 첫 token 이벤트까지의 시간(TTFT)을 잰다 (나머지는 첫 바이트까지의 시간, TTFB)
+STREAMING_ENDPOINTS = {"pipeline"}
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(name: str, latencies: List[float], firsts: List[float], errors: int, elapsed: float) -> Dict:
+    first_key = "ttft_ms" if name in STREAMING_ENDPOINTS else "ttfb_ms"
+    return {
+        "endpoint": name,
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p95": round(percentile(latencies, 95) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+        },
+        first_key: {
+            "p50": round(percentile(firsts, 50) * 1000, 2),
+            "p95": round(percentile(firsts, 95) * 1000, 2),
+            "p99": round(percentile(firsts, 99) * 1000, 2),
+        },
+    }
+
+
+class LoadTest:
+    def __init__(self, base_url: str, model: str, use_openai: bool, concurrency: int, requests: int, timeout: float):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.use_openai = use_openai
+        self.concurrency = concurrency
+        self.requests = requests
+        self.timeout = timeout
+        self.pdf = sample_pdf()
+        self.rag_key: Optional[str] = None
+
+    def build_request(self, endpoint: str, i: int) -> Dict:
+        message = f"벤치마크 질문 {i % 50}: topic {i % 17}에 대해 설명해주세요."
+        flag = "true" if self.use_openai else "false"
+        if endpoint == "qna":
+            return {"json": {
+                "message": message,
+                "tab_type": "qna",
+                "conversation_history": [],
+                "use_openai": self.use_openai,
+                "select_model": self.model,
+                "conversation_id": f"bench_qna_{i % self.concurrency}",
+            }}
+        if endpoint == "compare":
+            return {"data": {
+                "message": message,
+                "conversationId": f"bench_compare_{i % self.concurrency}",
+                "conversationHistory": "[]",
+                "selectedModel": self.model,
+                "useOpenAI": flag,
+            }}
+        if endpoint == "rag":
+            return {"data": {
+                "message": message,
+                "useOpenAI": flag,
+                "selectedModel": self.model,
+                "conversationId": f"bench_rag_{i % self.concurrency}",
+                "conversationHistory": "[]",
+                "ragKey": self.rag_key or "",
+            }}
+        if endpoint == "pipeline":
+            return {"data": {
+                "message": message,
+                "conversationId": "",
+                "conversationHistory": "[]",
+                "enhance": "false",
+            }}
+        return {"files": [("files", (f"bench_{i}.pdf", self.pdf, "application/pdf"))]}
+
+    async def one(self, client: httpx.AsyncClient, endpoint: str, i: int):
+        """요청 1건 - (전체 지연, 첫 응답 지연(TTFB 또는 스트리밍은 TTFT), 성공 여부, 응답 본문)"""
+        started = time.perf_counter()
+        first = None
+        ok = True
+        body = bytearray()
+        path = "/api/quality/pipeline" if endpoint == "pipeline" else f"/api/chat/{endpoint}"
+        async with client.stream("POST", f"{self.base_url}{path}", **self.build_request(endpoint, i)) as response:
+            if endpoint in STREAMING_ENDPOINTS:
+                async for line in response.aiter_lines():
+                    body += f"{line}\n".encode("utf-8")
+                    if not line.strip() or response.status_code != 200:
+                        continue
+                    event = json.loads(line)
+                    if event.get("type") == "token" and first is None:
+                        first = time.perf_counter() - started
+                    elif event.get("type") == "error":
+                        ok = False
+            else:
+                async for chunk in response.aiter_bytes():
+                    if first is None:
+                        first = time.perf_counter() - started
+                    body += chunk
+        latency = time.perf_counter() - started
+        return latency, first if first is not None else latency, ok and response.status_code == 200, bytes(body)
+
+    async def prepare_rag(self, client: httpx.AsyncClient):
+        """rag 부하 테스트에 사용할 인덱스를 한 번 만든다"""
+        _, _, ok, body = await self.one(client, "embed", 0)
+        if not ok:
+            raise RuntimeError(f"임베딩 준비 실패: {body[:200]!r}")
+        self.rag_key = json.loads(body)["rag_key"]
+        print(f"RAG 인덱스 준비 완료: {self.rag_key}")
+
+    async def run_endpoint(self, client: httpx.AsyncClient, endpoint: str, requests: int) -> Dict:
+        latencies, firsts = [], []
+        errors = 0
+        counter = iter(range(requests))
+        lock = asyncio.Lock()
+
+        async def worker():
+            nonlocal errors
+            while True:
+                async with lock:
+                    i = next(counter, None)
+                if i is None:
+                    return
+                try:
+                    latency, first, ok, _ = await self.one(client, endpoint, i)
+                except httpx.HTTPError as e:
+                    print(f"[{endpoint}] 요청 실패: {e}")
+                    errors += 1
+                    continue
+                if ok:
+                    latencies.append(latency)
+                    firsts.append(first)
+                else:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+        return summarize(endpoint, latencies, firsts, errors, time.perf_counter() - started)
+
+    async def run(self, endpoints: List[str], embed_requests: int) -> Dict:
+        limits = httpx.Limits(max_connections=self.concurrency * 2, max_keepalive_connections=self.concurrency * 2)
+        async with httpx.AsyncClient(timeout=self.timeout, limits=limits) as client:
+            if "rag" in endpoints:
+                await self.prepare_rag(client)
+            results = []
+            for endpoint in endpoints:
+                requests = embed_requests if endpoint == "embed" else self.requests
+                print(f"▶ {endpoint}: {requests} requests @ concurrency {self.concurrency}")
+                result = await self.run_endpoint(client, endpoint, requests)
+                print(json.dumps(result, ensure_ascii=False))
+                results.append(result)
+        return {
+            "config": {
+                "base_url": self.base_url,
+                "model": self.model,
+                "concurrency": self.concurrency,
+                "requests": self.requests,
+                "embed_requests": embed_requests,
+            },
+            "results": results,
+        }
+
+
+def start_in_process_server(model: str) -> str:
+    """가짜 모델/임베딩 설정으로 앱을 같은 프로세스의 백그라운드 스레드에서 실행"""
+    os.environ.setdefault("EMBEDDING_MODEL", "mock")
+    # 벤치마크가 실제 인덱스 / 카탈로그 / PDF 캐시 / 대화 DB를 건드리지 않도록 모두 임시 경로로 분리
+    data_dir = tempfile.mkdtemp(prefix="bench_data_")
+    os.environ.setdefault("VECTOR_DIR", os.path.join(data_dir, "vectors"))
+    os.makedirs(os.environ["VECTOR_DIR"], exist_ok=True)
+    os.environ.setdefault("VECTOR_CATALOG_DB", os.path.join(data_dir, "vector_catalog.db"))
+    os.environ.setdefault("PDF_TEXT_CACHE_DIR", os.path.join(data_dir, "pdf_text_cache"))
+    os.environ.setdefault("CONVERSATION_DB", os.path.join(data_dir, "conversations.db"))
+    # 백그라운드 요약도 가짜 모델로 - 오프라인 벤치마크가 실제 OpenAI를 호출하지 않도록
+    os.environ.setdefault("SUMMARY_MODEL", "mock")
+    # pipeline 엔드포인트의 초안 / 향상 모델도 가짜 모델로
+    os.environ.setdefault("QUALITY_DRAFT_MODEL", model)
+    os.environ.setdefault("QUALITY_ENHANCE_MODEL", model)
+    os.environ.setdefault("LLM_MAX_CONCURRENCY_PER_MODEL", "64")
+    os.environ.setdefault("LLM_QUEUE_MAX", "1024")
+    os.chdir(BACKEND_DIR)
+
+    import uvicorn
+    from main import app
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}"
+
+
+def check_regression(current: Dict, baseline: Dict, max_regression: float) -> List[str]:
+    failures = []
+    previous = {r["endpoint"]: r for r in baseline.get("results", [])}
+    for result in current["results"]:
+        old = previous.get(result["endpoint"])
+        if not old:
+            continue
+        if old["latency_ms"]["p95"] and result["latency_ms"]["p95"] > old["latency_ms"]["p95"] * (1 + max_regression):
+            failures.append(f"{result['endpoint']}: p95 {old['latency_ms']['p95']}ms -> {result['latency_ms']['p95']}ms")
+        if old["throughput_rps"] and result["throughput_rps"] < old["throughput_rps"] * (1 - max_regression):
+            failures.append(f"{result['endpoint']}: throughput {old['throughput_rps']} -> {result['throughput_rps']} req/s")
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Chat Backend 부하 벤치마크")
+    parser.add_argument("--base-url", default="http://localhost:8001")
+    parser.add_argument("--in-process", action="store_true", help="가짜 모델로 앱을 같은 프로세스에서 실행 (오프라인)")
+    parser.add_argument("--endpoints", default=",".join(ENDPOINTS), help="쉼표로 구분된 엔드포인트 목록")
+    parser.add_argument("--model", default="mock", help="selectedModel 값 (예: mock, mock:latency=50,tps=200)")
+    parser.add_argument("--use-openai", action="store_true")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="엔드포인트별 요청 수")
+    parser.add_argument("--embed-requests", type=int, default=10, help="/embed 요청 수 (무거우므로 별도 지정)")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    parser.add_argument("--baseline", help="회귀 비교용 이전 결과 JSON")
+    parser.add_argument("--max-regression", type=float, default=0.2)
+    args = parser.parse_args()
+
+    endpoints = [e.strip() for e in args.endpoints.split(",") if e.strip()]
+    unknown = set(endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"알 수 없는 엔드포인트: {', '.join(sorted(unknown))}")
+
+    base_url = start_in_process_server(args.model) if args.in_process else args.base_url
+    load_test = LoadTest(base_url, args.model, args.use_openai, args.concurrency, args.requests, args.timeout)
+    report = asyncio.run(load_test.run(endpoints, args.embed_requests))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            failures = check_regression(report, json.load(f), args.max_regression)
+        if failures:
+            print("❌ 성능 회귀 감지:")
+            for failure in failures:
+                print(f"  - {failure}")
+            sys.exit(1)
+        print("✅ 기준 대비 회귀 없음")
+
+
+if __name__ == "__main__":
+    main()
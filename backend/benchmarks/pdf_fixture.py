@@ -0,0 +1,101 @@
+"""
+벤치마크용 PDF 픽스처 생성기 (외부 의존성 없이 최소한의 PDF 1.4 파일을 만든다)
+"""
+
+from typing import List
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def make_pdf(pages: List[List[str]]) -> bytes:
+    """페이지별 텍스트 줄 목록으로 PDF 바이트 생성 (Helvetica, ASCII 텍스트 기준)"""
+    objects = []
+
+    def add(body: bytes) -> int:
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(b"")  # 나중에 채움
+    pages_id = add(b"")
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for lines in pages:
+        stream = ["BT", "/F1 11 Tf", "14 TL", "50 780 Td"]
+        for line in lines:
+            stream.append(f"({_escape(line)}) Tj T*")
+        stream.append("ET")
+        content = "\n".join(stream).encode("latin-1", errors="replace")
+        content_id = add(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+        page_ids.append(add(
+            b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 842] "
+            b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>" % (pages_id, font_id, content_id)
+        ))
+
+    objects[catalog_id - 1] = b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id
+    kids = b" ".join(b"%d 0 R" % page_id for page_id in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(page_ids))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+
+    xref_offset = len(out)
+    out += b"xref\n0 %d\n" % (len(objects) + 1)
+    out += b"0000000000 65535 f \n"
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, catalog_id, xref_offset)
+    return bytes(out)
+
+
+def sample_pdf(num_pages: int = 5, lines_per_page: int = 40) -> bytes:
+    """부하 테스트용 결정적 샘플 PDF"""
+    pages = []
+    for page in range(num_pages):
+        pages.append([
+            f"Section {page + 1}.{line + 1}: benchmark document line about topic {(page * lines_per_page + line) % 17}."
+            for line in range(lines_per_page)
+        ])
+    return make_pdf(pages)
+
+
+ENTITIES = [
+    "Aurora", "Basalt", "Cobalt", "Delta", "Ember", "Falcon", "Granite", "Harbor",
+    "Indigo", "Juniper", "Kestrel", "Lumen", "Meridian", "Nimbus", "Onyx", "Prism",
+    "Quartz", "Raven", "Summit", "Tundra", "Umber", "Vertex", "Willow", "Zephyr",
+]
+
+
+def retrieval_corpus(num_docs: int = 4, pages_per_doc: int = 6, filler_lines: int = 30):
+    """
+    검색 평가용 라벨링된 코퍼스
+    각 페이지에 고유한 사실 문장을 하나씩 넣고, 그 사실을 묻는 질의와 정답 문자열을 함께 반환한다.
+    반환값: ([(파일명, PDF 바이트)], [{"query": ..., "relevant": [정답 문자열]}])
+    """
+    files = []
+    queries = []
+    fact_index = 0
+    for doc in range(num_docs):
+        pages = []
+        for page in range(pages_per_doc):
+            entity = ENTITIES[fact_index % len(ENTITIES)] + (f" {fact_index // len(ENTITIES) + 1}" if fact_index >= len(ENTITIES) else "")
+            code = f"PX-{1000 + fact_index * 37}"
+            lines = [
+                f"Report {doc + 1}, page {page + 1}. General operating notes for the quarterly review cycle."
+                for _ in range(filler_lines // 2)
+            ]
+            lines.append(f"The {entity} project is budgeted under code {code} and led by team {fact_index % 5 + 1}.")
+            lines.extend(
+                f"Additional remarks {line + 1}: schedules, staffing and maintenance windows remain unchanged."
+                for line in range(filler_lines - filler_lines // 2)
+            )
+            pages.append(lines)
+            queries.append({"query": f"What budget code is the {entity} project under?", "relevant": [code]})
+            fact_index += 1
+        files.append((f"report_{doc + 1}.pdf", make_pdf(pages)))
+    return files, queries
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+오프라인 검색 품질/성능 벤치마크
+
+PDF 코퍼스로 설정별 인덱스를 만들고 라벨링된 질의 세트를 돌려
+recall@k, MRR, 임베딩/인덱스 생성 시간, 디스크 크기, 로드 시간, 질의당 검색 지연을 JSON으로 보고한다.
+두 번째 설정부터는 첫 번째 설정 대비 크기/로드 시간 비율과 recall/MRR 차이(vs_baseline)도 함께 보고한다.
+청크 분할은 rag.load_and_split, 인덱스 로드는 index_cache.load_vector_store, 검색은 rag_chat과 같은
+retrieval.AdaptiveRetriever(코사인 점수, RETRIEVAL_MAX_K 후보)를 그대로 사용하므로 /api/chat/embed, /api/chat/rag 와 같은 경로를 측정한다.
+- recall@k / MRR: 코사인 점수 순으로 정렬한 후보 기준 (k가 RETRIEVAL_MAX_K보다 크면 후보 수까지만 봄)
+- served_recall: 적응형 k / 조기 종료를 거쳐 실제로 LLM에 전달되는 청크에 정답이 들어간 비율
+- early_exit_rate / avg_k: 조기 종료("찾을 수 없음") 비율 / 전달 청크 수 평균
+- search_ms: 질문 임베딩을 포함한 retriever 호출 1회 지연
+
+기본 실행 - 내장 픽스처 코퍼스 + 현재 설정(Flat FAISS, 384/48 토큰 청크):
+    python benchmarks/retrieval_bench.py --embedding mock --output retrieval.json
+
+청크/인덱스 설정 비교 (configs.json):
+    [
+      {"name": "baseline", "chunk_tokens": 384, "chunk_overlap": 48, "index": "Flat"},
+      {"name": "small-chunks", "chunk_tokens": 128, "chunk_overlap": 16, "index": "Flat"},
+      {"name": "hnsw", "chunk_tokens": 384, "chunk_overlap": 48, "index": "HNSW32"},
+      {"name": "sq8-factory", "chunk_tokens": 384, "chunk_overlap": 48, "index": "SQ8"},
+      {"name": "fp16", "chunk_tokens": 384, "chunk_overlap": 48, "compression": "fp16"}
+    ]
+    python benchmarks/retrieval_bench.py --configs configs.json
+
+압축 저장 형식(/api/chat/embed 의 compression) 비교 - float32 대비 크기/로드 시간 비율과 recall 차이:
+    python benchmarks/retrieval_bench.py --embedding mock --preset compression
+
+실제 문서 사용 - 질의 파일 형식: [{"query": "...", "relevant": ["정답 청크에 포함된 문자열", ...]}]
+    python benchmarks/retrieval_bench.py --corpus-dir ./pdfs --queries queries.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_bench import percentile  # noqa: E402
+from pdf_fixture import retrieval_corpus  # noqa: E402
+
+
+DEFAULT_KS = [1, 3, 5]
+
+
+def default_configs() -> List[Dict]:
+    from controller.chunking import CHUNK_OVERLAP_TOKENS, CHUNK_TOKENS
+    return [{"name": "baseline", "chunk_tokens": CHUNK_TOKENS, "chunk_overlap": CHUNK_OVERLAP_TOKENS, "index": "Flat"}]
+
+
+def compression_configs() -> List[Dict]:
+    from controller.index_cache import COMPRESSION_TYPES
+    baseline = default_configs()[0]
+    return [dict(baseline, name=compression, compression=compression) for compression in COMPRESSION_TYPES]
+
+
+PRESETS = {
+    "default": default_configs,
+    "compression": compression_configs,
+}
+
+
+def compare_to_baseline(result: Dict, baseline: Dict) -> Dict:
+    """첫 번째 설정 대비 크기/로드 시간 비율과 recall/MRR 차이"""
+    def ratio(new, old):
+        return round(new / old, 4) if old else None
+
+    return {
+        "baseline": baseline["name"],
+        "size_ratio": ratio(result["index_bytes"], baseline["index_bytes"]),
+        "load_p50_ratio": ratio(result["load_ms"]["p50"], baseline["load_ms"]["p50"]),
+        "search_p50_ratio": ratio(result["search_ms"]["p50"], baseline["search_ms"]["p50"]),
+        "recall_delta": {k: round(v - baseline["recall"][k], 4) for k, v in result["recall"].items()},
+        "mrr_delta": round(result["mrr"] - baseline["mrr"], 4),
+        "served_recall_delta": round(result["served_recall"] - baseline["served_recall"], 4),
+    }
+
+
+def prepare_corpus(corpus_dir: str, queries_path: str, work_dir: str):
+    """(PDF 경로 목록, 질의 목록) - 디렉터리를 지정하지 않으면 픽스처 코퍼스를 사용"""
+    if corpus_dir:
+        if not queries_path:
+            raise SystemExit("--corpus-dir 를 사용할 때는 --queries 도 지정해야 합니다.")
+        pdfs = sorted(glob.glob(os.path.join(corpus_dir, "*.pdf")))
+        with open(queries_path, encoding="utf-8") as f:
+            queries = json.load(f)
+        return pdfs, queries
+
+    files, queries = retrieval_corpus()
+    pdfs = []
+    for name, content in files:
+        path = os.path.join(work_dir, name)
+        with open(path, "wb") as f:
+            f.write(content)
+        pdfs.append(path)
+    if queries_path:
+        with open(queries_path, encoding="utf-8") as f:
+            queries = json.load(f)
+    return pdfs, queries
+
+
+def directory_size(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, name)) for name in os.listdir(path))
+
+
+def build_index(spec: str, vectors):
+    """faiss.index_factory 문자열로 인덱스를 만들고 학습/추가"""
+    import faiss
+
+    index = faiss.index_factory(vectors.shape[1], spec, faiss.METRIC_L2)
+    if not index.is_trained:
+        index.train(vectors)
+    index.add(vectors)
+    return index
+
+
+def first_relevant_rank(docs, relevant: List[str]) -> int:
+    """relevant 문자열을 포함한 첫 청크의 순위(1부터), 없으면 0"""
+    for rank, doc in enumerate(docs, start=1):
+        if any(answer in doc.page_content for answer in relevant):
+            return rank
+    return 0
+
+
+class RetrievalBenchmark:
+    def __init__(self, pdfs: List[str], queries: List[Dict], ks: List[int], load_repeats: int):
+        self.pdfs = pdfs
+        self.queries = queries
+        self.ks = sorted(ks)
+        self.load_repeats = load_repeats
+        # 청크 설정별 (청크, 벡터, 분할 시간, 임베딩 시간) 캐시 - 인덱스 종류만 다른 설정끼리 재사용
+        self._chunk_cache: Dict = {}
+
+    def chunks(self, chunk_tokens: int, chunk_overlap: int):
+        import numpy as np
+        from controller.index_cache import get_embeddings
+        from controller.rag import load_and_split
+
+        key = (chunk_tokens, chunk_overlap)
+        if key not in self._chunk_cache:
+            started = time.perf_counter()
+            docs = []
+            for pdf in self.pdfs:
+                docs.extend(load_and_split(pdf, chunk_tokens, chunk_overlap))
+            split_time = time.perf_counter() - started
+
+            started = time.perf_counter()
+            vectors = np.asarray(get_embeddings().embed_documents([doc.page_content for doc in docs]), dtype="float32")
+            embed_time = time.perf_counter() - started
+            self._chunk_cache[key] = (docs, vectors, split_time, embed_time)
+        return self._chunk_cache[key]
+
+    def run_config(self, config: Dict) -> Dict:
+        from langchain_community.vectorstores import FAISS
+        from controller import index_cache
+        from controller.retrieval import AdaptiveRetriever
+
+        name = config["name"]
+        spec = config.get("index", "Flat")
+        docs, vectors, split_time, embed_time = self.chunks(config["chunk_tokens"], config["chunk_overlap"])
+        embeddings = index_cache.get_embeddings()
+
+        started = time.perf_counter()
+        vector_db = FAISS.from_embeddings(
+            [(doc.page_content, vector) for doc, vector in zip(docs, vectors.tolist())],
+            embeddings,
+            metadatas=[doc.metadata for doc in docs],
+        )
+        if spec != "Flat":
+            vector_db.index = build_index(spec, vectors)
+        rag_key = f"bench_{name}"
+        index_cache.save_vector_store(vector_db, rag_key, config.get("compression", "none"))
+        build_time = time.perf_counter() - started
+
+        size = directory_size(index_cache.index_path(rag_key))
+
+        load_times = []
+        for _ in range(self.load_repeats):
+            index_cache.evict(rag_key)
+            started = time.perf_counter()
+            vector_db = index_cache.load_vector_store(rag_key)
+            load_times.append(time.perf_counter() - started)
+
+        # rag_chat과 같은 retriever - 코사인 점수 정렬, 적응형 k, 조기 종료
+        retriever = AdaptiveRetriever(vector_db)
+        search_times = []
+        ranks = []
+        served = []
+        early_exits = 0
+        served_k = []
+        for query in self.queries:
+            started = time.perf_counter()
+            result = retriever.invoke(query["query"])
+            search_times.append(time.perf_counter() - started)
+            ranks.append(first_relevant_rank(result.candidates, query["relevant"]))
+            served.append(first_relevant_rank(result.docs, query["relevant"]) > 0)
+            early_exits += result.early_exit
+            served_k.append(len(result.docs))
+        index_cache.evict(rag_key)
+
+        total = len(self.queries) or 1
+        return {
+            "name": name,
+            "config": config,
+            "chunks": len(docs),
+            "dimension": int(vectors.shape[1]) if len(docs) else 0,
+            "recall": {f"@{k}": round(sum(1 for r in ranks if 0 < r <= k) / total, 4) for k in self.ks},
+            "mrr": round(sum(1 / r for r in ranks if r) / total, 4),
+            "served_recall": round(sum(served) / total, 4),
+            "early_exit_rate": round(early_exits / total, 4),
+            "avg_k": round(sum(served_k) / total, 2),
+            "split_ms": round(split_time * 1000, 2),
+            "embed_ms": round(embed_time * 1000, 2),
+            "build_ms": round(build_time * 1000, 2),
+            "index_bytes": size,
+            "load_ms": {
+                "p50": round(percentile(load_times, 50) * 1000, 3),
+                "max": round(max(load_times) * 1000, 3),
+            },
+            "search_ms": {
+                "p50": round(percentile(search_times, 50) * 1000, 3),
+                "p95": round(percentile(search_times, 95) * 1000, 3),
+                "p99": round(percentile(search_times, 99) * 1000, 3),
+            },
+        }
+
+    def run(self, configs: List[Dict]) -> Dict:
+        results = []
+        for config in configs:
+            print(f"▶ {config['name']}: {json.dumps(config, ensure_ascii=False)}")
+            result = self.run_config(config)
+            print(json.dumps({k: result[k] for k in ("chunks", "recall", "mrr", "served_recall", "early_exit_rate", "build_ms", "index_bytes", "load_ms", "search_ms")}, ensure_ascii=False))
+            if results:
+                result["vs_baseline"] = compare_to_baseline(result, results[0])
+                print(json.dumps(result["vs_baseline"], ensure_ascii=False))
+            results.append(result)
+        return {
+            "config": {
+                "embedding_model": os.environ.get("EMBEDDING_MODEL", ""),
+                "documents": len(self.pdfs),
+                "queries": len(self.queries),
+                "ks": self.ks,
+            },
+            "results": results,
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="AI Chat Backend 검색 벤치마크")
+    parser.add_argument("--embedding", help="EMBEDDING_MODEL 값 (mock이면 오프라인 가짜 임베딩)")
+    parser.add_argument("--configs", help="비교할 설정 목록 JSON 파일 (기본: 현재 Flat FAISS 경로)")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default="default", help="--configs 가 없을 때 사용할 설정 묶음")
+    parser.add_argument("--corpus-dir", help="PDF 코퍼스 디렉터리 (기본: 내장 픽스처)")
+    parser.add_argument("--queries", help="라벨링된 질의 JSON 파일")
+    parser.add_argument("--ks", default=",".join(str(k) for k in DEFAULT_KS), help="recall@k 의 k 목록")
+    parser.add_argument("--load-repeats", type=int, default=5)
+    parser.add_argument("--output", help="결과 JSON 저장 경로")
+    args = parser.parse_args()
+
+    if args.embedding:
+        os.environ["EMBEDDING_MODEL"] = args.embedding
+    work_dir = tempfile.mkdtemp(prefix="bench_retrieval_")
+    # 벤치마크 인덱스가 실제 vectors 디렉터리에 섞이지 않도록 임시 디렉터리 사용
+    os.environ["VECTOR_DIR"] = os.path.join(work_dir, "vectors")
+    os.environ["VECTOR_CATALOG_DB"] = os.path.join(work_dir, "vector_catalog.db")
+    os.environ["PDF_TEXT_CACHE_DIR"] = os.path.join(work_dir, "pdf_text_cache")
+    os.chdir(BACKEND_DIR)
+
+    if args.configs:
+        with open(args.configs, encoding="utf-8") as f:
+            configs = json.load(f)
+    else:
+        configs = PRESETS[args.preset]()
+
+    pdfs, queries = prepare_corpus(args.corpus_dir, args.queries, work_dir)
+    ks = [int(k) for k in args.ks.split(",") if k.strip()]
+    from controller.retrieval import RETRIEVAL_MAX_K
+    if max(ks) > RETRIEVAL_MAX_K:
+        print(f"⚠️ RETRIEVAL_MAX_K={RETRIEVAL_MAX_K}개 후보만 가져오므로 그보다 큰 k의 recall은 후보 수까지만 봅니다.")
+    benchmark = RetrievalBenchmark(pdfs, queries, ks, args.load_repeats)
+    report = benchmark.run(configs)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"결과 저장: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
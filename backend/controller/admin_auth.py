@@ -0,0 +1,28 @@
+"""
+관리자 전용 엔드포인트 인증
+
+- ADMIN_TOKEN이 설정되어 있을 때만 관리자 엔드포인트가 동작하며, X-Admin-Token 헤더가 일치해야 한다.
+- 토큰이 설정되지 않았으면 엔드포인트가 없는 것처럼 404를 돌려준다.
+- 라우터에 dependencies=[Depends(require_admin)]로 붙여 사용한다 (프로파일링, VectorDB 관리).
+"""
+
+import os
+import secrets
+from typing import Optional
+
+from dotenv import load_dotenv
+from fastapi import Header, HTTPException
+
+
+load_dotenv()
+
+
+# 관리자 토큰 (빈 값이면 관리자 엔드포인트 비활성화)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="관리자 토큰이 올바르지 않습니다")
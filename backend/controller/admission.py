@@ -0,0 +1,219 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+
+from dotenv import load_dotenv
+from fastapi import APIRouter, HTTPException
+
+
+load_dotenv()
+
+router = APIRouter(
+    prefix = "/api/admission",
+    tags = ["admission"],
+    responses={404:{"description": "Not Found"}},
+)
+
+
+# 아래 동시 실행 / 대기열 한도는 서버 전체 값이며 워커 수로 나눠 워커마다 적용한다
+# 한도를 나눠 가질 워커 수 - gunicorn 운영 모드에서는 gunicorn.conf.py의 post_fork가 실제 워커 수로 덮어쓴다
+ADMISSION_WORKERS = max(1, int(os.getenv("ADMISSION_WORKERS", "1")))
+# 프로바이더별 동시 실행 한도 (Ollama는 로컬 호스트 하나를 공유하므로 낮게 설정)
+PROVIDER_LIMITS = {
+    "openai": int(os.getenv("LLM_MAX_CONCURRENCY_OPENAI", "16")),
+    "ollama": int(os.getenv("LLM_MAX_CONCURRENCY_OLLAMA", "2")),
+    "mock": int(os.getenv("LLM_MAX_CONCURRENCY_MOCK", "64")),
+}
+# 모델별 동시 실행 한도
+MODEL_LIMIT = int(os.getenv("LLM_MAX_CONCURRENCY_PER_MODEL", "4"))
+# 프로바이더별 대기열 최대 길이
+QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "32"))
+# 대기열에서 기다릴 수 있는 최대 시간(초)
+QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+
+
+class AdmissionController:
+    """
+    LLM 호출 앞단의 승인 제어기
+    - 프로바이더별 / 모델별 세마포어로 동시 실행 수 제한
+    - 프로바이더별 대기열 길이 제한 및 대기 시간(deadline) 제한
+    - 포화 상태에서는 429 + Retry-After로 거절
+    asyncio.Semaphore의 대기자는 FIFO로 깨어나므로 먼저 들어온 요청이 먼저 처리된다.
+    """
+
+    def __init__(self, provider_limits: Dict[str, int], model_limit: int, queue_max: int, queue_timeout: float,
+                 workers: int = 1):
+        # 서버 전체 한도 (워커별 한도는 set_workers에서 계산)
+        self.total_provider_limits = provider_limits
+        self.total_model_limit = model_limit
+        self.total_queue_max = queue_max
+        self.queue_timeout = queue_timeout
+        self.set_workers(workers)
+
+        # 메트릭
+        self.waiting: Dict[str, int] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.admitted: Dict[str, int] = {}
+        self.rejected: Dict[str, int] = {}
+        self.timed_out: Dict[str, int] = {}
+        self.max_waiting: Dict[str, int] = {}
+        self.total_wait_time: Dict[str, float] = {}
+        self.total_service_time: Dict[str, float] = {}
+        self.completed: Dict[str, int] = {}
+
+    def set_workers(self, workers: int):
+        """
+        서버 전체 한도를 워커 수로 나눠 이 프로세스의 한도로 설정 (워커마다 최소 1)
+        세마포어를 새로 만들므로 요청을 받기 전(워커 fork 직후)에만 호출한다.
+        """
+        self.workers = max(1, workers)
+        self.provider_limits = {p: max(1, limit // self.workers) for p, limit in self.total_provider_limits.items()}
+        self.model_limit = max(1, self.total_model_limit // self.workers)
+        self.queue_max = max(1, self.total_queue_max // self.workers)
+        self.provider_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self.model_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    def _provider_semaphore(self, provider: str) -> asyncio.Semaphore:
+        if provider not in self.provider_semaphores:
+            limit = self.provider_limits.get(provider, self.model_limit)
+            self.provider_semaphores[provider] = asyncio.Semaphore(limit)
+        return self.provider_semaphores[provider]
+
+    def _model_semaphore(self, provider: str, model: str) -> asyncio.Semaphore:
+        key = f"{provider}:{model}"
+        if key not in self.model_semaphores:
+            self.model_semaphores[key] = asyncio.Semaphore(self.model_limit)
+        return self.model_semaphores[key]
+
+    def _inc(self, counter: Dict, provider: str, value=1):
+        counter[provider] = counter.get(provider, 0) + value
+
+    def retry_after(self, provider: str) -> int:
+        """평균 처리 시간과 대기열 길이로 재시도까지의 시간(초)을 추정"""
+        completed = self.completed.get(provider, 0)
+        avg_service = self.total_service_time.get(provider, 0.0) / completed if completed else 1.0
+        limit = self.provider_limits.get(provider, self.model_limit)
+        estimate = avg_service * (self.waiting.get(provider, 0) + 1) / max(limit, 1)
+        return max(1, int(estimate + 0.5))
+
+    def _reject(self, provider: str, reason: str):
+        retry_after = self.retry_after(provider)
+        print(f"Admission rejected ({provider}): {reason}, Retry-After={retry_after}s")
+        raise HTTPException(
+            status_code=429,
+            detail=f"요청이 많아 처리할 수 없습니다({reason}). {retry_after}초 후 다시 시도해주세요.",
+            headers={"Retry-After": str(retry_after)},
+        )
+
+    @asynccontextmanager
+    async def slot(self, provider: str, model: str):
+        """LLM 호출 1건에 대한 실행 슬롯 확보"""
+        if self.waiting.get(provider, 0) >= self.queue_max:
+            self._inc(self.rejected, provider)
+            self._reject(provider, "대기열 가득 참")
+
+        model_semaphore = self._model_semaphore(provider, model)
+        provider_semaphore = self._provider_semaphore(provider)
+
+        self._inc(self.waiting, provider)
+        self.max_waiting[provider] = max(self.max_waiting.get(provider, 0), self.waiting[provider])
+        wait_start = time.monotonic()
+        model_acquired = False
+        provider_acquired = False
+        try:
+            # 모델 슬롯을 먼저 잡아야 프로바이더 슬롯을 쥔 채로 다른 모델을 막지 않는다
+            deadline = wait_start + self.queue_timeout
+            await asyncio.wait_for(model_semaphore.acquire(), timeout=self.queue_timeout)
+            model_acquired = True
+            await asyncio.wait_for(provider_semaphore.acquire(), timeout=max(deadline - time.monotonic(), 0.001))
+            provider_acquired = True
+        except asyncio.TimeoutError:
+            if model_acquired:
+                model_semaphore.release()
+            self._inc(self.timed_out, provider)
+            self._reject(provider, "대기 시간 초과")
+        except BaseException:
+            if model_acquired and not provider_acquired:
+                model_semaphore.release()
+            raise
+        finally:
+            self._inc(self.waiting, provider, -1)
+
+        self._inc(self.total_wait_time, provider, time.monotonic() - wait_start)
+        self._inc(self.admitted, provider)
+        self._inc(self.in_flight, provider)
+        service_start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._inc(self.in_flight, provider, -1)
+            self._inc(self.total_service_time, provider, time.monotonic() - service_start)
+            self._inc(self.completed, provider)
+            provider_semaphore.release()
+            model_semaphore.release()
+
+    @asynccontextmanager
+    async def try_slot(self, provider: str, model: str):
+        """
+        대기 없이 바로 잡을 수 있을 때만 슬롯 확보 (헤지 요청 등 부가 호출용)
+        - 빈 슬롯이 없거나 먼저 기다리는 요청이 있으면 False를 내주고 대기열에 들어가지 않는다
+        """
+        model_semaphore = self._model_semaphore(provider, model)
+        provider_semaphore = self._provider_semaphore(provider)
+        # locked()는 대기자가 있을 때도 True이므로 기다리는 사용자 요청을 앞지르지 않는다
+        if model_semaphore.locked() or provider_semaphore.locked():
+            yield False
+            return
+        # 비어 있는 세마포어의 acquire는 즉시 반환된다
+        await model_semaphore.acquire()
+        await provider_semaphore.acquire()
+        self._inc(self.admitted, provider)
+        self._inc(self.in_flight, provider)
+        service_start = time.monotonic()
+        try:
+            yield True
+        finally:
+            self._inc(self.in_flight, provider, -1)
+            self._inc(self.total_service_time, provider, time.monotonic() - service_start)
+            self._inc(self.completed, provider)
+            provider_semaphore.release()
+            model_semaphore.release()
+
+    def metrics(self) -> Dict[str, Dict]:
+        providers = set(self.provider_limits) | set(self.admitted) | set(self.rejected)
+        result = {}
+        for provider in sorted(providers):
+            admitted = self.admitted.get(provider, 0)
+            completed = self.completed.get(provider, 0)
+            result[provider] = {
+                "limit": self.provider_limits.get(provider, self.model_limit),
+                "in_flight": self.in_flight.get(provider, 0),
+                "queue_depth": self.waiting.get(provider, 0),
+                "max_queue_depth": self.max_waiting.get(provider, 0),
+                "admitted": admitted,
+                "rejected": self.rejected.get(provider, 0),
+                "timed_out": self.timed_out.get(provider, 0),
+                "avg_wait_ms": round(self.total_wait_time.get(provider, 0.0) / admitted * 1000, 2) if admitted else 0.0,
+                "avg_service_ms": round(self.total_service_time.get(provider, 0.0) / completed * 1000, 2) if completed else 0.0,
+            }
+        return result
+
+
+# 전역 승인 제어기 인스턴스
+admission_controller = AdmissionController(PROVIDER_LIMITS, MODEL_LIMIT, QUEUE_MAX, QUEUE_TIMEOUT, ADMISSION_WORKERS)
+
+
+@router.get("/metrics")
+async def admission_metrics():
+    """프로바이더별 대기열 길이 / 처리량 메트릭"""
+    return {
+        "pid": os.getpid(),
+        "workers": admission_controller.workers,
+        "provider_limits": admission_controller.provider_limits,
+        "queue_max": admission_controller.queue_max,
+        "queue_timeout": QUEUE_TIMEOUT,
+        "model_limit": admission_controller.model_limit,
+        "providers": admission_controller.metrics(),
+    }
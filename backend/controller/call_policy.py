@@ -0,0 +1,297 @@
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+import httpx
+import openai
+from dotenv import load_dotenv
+from fastapi import APIRouter, HTTPException
+from langchain_openai import ChatOpenAI
+
+from controller.admission import AdmissionController, admission_controller
+from controller.hedging import hedge_manager, hedging_enabled
+from controller.mock_llm import MockChatModel, is_mock_model
+from controller.ollama_session import ollama_sessions
+
+
+load_dotenv()
+
+router = APIRouter(
+    prefix = "/api/policy",
+    tags = ["policy"],
+    responses={404:{"description": "Not Found"}},
+)
+
+
+def _load_json_env(name: str, default):
+    raw = os.getenv(name)
+    if not raw:
+        return default
+    try:
+        return json.loads(raw)
+    except json.JSONDecodeError as e:
+        print(f"{name} 파싱 실패, 기본값 사용: {e}")
+        return default
+
+
+# 프로바이더별 기본 타임아웃(초)
+DEFAULT_TIMEOUTS = {
+    "openai": float(os.getenv("LLM_TIMEOUT_OPENAI", "60")),
+    "ollama": float(os.getenv("LLM_TIMEOUT_OLLAMA", "120")),
+}
+# 모델별 타임아웃 오버라이드 예: {"gpt-4o": 90, "llama3.3:latest": 180}
+MODEL_TIMEOUTS: Dict[str, float] = _load_json_env("LLM_TIMEOUTS", {})
+# 재시도 가능한 오류에 대한 최대 재시도 횟수
+MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+RETRY_BASE_DELAY = float(os.getenv("LLM_RETRY_BASE_DELAY", "0.5"))
+RETRY_MAX_DELAY = float(os.getenv("LLM_RETRY_MAX_DELAY", "8"))
+# 서킷 브레이커: 연속 실패 횟수 / 열린 상태 유지 시간(초)
+BREAKER_FAILURES = int(os.getenv("LLM_BREAKER_FAILURES", "5"))
+BREAKER_RESET = float(os.getenv("LLM_BREAKER_RESET", "30"))
+# 폴백 체인 예: {"ollama:llama3.3:latest": ["ollama:gemma3:270m", "openai:gpt-3.5-turbo"]}
+FALLBACK_CHAINS: Dict[str, List[str]] = _load_json_env("LLM_FALLBACK_CHAINS", {})
+
+
+class Candidate(NamedTuple):
+    provider: str
+    model: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}:{self.model}"
+
+    @classmethod
+    def parse(cls, spec: str) -> "Candidate":
+        # 모델 이름에 ':'가 포함될 수 있으므로 첫 번째 ':'만 기준으로 나눈다
+        provider, _, model = spec.partition(":")
+        return cls(provider.lower(), model)
+
+
+class CallPolicyError(Exception):
+    """폴백 체인의 모든 후보가 실패했을 때 발생"""
+
+    def __init__(self, message: str, last_error: Optional[BaseException] = None):
+        super().__init__(message)
+        self.last_error = last_error
+
+
+class CircuitOpenError(Exception):
+    """서킷 브레이커가 열려 있어 호출을 건너뛸 때 발생"""
+
+
+def build_llm(candidate: Candidate, temperature: float = 0.7):
+    """후보(provider, model)에 맞는 LLM 인스턴스 생성"""
+    if candidate.provider == "mock":
+        return MockChatModel.from_model_name(candidate.model)
+    if candidate.provider == "openai":
+        return ChatOpenAI(
+            model=candidate.model,
+            temperature=temperature,
+            api_key=os.getenv("OPENAI_API_KEY")
+        )
+    # keep_alive / num_ctx를 고정한 재사용 인스턴스 (모델이 호출 사이에 내려가지 않도록)
+    return ollama_sessions.get_llm(candidate.model, temperature)
+
+
+def is_retriable(error: BaseException) -> bool:
+    """일시적인 오류인지 판단 (타임아웃, 연결 오류, 429/5xx)"""
+    if isinstance(error, (asyncio.TimeoutError, TimeoutError, ConnectionError, httpx.TransportError)):
+        return True
+    if isinstance(error, (openai.APIConnectionError, openai.RateLimitError, openai.InternalServerError)):
+        return True
+    status_code = getattr(error, "status_code", None)
+    if isinstance(status_code, int) and not isinstance(error, HTTPException):
+        return status_code == 429 or status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """provider/model 단위 서킷 브레이커 (closed → open → half_open)"""
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_in_progress = False
+
+    def allow(self) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open":
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = "half_open"
+            self.trial_in_progress = False
+        # half_open: 한 번의 시험 호출만 허용
+        if self.trial_in_progress:
+            return False
+        self.trial_in_progress = True
+        return True
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+        self.trial_in_progress = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_in_progress = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def status(self) -> Dict[str, Any]:
+        return {"state": self.state, "failures": self.failures}
+
+
+class CallPolicy:
+    """
+    업스트림 모델 호출 정책
+    - 모델별 타임아웃
+    - 재시도 가능한 오류에 대해 지터가 있는 지수 백오프 재시도
+    - provider/model 단위 서킷 브레이커
+    - 설정된 폴백 체인을 따라 다음 모델로 전환
+    인스턴스마다 서킷 브레이커와 승인 제어기를 따로 가지므로, 백그라운드 작업은 별도 인스턴스로
+    사용자 요청과 동시 실행 한도 / 브레이커 상태를 나누지 않는다.
+    """
+
+    def __init__(self, admission: AdmissionController = admission_controller):
+        self.admission = admission
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def breaker(self, candidate: Candidate) -> CircuitBreaker:
+        if candidate.key not in self.breakers:
+            self.breakers[candidate.key] = CircuitBreaker(BREAKER_FAILURES, BREAKER_RESET)
+        return self.breakers[candidate.key]
+
+    def timeout_for(self, candidate: Candidate) -> float:
+        if candidate.model in MODEL_TIMEOUTS:
+            return float(MODEL_TIMEOUTS[candidate.model])
+        return DEFAULT_TIMEOUTS.get(candidate.provider, 60.0)
+
+    def chain_for(self, candidate: Candidate) -> List[Candidate]:
+        chain = [candidate]
+        for spec in FALLBACK_CHAINS.get(candidate.key, []):
+            fallback = Candidate.parse(spec)
+            if fallback not in chain:
+                chain.append(fallback)
+        return chain
+
+    def backoff(self, attempt: int) -> float:
+        # full jitter: 0 ~ min(max, base * 2^attempt)
+        return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+    async def _call_candidate(
+        self,
+        candidate: Candidate,
+        call: Callable[[Any], Awaitable[Any]],
+        temperature: float,
+        hedge_input: Any = None,
+        hedge_on_chunk: Optional[Callable[[Any, Any], None]] = None,
+    ):
+        breaker = self.breaker(candidate)
+        timeout = self.timeout_for(candidate)
+        last_error = None
+        if candidate.provider == "ollama":
+            # 자주 쓰이는 모델 판단용 사용 기록 - 재시도는 같은 호출이므로 여기서 한 번만 센다
+            ollama_sessions.note_use(candidate.model)
+
+        for attempt in range(MAX_RETRIES + 1):
+            if not breaker.allow():
+                raise CircuitOpenError(f"{candidate.key} 서킷이 열려 있습니다")
+            try:
+                llm = build_llm(candidate, temperature)
+                async with self.admission.slot(candidate.provider, candidate.model):
+                    if hedge_input is not None and hedging_enabled(candidate.model):
+                        pending_call = hedge_manager.run(candidate.provider, candidate.model, llm, hedge_input, hedge_on_chunk)
+                    else:
+                        pending_call = call(llm)
+                    result = await asyncio.wait_for(pending_call, timeout=timeout)
+                breaker.record_success()
+                return result
+            except HTTPException:
+                # 승인 제어 거절은 백엔드 장애가 아니므로 브레이커에 반영하지 않는다
+                breaker.trial_in_progress = False
+                raise
+            except Exception as e:
+                last_error = e
+                if not is_retriable(e):
+                    # 잘못된 요청 등은 백엔드 상태와 무관하므로 브레이커에 반영하지 않는다
+                    breaker.trial_in_progress = False
+                    raise
+                breaker.record_failure()
+                if attempt == MAX_RETRIES:
+                    raise
+                delay = self.backoff(attempt)
+                print(f"{candidate.key} 호출 실패 ({type(e).__name__}: {e}), {delay:.2f}초 후 재시도 ({attempt + 1}/{MAX_RETRIES})")
+                await asyncio.sleep(delay)
+            except BaseException:
+                # 취소(CancelledError) 등 성공도 실패도 아닌 종료 - half_open 시험 호출 자리를 풀어
+                # 다음 호출이 다시 시험할 수 있게 한다 (그대로 두면 브레이커가 영원히 열린 채로 남는다)
+                breaker.trial_in_progress = False
+                raise
+
+        raise last_error
+
+    async def ainvoke(
+        self,
+        use_openai: bool,
+        model: str,
+        call: Callable[[Any], Awaitable[Any]],
+        temperature: float = 0.7,
+        provider: Optional[str] = None,
+        hedge_input: Any = None,
+        hedge_on_chunk: Optional[Callable[[Any, Any], None]] = None,
+    ):
+        """
+        정책에 따라 call(llm)을 실행하고 (결과, 실제 사용된 Candidate)를 반환
+        - call: LLM 인스턴스를 받아 awaitable을 반환하는 함수
+        - hedge_input: 주어지고 LLM_HEDGE_MODELS에 포함된 모델이면 call 대신
+          llm.astream(hedge_input)을 헤지 모드로 실행
+        - hedge_on_chunk: 헤지 모드에서 채택된 시도의 청크를 on_chunk(attempt, chunk)로 스트리밍 전달
+        """
+        if provider is None:
+            # "mock"으로 시작하는 모델은 useOpenAI 값과 관계없이 로컬 가짜 모델로 라우팅
+            provider = "mock" if is_mock_model(model) else ("openai" if use_openai else "ollama")
+        primary = Candidate(provider, model)
+        errors = []
+
+        for candidate in self.chain_for(primary):
+            try:
+                result = await self._call_candidate(candidate, call, temperature, hedge_input, hedge_on_chunk)
+                if candidate != primary:
+                    print(f"Fallback 사용: {primary.key} -> {candidate.key}")
+                return result, candidate
+            except Exception as e:
+                print(f"{candidate.key} 호출 최종 실패: {type(e).__name__}: {e}")
+                errors.append(e)
+
+        # 모든 후보가 승인 제어로 거절된 경우 429를 그대로 전달
+        if errors and all(isinstance(e, HTTPException) for e in errors):
+            raise errors[-1]
+        last_error = errors[-1] if errors else None
+        raise CallPolicyError(f"모델 호출에 실패했습니다: {last_error}", last_error)
+
+    def status(self) -> Dict[str, Any]:
+        return {key: breaker.status() for key, breaker in self.breakers.items()}
+
+
+# 전역 호출 정책 인스턴스
+call_policy = CallPolicy()
+
+
+@router.get("/status")
+async def policy_status():
+    """서킷 브레이커 상태와 정책 설정 조회"""
+    return {
+        "max_retries": MAX_RETRIES,
+        "timeouts": {**DEFAULT_TIMEOUTS, **MODEL_TIMEOUTS},
+        "fallback_chains": FALLBACK_CHAINS,
+        "breakers": call_policy.status(),
+        "hedging": hedge_manager.status(),
+    }
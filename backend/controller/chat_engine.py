@@ -0,0 +1,513 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from typing_extensions import TypedDict
+from langgraph.graph import StateGraph, END
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage
+from langchain_core.prompts import ChatPromptTemplate
+from starlette.concurrency import run_in_threadpool
+
+from controller.call_policy import call_policy
+from controller.coalescing import call_key, single_flight
+from controller.conversation_summary import summary_queue
+from controller.retrieval import RetrievalResult
+
+
+load_dotenv()
+
+# 대화 저장소: memory(프로세스 로컬, 단일 워커 또는 sticky 라우팅) / sqlite(워커 간 공유)
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "memory").lower()
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", "../backend/data/conversations.db")
+
+# 탭 타입별 시스템 프롬프트
+SYSTEM_PROMPTS = {
+    "qna": "당신은 친근하고 도움이 되는 AI 어시스턴트입니다. 사용자의 질문에 정확하고 유용한 답변을 제공하세요. 이전 대화 맥락을 고려하여 일관성 있는 답변을 해주세요.",
+    "compare": "당신은 친근하고 도움이 되는 AI 어시스턴트입니다. 사용자의 질문에 정확하고 유용한 답변을 제공하세요.",
+}
+
+# RAG 시스템 프롬프트 - 턴마다 바뀌는 검색 문서는 사용자 메시지에 넣어
+# 시스템 프롬프트(프롬프트 접두사)가 매 턴 바이트 단위로 동일하게 유지되도록 한다 (Ollama 프롬프트 캐시 재사용)
+RAG_SYSTEM_PROMPT = """당신은 문서 기반 질의응답을 도와주는 AI 어시스턴트입니다.
+        제공된 문서 내용을 바탕으로 정확하고 유용한 답변을 제공하세요.
+        문서에 없는 내용에 대해서는 "문서에서 해당 내용을 찾을 수 없습니다"라고 답변하세요.
+        """
+
+# 관련 문서가 없어 LLM을 호출하지 않을 때의 답변 (시스템 프롬프트의 지시와 같은 문구)
+RAG_NOT_FOUND_ANSWER = "문서에서 해당 내용을 찾을 수 없습니다."
+
+RAG_PROMPT = ChatPromptTemplate.from_messages([
+    ("system", RAG_SYSTEM_PROMPT),
+    ("user", "### Context\n{docs}\n\n### Question\n{question}")
+])
+
+# 탭 타입별 생성 온도
+TEMPERATURES = {
+    "qna": 0.7,
+    "compare": 0.7,
+    "rag": 0,
+}
+
+
+def to_message(role: str, content: str) -> Optional[BaseMessage]:
+    """dict 형태의 메시지를 LangChain 메시지 객체로 변환"""
+    if role == "user":
+        return HumanMessage(content=content)
+    if role == "assistant":
+        return AIMessage(content=content)
+    return None
+
+
+def to_role(message: BaseMessage) -> str:
+    return "user" if isinstance(message, HumanMessage) else "assistant"
+
+
+class Conversation:
+    """
+    미리 만들어 둔 LangChain 메시지 객체의 append-only 목록
+    매 턴마다 전체 히스토리를 다시 변환하지 않고, 새 메시지만 추가한다.
+    """
+
+    def __init__(self, conversation_id: str, tab_type: str):
+        self.conversation_id = conversation_id
+        self.tab_type = tab_type
+        self.messages: List[BaseMessage] = []
+        # RAG는 턴마다 문서가 바뀌므로 시스템 프롬프트를 대화에 고정하지 않는다
+        if tab_type != "rag":
+            system_prompt = SYSTEM_PROMPTS.get(tab_type, SYSTEM_PROMPTS["qna"])
+            self.messages.append(SystemMessage(content=system_prompt))
+        # 시스템 메시지를 제외한 대화 메시지의 시작 위치 / 외부 저장소에 반영된 메시지 수
+        self.base = len(self.messages)
+        self.synced = 0
+        # 외부 저장소의 대화 세대 - 다른 워커가 초기화(reset)할 때마다 증가
+        self.generation = 0
+        # 같은 대화에 대한 턴은 순서대로 처리
+        self.lock = asyncio.Lock()
+
+    def __len__(self):
+        return len(self.messages)
+
+    def is_empty(self) -> bool:
+        return len(self.messages) == self.base
+
+    def version(self) -> int:
+        """히스토리 버전 - 시스템 메시지를 제외한 대화 메시지 수 (턴마다 증가)"""
+        return len(self.messages) - self.base
+
+    def unsynced(self) -> List[BaseMessage]:
+        return self.messages[self.base + self.synced:]
+
+    def append(self, message: BaseMessage):
+        self.messages.append(message)
+
+    def seed(self, history: List[Dict[str, Any]]):
+        """클라이언트가 보낸 히스토리로 새 대화를 한 번만 초기화"""
+        for msg in history:
+            message = to_message(msg.get("role"), msg.get("content", ""))
+            if message is not None:
+                self.messages.append(message)
+
+    def truncate(self, length: int):
+        """실패한 턴에서 추가된 메시지를 되돌린다"""
+        del self.messages[length:]
+
+
+class ConversationStore:
+    """(tab_type, conversation_id) 단위 대화 저장소"""
+
+    def __init__(self):
+        self.conversations: Dict[str, Conversation] = {}
+
+    @staticmethod
+    def key(tab_type: str, conversation_id: str) -> str:
+        return f"{tab_type}:{conversation_id}"
+
+    def get(self, tab_type: str, conversation_id: str) -> Optional[Conversation]:
+        return self.conversations.get(self.key(tab_type, conversation_id))
+
+    def get_or_create(self, tab_type: str, conversation_id: str) -> Conversation:
+        key = self.key(tab_type, conversation_id)
+        conversation = self.conversations.get(key)
+        if conversation is None:
+            conversation = Conversation(conversation_id, tab_type)
+            self.conversations[key] = conversation
+            print(f"Created conversation: {key}")
+        return conversation
+
+    async def refresh(self, conversation: Conversation):
+        """외부 저장소에서 다른 워커가 추가한 메시지를 가져온다 (메모리 저장소는 할 일 없음)"""
+
+    async def persist(self, conversation: Conversation):
+        """이번 턴에 추가된 메시지를 외부 저장소에 반영한다 (메모리 저장소는 할 일 없음)"""
+
+    async def reset(self, conversation: Conversation):
+        """클라이언트 히스토리로 다시 맞추기 위해 대화 메시지를 모두 지운다"""
+        conversation.truncate(conversation.base)
+        conversation.synced = 0
+
+    def clear(self, tab_type: str, conversation_id: str):
+        self.conversations.pop(self.key(tab_type, conversation_id), None)
+
+
+class SqliteConversationStore(ConversationStore):
+    """
+    여러 워커 프로세스가 공유하는 SQLite 대화 저장소
+    각 워커는 대화를 로컬에 캐시하고, 턴마다 자신이 아직 보지 못한 메시지(seq 이후)만 읽고
+    새 메시지만 추가하므로 턴당 작업량은 히스토리 길이가 아니라 새 메시지 수에 비례한다.
+    초기화(historyVersion=0 재동기화)할 때마다 대화의 generation을 올리므로, 다른 워커는 메시지 수가
+    아니라 generation이 바뀐 것으로 초기화를 알아채고 로컬 캐시를 처음부터 다시 읽는다.
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " conversation_key TEXT NOT NULL,"
+                " seq INTEGER NOT NULL,"
+                " role TEXT NOT NULL,"
+                " content TEXT NOT NULL,"
+                " PRIMARY KEY (conversation_key, seq))"
+            )
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_generations ("
+                " conversation_key TEXT PRIMARY KEY,"
+                " generation INTEGER NOT NULL)"
+            )
+        print(f"SqliteConversationStore initialized: {path}")
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간 공유할 수 없으므로 스레드별로 하나씩 연다
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self.local.conn = conn
+        return conn
+
+    def _load_since(self, key: str, seq: int):
+        return self._connect().execute(
+            "SELECT role, content FROM messages WHERE conversation_key = ? AND seq >= ? ORDER BY seq",
+            (key, seq),
+        ).fetchall()
+
+    def _generation(self, conn: sqlite3.Connection, key: str) -> int:
+        row = conn.execute(
+            "SELECT generation FROM conversation_generations WHERE conversation_key = ?", (key,)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _insert(self, key: str, generation: int, start: int, messages: List[BaseMessage]) -> bool:
+        """generation이 그대로일 때만 추가 (도중에 다른 워커가 초기화했으면 False)"""
+        conn = self._connect()
+        # 세대 확인과 추가 사이에 초기화가 끼어들지 않도록 쓰기 잠금을 먼저 잡는다
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._generation(conn, key) != generation:
+                conn.rollback()
+                return False
+            conn.executemany(
+                "INSERT INTO messages (conversation_key, seq, role, content) VALUES (?, ?, ?, ?)",
+                [(key, start + i, to_role(msg), msg.content) for i, msg in enumerate(messages)],
+            )
+            conn.commit()
+            return True
+        except BaseException:
+            conn.rollback()
+            raise
+
+    def _refresh_sync(self, conversation: Conversation):
+        key = self.key(conversation.tab_type, conversation.conversation_id)
+        generation = self._generation(self._connect(), key)
+        if generation != conversation.generation:
+            # 다른 워커가 대화를 초기화함 - 로컬 캐시를 버리고 처음부터 다시 읽는다
+            conversation.truncate(conversation.base)
+            conversation.synced = 0
+            conversation.generation = generation
+        rows = self._load_since(key, conversation.synced)
+        for role, content in rows:
+            conversation.messages.append(to_message(role, content))
+        conversation.synced += len(rows)
+
+    def _persist_sync(self, conversation: Conversation):
+        key = self.key(conversation.tab_type, conversation.conversation_id)
+        for _ in range(3):
+            pending = conversation.unsynced()
+            if not pending:
+                return
+            try:
+                if self._insert(key, conversation.generation, conversation.synced, pending):
+                    conversation.synced += len(pending)
+                    return
+            except sqlite3.IntegrityError:
+                pass
+            # 다른 워커가 같은 위치에 먼저 기록했거나 대화를 초기화함 - 동기화 후 뒤에 다시 붙인다
+            conversation.truncate(conversation.base + conversation.synced)
+            self._refresh_sync(conversation)
+            conversation.messages.extend(pending)
+        print(f"Failed to persist conversation after retries: {key}")
+
+    async def refresh(self, conversation: Conversation):
+        await run_in_threadpool(self._refresh_sync, conversation)
+
+    async def persist(self, conversation: Conversation):
+        await run_in_threadpool(self._persist_sync, conversation)
+
+    def _reset_sync(self, conversation: Conversation):
+        key = self.key(conversation.tab_type, conversation.conversation_id)
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            generation = self._generation(conn, key) + 1
+            conn.execute("DELETE FROM messages WHERE conversation_key = ?", (key,))
+            conn.execute(
+                "INSERT OR REPLACE INTO conversation_generations (conversation_key, generation) VALUES (?, ?)",
+                (key, generation),
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        conversation.truncate(conversation.base)
+        conversation.synced = 0
+        conversation.generation = generation
+
+    async def reset(self, conversation: Conversation):
+        await run_in_threadpool(self._reset_sync, conversation)
+
+
+def create_conversation_store() -> ConversationStore:
+    if CONVERSATION_STORE == "sqlite":
+        return SqliteConversationStore(CONVERSATION_DB)
+    return ConversationStore()
+
+
+class HistoryConflictError(Exception):
+    """클라이언트가 보낸 히스토리 버전이 서버 대화 버전과 다를 때 발생 - 클라이언트는 전체 히스토리로 다시 맞춘다"""
+
+    def __init__(self, version: int):
+        super().__init__(f"대화 히스토리 버전이 일치하지 않습니다 (서버 버전: {version})")
+        self.version = version
+
+
+def parse_history_form(history_version: str, new_messages: str):
+    """폼 필드(historyVersion, newMessages)를 (int 또는 None, 메시지 목록)으로 변환"""
+    try:
+        version = int(history_version) if history_version else None
+        messages = json.loads(new_messages) if new_messages else []
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"히스토리 동기화 값이 잘못되었습니다: {str(e)}")
+    if (version is not None and version < 0) or not isinstance(messages, list):
+        raise HTTPException(status_code=400, detail="historyVersion은 0 이상, newMessages는 메시지 배열이어야 합니다")
+    return version, messages
+
+
+def history_conflict(error: HistoryConflictError) -> HTTPException:
+    """409 응답 - 본문의 history_version은 서버가 가진 버전"""
+    return HTTPException(status_code=409, detail={"message": str(error), "history_version": error.version})
+
+
+# LangGraph 상태 정의 - 이번 턴에 필요한 값만 담는다 (대화 기록은 Conversation이 보관)
+class TurnState(TypedDict, total=False):
+    conversation: Conversation
+    tab_type: str
+    message: str
+    use_openai: bool
+    select_model: str
+    retriever: Any
+    retriever_key: str
+    prompt: List[BaseMessage]
+    docs: List[Any]
+    retrieval: RetrievalResult
+    response: str
+    provider_used: str
+    model_used: str
+    history_version: int
+
+
+# LangGraph 노드 함수들
+def process_user_message(state: TurnState) -> TurnState:
+    """사용자 메시지를 대화에 추가"""
+    conversation = state["conversation"]
+    conversation.append(HumanMessage(content=state["message"]))
+    print(f"Processing user message: {state['message'][:100]}... ({len(conversation)} messages)")
+    return {}
+
+
+async def retrieve_documents(state: TurnState) -> TurnState:
+    """RAG: 질문과 관련된 문서를 검색하고 이번 턴의 프롬프트를 구성"""
+    question = state["message"]
+    retriever = state["retriever"]
+    if state.get("retriever_key"):
+        # 같은 인덱스에 같은 질문이 동시에 들어오면 검색은 한 번만 실행
+        retrieval = await single_flight.do(
+            "retriever", call_key(state["retriever_key"], question),
+            lambda: run_in_threadpool(retriever.invoke, question),
+        )
+    else:
+        retrieval = await run_in_threadpool(retriever.invoke, question)
+    if not isinstance(retrieval, RetrievalResult):
+        # 점수 없이 문서 목록만 돌려주는 일반 retriever
+        retrieval = RetrievalResult(docs=retrieval)
+
+    conversation = state["conversation"]
+    conversation.append(HumanMessage(content=question))
+    if retrieval.early_exit:
+        # 관련 문서가 없으면 LLM을 호출하지 않고 바로 답변
+        print(f"RAG early exit: top score {retrieval.top_score:.3f}")
+        conversation.append(AIMessage(content=RAG_NOT_FOUND_ANSWER))
+        return {"retrieval": retrieval, "docs": [], "response": RAG_NOT_FOUND_ANSWER, "provider_used": "none", "model_used": "none"}
+
+    prompt = RAG_PROMPT.format_messages(question=question, docs=retrieval.docs)
+    return {"retrieval": retrieval, "docs": retrieval.docs, "prompt": prompt}
+
+
+def route_after_retrieve(state: TurnState) -> str:
+    """검색 결과가 early exit이면 생성 단계를 건너뛴다"""
+    retrieval = state.get("retrieval")
+    return END if retrieval is not None and retrieval.early_exit else "generate_response"
+
+
+async def generate_ai_response(state: TurnState) -> TurnState:
+    """AI 응답 생성 - 타임아웃 / 재시도 / 서킷 브레이커 / 폴백 체인 적용"""
+    conversation = state["conversation"]
+    # 프롬프트가 따로 없으면 대화 메시지 목록을 그대로 사용 (재변환 없음)
+    prompt = state.get("prompt") or conversation.messages
+    temperature = TEMPERATURES.get(state["tab_type"], 0.7)
+
+    # 모델 / 온도 / 프롬프트가 같은 호출이 진행 중이면 그 응답을 함께 기다린다
+    response, used = await single_flight.do(
+        "llm",
+        call_key(state["use_openai"], state["select_model"], temperature, prompt),
+        lambda: call_policy.ainvoke(
+            state["use_openai"],
+            state["select_model"],
+            lambda llm: llm.ainvoke(prompt),
+            temperature=temperature,
+        ),
+    )
+    ai_response = response.content
+    conversation.append(AIMessage(content=ai_response))
+
+    print(f"Generated AI response: {ai_response[:100]}...")
+    return {"response": ai_response, "provider_used": used.provider, "model_used": used.model}
+
+
+# LangGraph 워크플로우 생성
+def create_chat_workflow(tab_type: str):
+    workflow = StateGraph(TurnState)
+
+    if tab_type == "rag":
+        workflow.add_node("retrieve", retrieve_documents)
+        workflow.add_node("generate_response", generate_ai_response)
+        workflow.add_conditional_edges("retrieve", route_after_retrieve, ["generate_response", END])
+        workflow.set_entry_point("retrieve")
+    else:
+        workflow.add_node("process_user", process_user_message)
+        workflow.add_node("generate_response", generate_ai_response)
+        workflow.add_edge("process_user", "generate_response")
+        workflow.set_entry_point("process_user")
+
+    workflow.add_edge("generate_response", END)
+    return workflow
+
+
+class ChatEngine:
+    """qna / compare / rag 공용 채팅 엔진 - 탭 타입별로 컴파일된 그래프를 재사용"""
+
+    def __init__(self):
+        self.store = create_conversation_store()
+        self.workflows: Dict[str, Any] = {}
+
+    def get_workflow(self, tab_type: str):
+        graph_type = tab_type if tab_type in ("qna", "compare", "rag") else "qna"
+        if graph_type not in self.workflows:
+            self.workflows[graph_type] = create_chat_workflow(graph_type).compile()
+            print(f"Chat workflow compiled: {graph_type}")
+        return self.workflows[graph_type]
+
+    async def run_turn(
+        self,
+        tab_type: str,
+        conversation_id: str,
+        message: str,
+        use_openai: bool,
+        select_model: str,
+        history: Optional[List[Dict[str, Any]]] = None,
+        retriever: Any = None,
+        retriever_key: Optional[str] = None,
+        history_version: Optional[int] = None,
+        new_messages: Optional[List[Dict[str, Any]]] = None,
+        summary_id: Optional[str] = None,
+        shared_summary_id: Optional[str] = None,
+    ) -> TurnState:
+        """
+        한 턴 실행 - 실패하면 이번 턴에 추가된 메시지를 되돌리고 예외를 그대로 전달
+        히스토리 동기화:
+        - history_version이 없으면 서버에 대화가 없을 때만 history로 초기화 (기존 방식)
+        - history_version이 0이면 new_messages(클라이언트 전체 히스토리)로 대화를 다시 맞춘다
+        - history_version이 서버 버전과 같으면 new_messages만 이어 붙인다
+        - 그 외에는 HistoryConflictError (클라이언트가 0으로 다시 보내 동기화)
+        summary_id가 있으면 저장 후 제목/요약 생성 작업을 백그라운드 큐에 넣는다 (응답을 기다리게 하지 않음)
+        shared_summary_id는 여러 모델이 공유하는 대화 ID - 모델마다 다른 답변 대신 사용자 질문만으로 요약한다
+        """
+        conversation = self.store.get_or_create(tab_type, conversation_id)
+        workflow = self.get_workflow(tab_type)
+
+        async with conversation.lock:
+            await self.store.refresh(conversation)
+            if history_version is not None:
+                if history_version == 0:
+                    if not conversation.is_empty():
+                        await self.store.reset(conversation)
+                elif history_version != conversation.version():
+                    raise HistoryConflictError(conversation.version())
+                if new_messages:
+                    conversation.seed(new_messages)
+            # 서버에 대화가 없을 때만 클라이언트 히스토리로 한 번 초기화
+            elif history and conversation.is_empty():
+                print(f"Adding conversation history: {len(history)} messages")
+                conversation.seed(history)
+            length = len(conversation)
+            state: TurnState = {
+                "conversation": conversation,
+                "tab_type": tab_type,
+                "message": message,
+                "use_openai": use_openai,
+                "select_model": select_model,
+            }
+            if retriever is not None:
+                state["retriever"] = retriever
+                state["retriever_key"] = retriever_key
+            try:
+                result = await workflow.ainvoke(state)
+            except BaseException:
+                conversation.truncate(length)
+                raise
+
+            try:
+                await self.store.persist(conversation)
+            except Exception as e:
+                print(f"Error persisting conversation {conversation_id}: {e}")
+            # 잠금 안에서 스냅샷을 넘기므로 요약 작업이 다음 턴의 진행 중인 메시지를 읽지 않는다
+            snapshot = conversation.messages[conversation.base:]
+            if summary_id:
+                summary_queue.schedule(summary_id, snapshot)
+            if shared_summary_id:
+                summary_queue.schedule(shared_summary_id, [m for m in snapshot if isinstance(m, HumanMessage)])
+            result["history_version"] = conversation.version()
+            return result
+
+
+# 전역 채팅 엔진 인스턴스
+chat_engine = ChatEngine()
@@ -0,0 +1,167 @@
+"""
+토큰 기준 문서 청크 분할
+
+- 길이는 글자 수가 아니라 임베딩 모델 토크나이저의 토큰 수로 잰다.
+  (한국어는 영어보다 글자당 토큰 수가 많아서 글자 기준으로 자르면 청크 크기가 들쭉날쭉해진다)
+- 문장 경계(., ?, !, 。 및 "~다/요/죠" 등 한국어 종결 어미로 끝나는 줄)에서 끊고,
+  한 문장이 청크보다 길면 토큰 경계에서 자른다.
+- 겹침(overlap)은 앞 청크의 마지막 문장들을 토큰 한도 안에서 다시 포함한다.
+- 각 청크에 페이지 번호, 페이지 내 시작/끝 문자 오프셋, 토큰 수, 청크 번호를 메타데이터로 남긴다.
+"""
+
+import bisect
+import os
+import re
+import threading
+from typing import Callable, List, Tuple
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+from controller.index_cache import get_embeddings
+
+
+load_dotenv()
+
+# 청크당 최대 토큰 수 / 겹치는 토큰 수 (BGE-m3 입력 한도 8192 토큰 안에서 검색 정확도를 위해 작게 유지)
+CHUNK_TOKENS = int(os.getenv("CHUNK_TOKENS", "384"))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "48"))
+# 요청별로 지정할 수 있는 범위
+MIN_CHUNK_TOKENS = 32
+MAX_CHUNK_TOKENS = 8192
+
+# 문장부호 뒤 공백, 한국어 종결 어미로 끝나는 줄바꿈, 빈 줄을 문장 경계로 본다
+SENTENCE_BOUNDARY = re.compile(
+    r"(?<=[.?!。？！…])[\"'”’)\]]*\s+"
+    r"|(?<=[다요죠함음됨임])\n"
+    r"|\n\s*\n"
+)
+# 토크나이저를 쓸 수 없을 때의 근사 토큰 (단어/한글 음절 묶음/기호)
+APPROX_TOKEN = re.compile(r"[A-Za-z]+|\d+|[가-힣]{1,2}|[^\sA-Za-z\d가-힣]")
+
+
+Spans = List[Tuple[int, int]]
+
+_token_spans = None
+_token_spans_lock = threading.Lock()
+
+
+def _approximate_spans(text: str) -> Spans:
+    return [match.span() for match in APPROX_TOKEN.finditer(text)]
+
+
+def get_token_spans() -> Callable[[str], Spans]:
+    """
+    텍스트를 토큰 (시작, 끝) 문자 오프셋 목록으로 바꾸는 함수
+    임베딩 모델의 fast 토크나이저가 있으면 그것을 쓰고, 없으면 정규식 근사를 쓴다.
+    """
+    global _token_spans
+    if _token_spans is None:
+        with _token_spans_lock:
+            if _token_spans is None:
+                tokenizer = getattr(getattr(get_embeddings(), "client", None), "tokenizer", None)
+                if tokenizer is not None and getattr(tokenizer, "is_fast", False):
+                    def spans(text: str) -> Spans:
+                        encoded = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+                        return [span for span in encoded["offset_mapping"] if span[1] > span[0]]
+                    _token_spans = spans
+                else:
+                    print("Fast tokenizer unavailable, using approximate token counts for chunking")
+                    _token_spans = _approximate_spans
+    return _token_spans
+
+
+def split_sentences(text: str) -> Spans:
+    """문장 단위 (시작, 끝) 오프셋 목록 (앞뒤 공백 제외)"""
+    sentences = []
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        sentences.append((start, match.start()))
+        start = match.end()
+    sentences.append((start, len(text)))
+
+    result = []
+    for start, end in sentences:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if start < end:
+            result.append((start, end))
+    return result
+
+
+def validate_chunk_params(chunk_tokens: int, chunk_overlap: int):
+    if not MIN_CHUNK_TOKENS <= chunk_tokens <= MAX_CHUNK_TOKENS:
+        raise ValueError(f"chunk_tokens는 {MIN_CHUNK_TOKENS}~{MAX_CHUNK_TOKENS} 사이여야 합니다")
+    if not 0 <= chunk_overlap < chunk_tokens:
+        raise ValueError("chunk_overlap은 0 이상이고 chunk_tokens보다 작아야 합니다")
+
+
+class TokenChunker:
+    """페이지 텍스트를 문장 경계 기준으로 토큰 한도에 맞춰 묶는 분할기"""
+
+    def __init__(self, chunk_tokens: int = CHUNK_TOKENS, chunk_overlap: int = CHUNK_OVERLAP_TOKENS):
+        validate_chunk_params(chunk_tokens, chunk_overlap)
+        self.chunk_tokens = chunk_tokens
+        self.chunk_overlap = chunk_overlap
+        self.token_spans = get_token_spans()
+
+    def _pieces(self, text: str, starts: List[int], spans: Spans) -> List[Tuple[int, int, int]]:
+        """문장 목록을 (시작, 끝, 토큰 수)로 바꾸고, 한도를 넘는 문장은 토큰 경계에서 나눈다"""
+        pieces = []
+        for start, end in split_sentences(text):
+            first = bisect.bisect_left(starts, start)
+            last = bisect.bisect_left(starts, end)
+            count = last - first
+            if count <= self.chunk_tokens:
+                pieces.append((start, end, max(count, 1)))
+                continue
+            for i in range(first, last, self.chunk_tokens):
+                j = min(i + self.chunk_tokens, last)
+                piece_end = spans[j - 1][1] if j < last else end
+                pieces.append((spans[i][0] if i > first else start, piece_end, j - i))
+        return pieces
+
+    def split_text(self, text: str) -> List[Tuple[int, int, int]]:
+        """(시작 오프셋, 끝 오프셋, 토큰 수) 청크 목록"""
+        spans = self.token_spans(text)
+        starts = [span[0] for span in spans]
+        pieces = self._pieces(text, starts, spans)
+
+        chunks = []
+        current: List[Tuple[int, int, int]] = []
+        tokens = 0
+        for piece in pieces:
+            if current and tokens + piece[2] > self.chunk_tokens:
+                chunks.append((current[0][0], current[-1][1], tokens))
+                # 겹침: 뒤쪽 문장을 한도 안에서 다음 청크로 가져간다
+                carried: List[Tuple[int, int, int]] = []
+                carried_tokens = 0
+                for previous in reversed(current):
+                    if carried_tokens + previous[2] > self.chunk_overlap or carried_tokens + previous[2] + piece[2] > self.chunk_tokens:
+                        break
+                    carried.insert(0, previous)
+                    carried_tokens += previous[2]
+                current, tokens = carried, carried_tokens
+            current.append(piece)
+            tokens += piece[2]
+        if current:
+            chunks.append((current[0][0], current[-1][1], tokens))
+        return chunks
+
+    def split_documents(self, docs: List[Document]) -> List[Document]:
+        """페이지 Document 목록을 청크 Document 목록으로 (원본 메타데이터 + 위치 정보)"""
+        result = []
+        for doc in docs:
+            text = doc.page_content
+            for start, end, tokens in self.split_text(text):
+                metadata = dict(doc.metadata)
+                metadata.update({
+                    "chunk_index": len(result),
+                    "start_offset": start,
+                    "end_offset": end,
+                    "token_count": tokens,
+                })
+                result.append(Document(page_content=text[start:end], metadata=metadata))
+        return result
@@ -0,0 +1,213 @@
+"""
+동일 요청 합치기 (single-flight)
+
+- 정규화한 호출 시그니처(모델, 온도, 프롬프트 메시지 / ragKey, k, 질문)가 같은 호출이 동시에 들어오면
+  업스트림 호출은 한 번만 실행하고 나머지 요청은 같은 결과(또는 같은 예외)를 기다린다.
+- 스트리밍 호출은 생산자 하나가 만든 청크를 구독자 모두에게 나눠 준다 (늦게 합류한 구독자는 앞부분을 재생).
+- 합류한 요청이 모두 취소되면 진행 중인 업스트림 호출도 취소한다. 한 요청이 끊겨도 다른 요청은 계속 기다린다.
+- 완료된 결과는 캐시하지 않는다 - 진행 중인 호출끼리만 합친다.
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Awaitable, Callable, Dict, List
+
+from dotenv import load_dotenv
+from fastapi import APIRouter
+from langchain_core.messages import BaseMessage
+
+
+load_dotenv()
+
+router = APIRouter(
+    prefix = "/api/coalescing",
+    tags = ["coalescing"],
+    responses={404:{"description": "Not Found"}},
+)
+
+
+# 동일 요청 합치기 사용 여부
+COALESCE_ENABLED = os.getenv("COALESCE_ENABLED", "true").lower() == "true"
+
+
+def _normalize(value: Any) -> Any:
+    """키 계산용 정규화 - 메시지는 (타입, 내용)으로, 문자열은 공백을 하나로 합친다"""
+    if isinstance(value, BaseMessage):
+        return [value.type, _normalize(value.content)]
+    if isinstance(value, str):
+        return " ".join(value.split())
+    if isinstance(value, (list, tuple)):
+        return [_normalize(item) for item in value]
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    return value
+
+
+def call_key(*parts: Any) -> str:
+    """정규화한 호출 시그니처의 해시"""
+    payload = json.dumps(_normalize(list(parts)), ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CoalesceStats:
+    def __init__(self):
+        self.calls = 0
+        self.executed = 0
+        self.coalesced = 0
+        self.max_waiters = 0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "max_waiters": self.max_waiters,
+            "coalesce_rate": round(self.coalesced / self.calls, 4) if self.calls else 0.0,
+        }
+
+
+class Flight:
+    """진행 중인 업스트림 호출 1건 - 결과 태스크, 스트리밍 청크 버퍼, 합류한 요청 수"""
+
+    def __init__(self):
+        self.task: asyncio.Task = None
+        self.items: List[Any] = []
+        self.updated = asyncio.Event()
+        self.refs = 0
+        self.waiters = 0
+
+    def emit(self, item: Any):
+        self.items.append(item)
+        self._notify()
+
+    def _notify(self):
+        # 기다리던 구독자를 모두 깨우고 다음 청크용 이벤트로 교체
+        self.updated.set()
+        self.updated = asyncio.Event()
+
+    async def subscribe(self):
+        """버퍼에 쌓인 청크부터 순서대로 내보내고, 생산이 끝날 때까지 새 청크를 기다린다"""
+        index = 0
+        while True:
+            while index < len(self.items):
+                yield self.items[index]
+                index += 1
+            if self.task.done():
+                return
+            await self.updated.wait()
+
+
+class SingleFlight:
+    """kind(llm / retriever / stream)별 진행 중인 호출 테이블"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.flights: Dict[str, Flight] = {}
+        self.stats: Dict[str, CoalesceStats] = {}
+
+    def _stats(self, kind: str) -> CoalesceStats:
+        if kind not in self.stats:
+            self.stats[kind] = CoalesceStats()
+        return self.stats[kind]
+
+    def _join(self, kind: str, key: str, start: Callable[[Flight], Awaitable[Any]]) -> Flight:
+        """진행 중인 호출에 합류하거나 새 호출을 시작"""
+        stats = self._stats(kind)
+        stats.calls += 1
+        flight_key = f"{kind}:{key}"
+        flight = self.flights.get(flight_key)
+        if flight is None:
+            flight = Flight()
+            flight.task = asyncio.create_task(start(flight))
+            flight.task.add_done_callback(lambda _: self._finish(flight_key, flight))
+            self.flights[flight_key] = flight
+            stats.executed += 1
+        else:
+            flight.waiters += 1
+            stats.coalesced += 1
+            stats.max_waiters = max(stats.max_waiters, flight.waiters)
+        flight.refs += 1
+        return flight
+
+    def _finish(self, flight_key: str, flight: Flight):
+        if self.flights.get(flight_key) is flight:
+            del self.flights[flight_key]
+        flight._notify()
+        # 아무도 기다리지 않는 태스크의 예외가 "never retrieved" 경고로 남지 않도록 읽어 둔다
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def _leave(self, flight: Flight):
+        flight.refs -= 1
+        if flight.refs == 0 and not flight.task.done():
+            # 합류한 요청이 모두 떠났으면 업스트림 호출도 중단
+            flight.task.cancel()
+
+    async def do(self, kind: str, key: str, call: Callable[[], Awaitable[Any]]) -> Any:
+        """같은 key의 호출이 진행 중이면 그 결과를 함께 기다리고, 없으면 call()을 실행"""
+        if not self.enabled:
+            return await call()
+        flight = self._join(kind, key, lambda _: call())
+        try:
+            # 한 요청이 취소되어도 공유 태스크는 취소되지 않도록 shield
+            return await asyncio.shield(flight.task)
+        finally:
+            self._leave(flight)
+
+    @asynccontextmanager
+    async def stream(self, kind: str, key: str, produce: Callable[[Callable[[Any], None]], Awaitable[Any]]):
+        """
+        스트리밍 호출 합치기
+        - produce(emit): 청크마다 emit(item)을 호출하고 최종 결과를 반환하는 코루틴 함수
+        - async with로 얻은 Subscription을 async for로 순회하면 청크를, result()로 최종 결과를 받는다
+        """
+        if self.enabled:
+            flight = self._join(kind, key, lambda f: produce(f.emit))
+        else:
+            flight = Flight()
+            flight.task = asyncio.create_task(produce(flight.emit))
+            flight.task.add_done_callback(lambda _: flight._notify())
+            flight.refs = 1
+        try:
+            yield Subscription(flight)
+        finally:
+            self._leave(flight)
+
+    def metrics(self) -> Dict[str, Any]:
+        in_flight: Dict[str, int] = {}
+        waiting: Dict[str, int] = {}
+        for flight_key, flight in self.flights.items():
+            kind = flight_key.split(":", 1)[0]
+            in_flight[kind] = in_flight.get(kind, 0) + 1
+            waiting[kind] = waiting.get(kind, 0) + flight.waiters
+        return {
+            kind: {**stats.to_dict(), "in_flight": in_flight.get(kind, 0), "coalesced_waiting": waiting.get(kind, 0)}
+            for kind, stats in self.stats.items()
+        }
+
+
+class Subscription:
+    def __init__(self, flight: Flight):
+        self.flight = flight
+
+    def __aiter__(self):
+        return self.flight.subscribe()
+
+    async def result(self) -> Any:
+        return await asyncio.shield(self.flight.task)
+
+
+# 전역 single-flight 인스턴스
+single_flight = SingleFlight(COALESCE_ENABLED)
+
+
+@router.get("/metrics")
+async def coalescing_metrics():
+    """종류별 호출 수 / 실제 실행 수 / 합쳐진 대기 요청 수"""
+    return {
+        "enabled": COALESCE_ENABLED,
+        "kinds": single_flight.metrics(),
+    }
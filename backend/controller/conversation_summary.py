@@ -0,0 +1,353 @@
+"""
+대화 제목 / 누적 요약 백그라운드 생성
+
+- qna / compare 턴이 저장된 뒤 그 시점의 메시지 스냅샷을 작업 큐에 넣기만 하고 바로 응답한다 (채팅 응답 지연 없음).
+  스냅샷은 대화 잠금 안에서 만들므로 진행 중인 턴(답이 없는 질문)은 요약에 들어가지 않는다.
+- compare 대화는 모델별 대화({id}:{모델})를 각각 요약하고, 목록에 쓰는 기본 ID({id})는
+  모델과 무관한 사용자 질문만으로 제목 / 요약을 만든다.
+- 백그라운드 워커가 작은 모델(SUMMARY_MODEL)로 제목(처음 한 번)과 누적 요약을 만든다.
+  요약은 이전 요약 + 그 이후 새 메시지만 넣어 갱신하므로 대화가 길어져도 입력 길이가 일정하다.
+- 같은 conversation_id는 큐에 하나만 들어간다. 대기 중에 턴이 더 들어오면 합쳐지고,
+  실행 중에 들어온 턴은 끝난 뒤 최신 대화로 한 번 더 실행된다.
+- 결과는 /api/conversations/{conversation_id}/summary 로 조회한다 (저장된 값만 읽음).
+- CONVERSATION_STORE=sqlite 이면 결과도 같은 DB에 저장해 워커 간에 공유한다.
+- 요약 호출은 별도의 승인 제어기(SUMMARY_MAX_CONCURRENCY)와 서킷 브레이커를 쓰므로
+  사용자 요청의 동시 실행 자리를 차지하거나 요약 실패로 사용자 요청의 브레이커가 열리지 않는다.
+"""
+
+import asyncio
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+from fastapi import APIRouter, HTTPException
+from langchain_core.messages import BaseMessage, HumanMessage, SystemMessage
+from starlette.concurrency import run_in_threadpool
+
+from controller.admission import QUEUE_TIMEOUT, AdmissionController
+from controller.call_policy import Candidate, CallPolicy
+from controller.mock_llm import is_mock_model
+
+
+load_dotenv()
+
+router = APIRouter(
+    prefix = "/api/conversations",
+    tags = ["conversations"],
+    responses={404:{"description": "Not Found"}},
+)
+
+
+# 백그라운드 제목/요약 생성 사용 여부
+SUMMARY_ENABLED = os.getenv("SUMMARY_ENABLED", "true").lower() == "true"
+# 제목/요약에 쓸 작은 모델 ("provider:model", 예: "openai:gpt-3.5-turbo", "ollama:gemma3:270m", "mock")
+SUMMARY_MODEL = os.getenv("SUMMARY_MODEL", "openai:gpt-3.5-turbo")
+# 동시에 실행할 작업 수 / 대기열 최대 길이
+SUMMARY_WORKERS = int(os.getenv("SUMMARY_WORKERS", "1"))
+SUMMARY_QUEUE_MAX = int(os.getenv("SUMMARY_QUEUE_MAX", "256"))
+# 요약 호출 전용 동시 실행 한도 (프로바이더별 / 모델별, 사용자 요청 한도와 별도)
+SUMMARY_MAX_CONCURRENCY = int(os.getenv("SUMMARY_MAX_CONCURRENCY", str(max(1, SUMMARY_WORKERS))))
+# 요약 입력에 넣을 새 메시지의 최대 글자 수 (메시지 하나당)
+SUMMARY_MESSAGE_CHARS = int(os.getenv("SUMMARY_MESSAGE_CHARS", "2000"))
+
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "memory").lower()
+CONVERSATION_DB = os.getenv("CONVERSATION_DB", "../backend/data/conversations.db")
+
+TITLE_PROMPT = """다음 대화의 제목을 한 줄로 지어주세요.
+        - 20자 이내, 대화의 언어로 작성
+        - 따옴표나 마침표 없이 제목만 출력"""
+
+SUMMARY_PROMPT = """대화 요약을 갱신하는 도우미입니다.
+        이전 요약과 그 이후 새로 오간 메시지를 합쳐 전체 대화의 요약을 다시 작성하세요.
+        - 사용자의 주요 질문, 결정된 사항, 남은 질문 위주로 5문장 이내
+        - 요약문만 출력"""
+
+
+def _format_messages(messages: List[BaseMessage]) -> str:
+    lines = []
+    for message in messages:
+        role = "사용자" if isinstance(message, HumanMessage) else "AI"
+        lines.append(f"{role}: {str(message.content)[:SUMMARY_MESSAGE_CHARS]}")
+    return "\n".join(lines)
+
+
+class SummaryStore:
+    """conversation_id별 제목 / 요약 (프로세스 로컬)"""
+
+    def __init__(self):
+        self.summaries: Dict[str, Dict[str, Any]] = {}
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        return self.summaries.get(conversation_id)
+
+    def get_many(self, conversation_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        return {cid: self.summaries[cid] for cid in conversation_ids if cid in self.summaries}
+
+    def put(self, conversation_id: str, record: Dict[str, Any]):
+        self.summaries[conversation_id] = record
+
+
+class SqliteSummaryStore(SummaryStore):
+    """대화 저장소와 같은 SQLite DB에 저장 (워커 간 공유)"""
+
+    COLUMNS = "conversation_id, title, summary, message_count, model, updated_at"
+
+    def __init__(self, path: str):
+        super().__init__()
+        self.path = path
+        self.local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversation_summaries ("
+                " conversation_id TEXT PRIMARY KEY,"
+                " title TEXT NOT NULL,"
+                " summary TEXT NOT NULL,"
+                " message_count INTEGER NOT NULL,"
+                " model TEXT NOT NULL,"
+                " updated_at REAL NOT NULL)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간 공유할 수 없으므로 스레드별로 하나씩 연다
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(row) -> Dict[str, Any]:
+        conversation_id, title, summary, message_count, model, updated_at = row
+        return {
+            "conversation_id": conversation_id,
+            "title": title,
+            "summary": summary,
+            "message_count": message_count,
+            "model": model,
+            "updated_at": updated_at,
+        }
+
+    def get(self, conversation_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            f"SELECT {self.COLUMNS} FROM conversation_summaries WHERE conversation_id = ?", (conversation_id,)
+        ).fetchone()
+        return self._row(row) if row else None
+
+    def get_many(self, conversation_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        if not conversation_ids:
+            return {}
+        placeholders = ",".join("?" for _ in conversation_ids)
+        rows = self._connect().execute(
+            f"SELECT {self.COLUMNS} FROM conversation_summaries WHERE conversation_id IN ({placeholders})",
+            conversation_ids,
+        ).fetchall()
+        return {row[0]: self._row(row) for row in rows}
+
+    def put(self, conversation_id: str, record: Dict[str, Any]):
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO conversation_summaries ({self.COLUMNS}) VALUES (?, ?, ?, ?, ?, ?)",
+                (conversation_id, record["title"], record["summary"], record["message_count"], record["model"], record["updated_at"]),
+            )
+
+
+def create_summary_store() -> SummaryStore:
+    if CONVERSATION_STORE == "sqlite":
+        return SqliteSummaryStore(CONVERSATION_DB)
+    return SummaryStore()
+
+
+class SummaryQueue:
+    """conversation_id 단위로 중복을 제거하는 백그라운드 작업 큐"""
+
+    def __init__(self, store: SummaryStore, model: str, workers: int, queue_max: int, policy: CallPolicy):
+        self.store = store
+        self.policy = policy
+        self.model = model
+        self.workers = workers
+        self.queue_max = queue_max
+        self.queue: Optional[asyncio.Queue] = None
+        self.tasks: List[asyncio.Task] = []
+        # 실행을 기다리는 대화 -> 최신 메시지 스냅샷 / 실행 중인 대화
+        self.pending: Dict[str, Any] = {}
+        self.running: set = set()
+        # 메트릭
+        self.enqueued = 0
+        self.deduplicated = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self.total_ms = 0.0
+
+    def start(self):
+        if self.tasks:
+            return
+        self.queue = asyncio.Queue(maxsize=self.queue_max)
+        self.tasks = [asyncio.create_task(self._worker()) for _ in range(max(1, self.workers))]
+
+    async def stop(self):
+        for task in self.tasks:
+            task.cancel()
+        for task in self.tasks:
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+        self.tasks = []
+        self.queue = None
+
+    def schedule(self, conversation_id: str, messages: List[BaseMessage]):
+        """턴이 저장된 뒤 대화 잠금 안에서 호출 - 메시지 스냅샷을 큐에 넣기만 하고 바로 반환"""
+        if self.queue is None:
+            return
+        already_queued = conversation_id in self.pending
+        self.pending[conversation_id] = list(messages)
+        if already_queued:
+            # 대기 중인 작업과 합침 (실행 중이면 끝난 뒤 최신 대화로 다시 실행)
+            self.deduplicated += 1
+            return
+        if conversation_id in self.running:
+            self.deduplicated += 1
+            return
+        try:
+            self.queue.put_nowait(conversation_id)
+            self.enqueued += 1
+        except asyncio.QueueFull:
+            del self.pending[conversation_id]
+            self.dropped += 1
+            print(f"Summary queue full, dropped: {conversation_id}")
+
+    async def _worker(self):
+        while True:
+            conversation_id = await self.queue.get()
+            messages = self.pending.pop(conversation_id, None)
+            self.running.add(conversation_id)
+            try:
+                if messages is not None:
+                    await self._summarize(conversation_id, messages)
+            except Exception as e:
+                self.failed += 1
+                print(f"Summary failed ({conversation_id}): {type(e).__name__}: {e}")
+            finally:
+                self.running.discard(conversation_id)
+                self.queue.task_done()
+                # 실행 중에 새 턴이 들어왔으면 다시 큐에 넣는다
+                if conversation_id in self.pending:
+                    try:
+                        self.queue.put_nowait(conversation_id)
+                    except asyncio.QueueFull:
+                        del self.pending[conversation_id]
+                        self.dropped += 1
+
+    async def _generate(self, system_prompt: str, content: str) -> str:
+        if is_mock_model(self.model):
+            use_openai, model, provider = False, self.model, None
+        else:
+            candidate = Candidate.parse(self.model)
+            use_openai, model, provider = candidate.provider == "openai", candidate.model, candidate.provider
+        messages = [SystemMessage(content=system_prompt), HumanMessage(content=content)]
+        response, _ = await self.policy.ainvoke(
+            use_openai, model, lambda llm: llm.ainvoke(messages), temperature=0.3, provider=provider,
+        )
+        return str(response.content).strip()
+
+    async def _summarize(self, conversation_id: str, messages: List[BaseMessage]):
+        started = time.monotonic()
+        messages = [m for m in messages if not isinstance(m, SystemMessage)]
+        if not messages:
+            return
+        previous = await run_in_threadpool(self.store.get, conversation_id)
+        if previous and previous["message_count"] == len(messages):
+            return
+        # 대화가 더 짧아졌으면(클라이언트 재동기화) 처음부터 다시 요약
+        rolling = previous is not None and previous["message_count"] < len(messages)
+
+        title = previous["title"] if previous else ""
+        if not title:
+            title = (await self._generate(TITLE_PROMPT, _format_messages(messages[:4])))[:100]
+
+        new_messages = _format_messages(messages[previous["message_count"]:] if rolling else messages)
+        previous_summary = previous["summary"] if rolling else ""
+        summary = await self._generate(
+            SUMMARY_PROMPT,
+            f"### 이전 요약\n{previous_summary or '(없음)'}\n\n### 새 메시지\n{new_messages}",
+        )
+
+        await run_in_threadpool(self.store.put, conversation_id, {
+            "conversation_id": conversation_id,
+            "title": title,
+            "summary": summary,
+            "message_count": len(messages),
+            "model": self.model,
+            "updated_at": time.time(),
+        })
+        self.completed += 1
+        self.total_ms += (time.monotonic() - started) * 1000
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "enabled": SUMMARY_ENABLED,
+            "model": self.model,
+            "workers": self.workers,
+            "queue_depth": self.queue.qsize() if self.queue is not None else 0,
+            "running": len(self.running),
+            "enqueued": self.enqueued,
+            "deduplicated": self.deduplicated,
+            "dropped": self.dropped,
+            "completed": self.completed,
+            "failed": self.failed,
+            "avg_ms": round(self.total_ms / self.completed, 2) if self.completed else 0.0,
+            "admission": self.policy.admission.metrics(),
+            "breakers": self.policy.status(),
+        }
+
+
+# 요약 전용 호출 정책 - 사용자 요청과 승인 제어 한도 / 서킷 브레이커를 공유하지 않는다
+# (모든 프로바이더 / 모델에 SUMMARY_MAX_CONCURRENCY 적용, 요약 워커 수만큼만 대기)
+summary_policy = CallPolicy(AdmissionController(
+    {}, SUMMARY_MAX_CONCURRENCY, max(1, SUMMARY_WORKERS), QUEUE_TIMEOUT,
+))
+
+# 전역 요약 큐 인스턴스
+summary_queue = SummaryQueue(create_summary_store(), SUMMARY_MODEL, SUMMARY_WORKERS, SUMMARY_QUEUE_MAX, summary_policy)
+
+
+def start_summary_workers():
+    if SUMMARY_ENABLED:
+        summary_queue.start()
+
+
+async def stop_summary_workers():
+    await summary_queue.stop()
+
+
+@router.get("/summaries")
+async def list_summaries(ids: str = ""):
+    """여러 대화의 제목 / 요약 (채팅 목록용, ids는 쉼표로 구분)"""
+    conversation_ids = [cid.strip() for cid in ids.split(",") if cid.strip()]
+    summaries = await run_in_threadpool(summary_queue.store.get_many, conversation_ids)
+    return {"summaries": summaries}
+
+
+@router.get("/summaries/status")
+async def summary_status():
+    """백그라운드 큐 길이 / 처리 / 중복 제거 메트릭"""
+    return summary_queue.status()
+
+
+@router.get("/{conversation_id}/summary")
+async def get_summary(conversation_id: str):
+    record = await run_in_threadpool(summary_queue.store.get, conversation_id)
+    pending = conversation_id in summary_queue.pending or conversation_id in summary_queue.running
+    if record is None:
+        if pending:
+            return {"conversation_id": conversation_id, "title": None, "summary": None, "pending": True}
+        raise HTTPException(status_code=404, detail=f"요약을 찾을 수 없습니다: '{conversation_id}'")
+    return {**record, "pending": pending}
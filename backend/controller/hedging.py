@@ -0,0 +1,204 @@
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, Dict
+
+from dotenv import load_dotenv
+from langchain_core.messages import AIMessageChunk
+
+from controller.admission import admission_controller
+
+
+load_dotenv()
+
+# 헤징을 사용할 모델 목록 (opt-in, 예: "gpt-4o,gpt-3.5-turbo")
+HEDGE_MODELS = {m.strip() for m in os.getenv("LLM_HEDGE_MODELS", "").split(",") if m.strip()}
+# 첫 토큰 대기 시간 분포에서 헤지 지연으로 사용할 백분위
+HEDGE_PERCENTILE = float(os.getenv("LLM_HEDGE_PERCENTILE", "95"))
+# 샘플이 부족할 때 사용할 기본 헤지 지연(초) / 최소 지연(초)
+HEDGE_INITIAL_DELAY = float(os.getenv("LLM_HEDGE_INITIAL_DELAY", "3"))
+HEDGE_MIN_DELAY = float(os.getenv("LLM_HEDGE_MIN_DELAY", "0.2"))
+# 전체 요청 대비 헤지 요청 비율 상한
+HEDGE_BUDGET = float(os.getenv("LLM_HEDGE_BUDGET", "0.1"))
+# 백분위 계산에 사용할 최근 샘플 수 / 계산에 필요한 최소 샘플 수
+HEDGE_WINDOW = int(os.getenv("LLM_HEDGE_WINDOW", "200"))
+HEDGE_MIN_SAMPLES = 20
+
+
+def hedging_enabled(model: str) -> bool:
+    return model in HEDGE_MODELS
+
+
+class HedgeStats:
+    """모델별 첫 토큰 지연 샘플과 헤지 메트릭"""
+
+    def __init__(self):
+        self.ttft_samples = deque(maxlen=HEDGE_WINDOW)
+        self.requests = 0
+        self.hedges_fired = 0
+        self.hedges_won = 0
+        self.budget_denied = 0
+        self.slot_unavailable = 0
+
+    def delay(self) -> float:
+        if len(self.ttft_samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_INITIAL_DELAY
+        ordered = sorted(self.ttft_samples)
+        index = min(len(ordered) - 1, int(len(ordered) * HEDGE_PERCENTILE / 100))
+        return max(HEDGE_MIN_DELAY, ordered[index])
+
+    def within_budget(self) -> bool:
+        return self.hedges_fired < HEDGE_BUDGET * self.requests
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "hedges_fired": self.hedges_fired,
+            "hedges_won": self.hedges_won,
+            "budget_denied": self.budget_denied,
+            "slot_unavailable": self.slot_unavailable,
+            "hedge_rate": round(self.hedges_fired / self.requests, 4) if self.requests else 0.0,
+            "current_delay_s": round(self.delay(), 3),
+        }
+
+
+class HedgedAttempt:
+    """스트리밍 호출 1건 - 첫 토큰 도착 시 이벤트를 세우고 전체 응답을 모은다"""
+
+    def __init__(self, llm, input):
+        self.first_token = asyncio.Event()
+        self.started_at = time.monotonic()
+        self.ttft = None
+        # 받은 청크 (승자로 정해지기 전 청크를 스트리밍 구독자에게 재생하기 위해 보관)
+        self.chunks = []
+        self.sink = None
+        self.task = asyncio.create_task(self._run(llm, input))
+
+    async def _run(self, llm, input):
+        message = None
+        async for chunk in llm.astream(input):
+            if not self.first_token.is_set():
+                self.ttft = time.monotonic() - self.started_at
+                self.first_token.set()
+            self.chunks.append(chunk)
+            if self.sink is not None:
+                self.sink(self, chunk)
+            message = chunk if message is None else message + chunk
+        self.first_token.set()
+        return message if message is not None else AIMessageChunk(content="")
+
+    async def wait_started(self, timeout=None):
+        """첫 토큰 도착 또는 (실패 포함) 종료까지 대기"""
+        waiter = asyncio.create_task(self.first_token.wait())
+        try:
+            await asyncio.wait({waiter, self.task}, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+        return self
+
+    def attach(self, sink):
+        """지금까지 받은 청크를 sink(attempt, chunk)로 재생하고 이후 청크도 바로 전달"""
+        if sink is None:
+            return
+        for chunk in self.chunks:
+            sink(self, chunk)
+        self.sink = sink
+
+    def cancel(self):
+        if not self.task.done():
+            self.task.cancel()
+
+
+class HedgeManager:
+    """
+    꼬리 지연(tail latency) 완화를 위한 헤지 요청 관리
+    첫 시도가 p{HEDGE_PERCENTILE} 지연 안에 첫 토큰을 받지 못하면 동일 요청을 한 번 더 보내고,
+    먼저 첫 토큰을 받은 쪽을 채택한 뒤 나머지는 취소한다.
+    on_chunk(attempt, chunk)를 주면 채택된 시도의 청크를 스트리밍으로 전달한다 (승자가 정해지기 전 청크는 재생).
+    """
+
+    def __init__(self):
+        self.stats: Dict[str, HedgeStats] = {}
+
+    def _stats(self, key: str) -> HedgeStats:
+        if key not in self.stats:
+            self.stats[key] = HedgeStats()
+        return self.stats[key]
+
+    async def run(self, provider: str, model: str, llm, input, on_chunk=None):
+        stats = self._stats(f"{provider}:{model}")
+        stats.requests += 1
+
+        primary = HedgedAttempt(llm, input)
+        hedge = None
+        try:
+            await primary.wait_started(timeout=stats.delay())
+
+            if primary.first_token.is_set() or primary.task.done():
+                return await self._finish(stats, primary, on_chunk)
+
+            if not stats.within_budget():
+                stats.budget_denied += 1
+                return await self._finish(stats, primary, on_chunk)
+
+            # 헤지 요청도 승인 제어를 거친다 - 대기 없이 잡을 수 있는 슬롯이 없으면 헤지하지 않는다
+            async with admission_controller.try_slot(provider, model) as acquired:
+                if not acquired:
+                    stats.slot_unavailable += 1
+                    return await self._finish(stats, primary, on_chunk)
+                stats.hedges_fired += 1
+                hedge = HedgedAttempt(llm, input)
+                print(f"Hedge fired: {provider}:{model} (delay {stats.delay():.2f}s)")
+                winner = await self._race(primary, hedge)
+                if winner is hedge:
+                    stats.hedges_won += 1
+                    # 느린 첫 시도를 빼면 백분위가 낮게 치우치므로, 진 첫 시도의 첫 토큰 지연도 기록한다
+                    # (첫 토큰을 받지 못했다면 지금까지 기다린 시간이 하한값)
+                    stats.ttft_samples.append(
+                        primary.ttft if primary.ttft is not None else time.monotonic() - primary.started_at
+                    )
+                return await self._finish(stats, winner, on_chunk)
+        finally:
+            # 취소(타임아웃 포함)되거나 패배한 시도는 남겨두지 않는다
+            primary.cancel()
+            if hedge is not None:
+                hedge.cancel()
+
+    async def _race(self, primary: HedgedAttempt, hedge: HedgedAttempt) -> HedgedAttempt:
+        """먼저 첫 토큰을 받은 시도를 승자로 선택, 한쪽이 실패하면 다른 쪽을 기다린다"""
+        pending = {asyncio.create_task(primary.wait_started()), asyncio.create_task(hedge.wait_started())}
+        winner = None
+        while pending and winner is None:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                attempt = task.result()
+                failed = attempt.task.done() and attempt.task.exception() is not None
+                if not failed:
+                    winner = attempt
+                    break
+        for task in pending:
+            task.cancel()
+        winner = winner or primary
+        loser = hedge if winner is primary else primary
+        loser.cancel()
+        return winner
+
+    async def _finish(self, stats: HedgeStats, attempt: HedgedAttempt, on_chunk=None):
+        attempt.attach(on_chunk)
+        result = await attempt.task
+        if attempt.ttft is not None:
+            stats.ttft_samples.append(attempt.ttft)
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "models": sorted(HEDGE_MODELS),
+            "percentile": HEDGE_PERCENTILE,
+            "budget": HEDGE_BUDGET,
+            "stats": {key: stats.status() for key, stats in self.stats.items()},
+        }
+
+
+# 전역 헤지 매니저 인스턴스
+hedge_manager = HedgeManager()
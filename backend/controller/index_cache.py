@@ -0,0 +1,156 @@
+import json
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+import faiss
+from dotenv import load_dotenv
+from langchain.embeddings import HuggingFaceEmbeddings
+from langchain_community.vectorstores import FAISS
+
+from controller.mock_llm import MockEmbeddings
+
+
+load_dotenv()
+
+# VectorDB 저장 위치
+VECTOR_DIR = os.getenv("VECTOR_DIR", "../backend/vectors")
+# 임베딩 모델
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "dragonkue/BGE-m3-ko")
+# 프로세스별로 열어 둘 인덱스 수
+INDEX_CACHE_SIZE = int(os.getenv("INDEX_CACHE_SIZE", "8"))
+# 인덱스를 메모리 매핑으로 열어 여러 워커가 같은 페이지 캐시를 공유
+FAISS_MMAP = os.getenv("FAISS_MMAP", "true").lower() == "true"
+# 인덱스 벡터 저장 형식 기본값: none(float32) / fp16(절반 크기) / sq8(1/4 크기, 8비트 스칼라 양자화)
+VECTOR_COMPRESSION = os.getenv("VECTOR_COMPRESSION", "none").lower()
+
+COMPRESSION_TYPES = {
+    "none": None,
+    "fp16": faiss.ScalarQuantizer.QT_fp16,
+    "sq8": faiss.ScalarQuantizer.QT_8bit,
+}
+METADATA_FILE = "meta.json"
+
+
+_embeddings = None
+_embeddings_lock = threading.Lock()
+
+_index_cache: "OrderedDict[str, FAISS]" = OrderedDict()
+_index_lock = threading.Lock()
+
+
+def get_embeddings():
+    """
+    임베딩 모델 싱글턴
+    gunicorn preload 모드에서는 마스터 프로세스에서 한 번 로드한 뒤 fork되므로
+    워커들이 가중치 메모리를 copy-on-write로 공유한다.
+    """
+    global _embeddings
+    if _embeddings is None:
+        with _embeddings_lock:
+            if _embeddings is None:
+                print(f"Loading embedding model: {EMBEDDING_MODEL}")
+                if EMBEDDING_MODEL == "mock":
+                    _embeddings = MockEmbeddings()
+                else:
+                    # 단위 벡터로 저장해야 L2 검색 순위가 코사인 유사도 순위와 같아진다
+                    # (정규화 전에 만든 인덱스는 다시 임베딩해야 순위가 맞는다)
+                    _embeddings = HuggingFaceEmbeddings(
+                        model_name=EMBEDDING_MODEL,
+                        encode_kwargs={"normalize_embeddings": True},
+                    )
+    return _embeddings
+
+
+def index_path(rag_key: str) -> str:
+    return os.path.join(VECTOR_DIR, rag_key)
+
+
+def compress_index(index, compression: str):
+    """Flat 인덱스의 벡터를 스칼라 양자화 인덱스로 옮긴다 (none이면 그대로)"""
+    quantizer_type = COMPRESSION_TYPES[compression]
+    if quantizer_type is None:
+        return index
+    vectors = index.reconstruct_n(0, index.ntotal)
+    compressed = faiss.IndexScalarQuantizer(index.d, quantizer_type, index.metric_type)
+    compressed.train(vectors)
+    compressed.add(vectors)
+    return compressed
+
+
+def save_vector_store(vector_db: FAISS, rag_key: str, compression: str = VECTOR_COMPRESSION, metadata: dict = None):
+    """인덱스를 지정한 형식으로 저장하고 저장 형식을 meta.json에 기록"""
+    vector_db.index = compress_index(vector_db.index, compression)
+    path = index_path(rag_key)
+    vector_db.save_local(path)
+    meta = {
+        "compression": compression,
+        "dimension": vector_db.index.d,
+        "vectors": vector_db.index.ntotal,
+        "embedding_model": EMBEDDING_MODEL,
+        "normalized": True,
+    }
+    meta.update(metadata or {})
+    with open(os.path.join(path, METADATA_FILE), "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    return meta
+
+
+def read_metadata(rag_key: str) -> dict:
+    """meta.json이 없는 이전 인덱스는 float32로 간주"""
+    try:
+        with open(os.path.join(index_path(rag_key), METADATA_FILE), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"compression": "none"}
+
+
+def _read_index(path: str):
+    """index.faiss를 메모리 매핑(읽기 전용)으로 열고, 지원하지 않는 인덱스면 일반 로드"""
+    index_file = os.path.join(path, "index.faiss")
+    if FAISS_MMAP:
+        # IO_FLAG_MMAP은 IVF 역리스트만 매핑한다 - Flat / SQ 코드까지 매핑하려면 IO_FLAG_MMAP_IFC가 필요
+        # (이 플래그가 없는 이전 faiss 버전에서는 IO_FLAG_MMAP으로 대체)
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | getattr(faiss, "IO_FLAG_READ_ONLY", 0)
+        try:
+            return faiss.read_index(index_file, flags)
+        except RuntimeError as e:
+            print(f"mmap 로딩 미지원, 일반 로딩으로 대체: {e}")
+    return faiss.read_index(index_file)
+
+
+def load_vector_store(rag_key: str) -> FAISS:
+    """ragKey에 해당하는 FAISS 스토어를 LRU 캐시에서 가져오거나 로드"""
+    with _index_lock:
+        if rag_key in _index_cache:
+            _index_cache.move_to_end(rag_key)
+            return _index_cache[rag_key]
+
+    path = index_path(rag_key)
+    index = _read_index(path)
+    with open(os.path.join(path, "index.pkl"), "rb") as f:
+        docstore, index_to_docstore_id = pickle.load(f)
+
+    if not read_metadata(rag_key).get("normalized") and EMBEDDING_MODEL != "mock":
+        print(f"{rag_key}: 임베딩 정규화 전에 만든 인덱스입니다 - 검색 순위가 코사인 순위와 다를 수 있으니 다시 임베딩하세요")
+
+    vector_db = FAISS(
+        embedding_function=get_embeddings(),
+        index=index,
+        docstore=docstore,
+        index_to_docstore_id=index_to_docstore_id,
+    )
+
+    with _index_lock:
+        _index_cache[rag_key] = vector_db
+        _index_cache.move_to_end(rag_key)
+        while len(_index_cache) > INDEX_CACHE_SIZE:
+            evicted, _ = _index_cache.popitem(last=False)
+            print(f"Index cache evicted: {evicted}")
+    return vector_db
+
+
+def evict(rag_key: str):
+    with _index_lock:
+        _index_cache.pop(rag_key, None)
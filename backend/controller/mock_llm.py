@@ -0,0 +1,135 @@
+"""
+벤치마크/오프라인 테스트용 가짜 채팅 모델과 임베딩 모델
+
+- selectedModel(select_model)이 "mock"으로 시작하면 call_policy.build_llm이 MockChatModel을 사용한다.
+  예) "mock", "mock:latency=200,tps=80,tokens=64"
+- EMBEDDING_MODEL=mock 이면 index_cache.get_embeddings가 MockEmbeddings를 사용한다.
+응답과 벡터는 입력에 대해 결정적(deterministic)이다.
+"""
+
+import asyncio
+import hashlib
+import os
+import re
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterator, AsyncIterator, List, Optional
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+load_dotenv()
+
+# 첫 토큰까지의 지연(ms) / 초당 토큰 수 / 응답 토큰 수
+MOCK_LATENCY_MS = float(os.getenv("MOCK_LLM_LATENCY_MS", "100"))
+MOCK_TOKENS_PER_SEC = float(os.getenv("MOCK_LLM_TOKENS_PER_SEC", "50"))
+MOCK_OUTPUT_TOKENS = int(os.getenv("MOCK_LLM_OUTPUT_TOKENS", "32"))
+# 가짜 임베딩 차원 (BGE-m3-ko와 동일하게 1024)
+MOCK_EMBEDDING_DIM = int(os.getenv("MOCK_EMBEDDING_DIM", "1024"))
+
+
+def is_mock_model(model: str) -> bool:
+    return model == "mock" or model.startswith("mock:")
+
+
+def parse_mock_options(model: str) -> Dict[str, float]:
+    """"mock:latency=200,tps=80,tokens=64" 형식의 모델 이름에서 옵션을 읽는다"""
+    options = {"latency": MOCK_LATENCY_MS, "tps": MOCK_TOKENS_PER_SEC, "tokens": MOCK_OUTPUT_TOKENS}
+    _, _, spec = model.partition(":")
+    for part in spec.split(","):
+        name, _, value = part.partition("=")
+        if name.strip() in options and value:
+            options[name.strip()] = float(value)
+    return options
+
+
+def _seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+
+
+class MockChatModel(BaseChatModel):
+    """설정된 지연과 토큰 속도로 결정적인 응답을 생성하는 채팅 모델"""
+
+    model: str = "mock"
+    latency_ms: float = MOCK_LATENCY_MS
+    tokens_per_sec: float = MOCK_TOKENS_PER_SEC
+    output_tokens: int = MOCK_OUTPUT_TOKENS
+
+    @classmethod
+    def from_model_name(cls, model: str) -> "MockChatModel":
+        options = parse_mock_options(model)
+        return cls(
+            model=model,
+            latency_ms=options["latency"],
+            tokens_per_sec=options["tps"],
+            output_tokens=int(options["tokens"]),
+        )
+
+    @property
+    def _llm_type(self) -> str:
+        return "mock-chat"
+
+    def _tokens(self, messages: List[BaseMessage]) -> List[str]:
+        last = str(messages[-1].content) if messages else ""
+        seed = _seed(last)
+        return [f"tok{(seed + i) % 997} " for i in range(self.output_tokens)]
+
+    def _token_interval(self) -> float:
+        return 1.0 / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        time.sleep(self.latency_ms / 1000 + self._token_interval() * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> ChatResult:
+        tokens = self._tokens(messages)
+        await asyncio.sleep(self.latency_ms / 1000 + self._token_interval() * len(tokens))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="".join(tokens)))])
+
+    def _stream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency_ms / 1000)
+        for token in self._tokens(messages):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            time.sleep(self._token_interval())
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager=None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency_ms / 1000)
+        for token in self._tokens(messages):
+            yield ChatGenerationChunk(message=AIMessageChunk(content=token))
+            await asyncio.sleep(self._token_interval())
+
+
+@lru_cache(maxsize=65536)
+def _token_vector(token: str, dim: int) -> np.ndarray:
+    return np.random.default_rng(_seed(token)).standard_normal(dim).astype("float32")
+
+
+class MockEmbeddings(Embeddings):
+    """
+    단어 해시 벡터의 합(bag-of-words)으로 만든 결정적인 단위 벡터를 반환하는 임베딩 모델
+    단어가 겹치는 텍스트끼리 가까워지므로 오프라인 검색 벤치마크의 recall도 의미 있게 나온다.
+    """
+
+    def __init__(self, dim: int = MOCK_EMBEDDING_DIM):
+        self.dim = dim
+
+    def _embed(self, text: str) -> List[float]:
+        tokens = re.findall(r"\w+", text.lower())
+        if tokens:
+            vector = np.sum([_token_vector(token, self.dim) for token in tokens], axis=0)
+        else:
+            vector = _token_vector(text, self.dim).copy()
+        vector /= np.linalg.norm(vector) or 1.0
+        return vector.tolist()
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._embed(text)
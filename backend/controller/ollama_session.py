@@ -0,0 +1,265 @@
+"""
+Ollama 세션 관리
+
+- 모델별 ChatOllama 인스턴스를 재사용하고 keep_alive를 명시해 호출 사이에 모델이 내려가지 않게 한다.
+- OLLAMA_PINNED_MODELS는 OLLAMA_PIN_KEEP_ALIVE(기본 -1, 무기한)로 고정한다.
+  최근 자주 쓰인 모델은 OLLAMA_HOT_KEEP_ALIVE(기본 2h) 동안 유지하므로 트래픽이 끊기면 결국 내려간다.
+  나머지는 OLLAMA_KEEP_ALIVE 동안만 유지한다.
+- 사용 횟수는 재시도와 관계없이 논리적 호출(후보 모델) 1건당 한 번만 센다 (call_policy에서 note_use 호출).
+- OLLAMA_NUM_CTX를 설정하면 모든 요청에 같은 num_ctx를 보낸다 (요청마다 컨텍스트 크기가 바뀌면 Ollama가
+  모델을 다시 로드한다). 설정하지 않으면 num_ctx를 보내지 않아 모델 기본값을 일정하게 쓴다.
+- 응답 메타데이터(load_duration, prompt_eval_count/duration, eval_count/duration)를 모아
+  콜드 로드와 프롬프트 접두사 캐시 재사용 여부를 /api/ollama/status 에서 확인할 수 있다.
+  접두사가 캐시되면 prompt_eval_count가 새로 추가된 토큰 수만큼으로 줄어든다.
+"""
+
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional, Tuple
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import APIRouter
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.outputs import LLMResult
+from langchain_ollama import ChatOllama
+
+
+load_dotenv()
+
+router = APIRouter(
+    prefix = "/api/ollama",
+    tags = ["ollama"],
+    responses={404:{"description": "Not Found"}},
+)
+
+
+OLLAMA_BASE_URL = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
+# 기본 keep_alive / 고정 모델 keep_alive (-1이면 무기한) / 자주 쓰인 모델 keep_alive (유한해야 유휴 시 내려간다)
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "30m")
+OLLAMA_PIN_KEEP_ALIVE = os.getenv("OLLAMA_PIN_KEEP_ALIVE", "-1")
+OLLAMA_HOT_KEEP_ALIVE = os.getenv("OLLAMA_HOT_KEEP_ALIVE", "2h")
+# 항상 고정할 모델 (서버 시작 시 미리 로드)
+OLLAMA_PINNED_MODELS = [m.strip() for m in os.getenv("OLLAMA_PINNED_MODELS", "").split(",") if m.strip()]
+# 최근 OLLAMA_HOT_WINDOW초 동안 OLLAMA_HOT_USES번 이상 쓰인 모델은 OLLAMA_HOT_KEEP_ALIVE로 유지
+OLLAMA_HOT_USES = int(os.getenv("OLLAMA_HOT_USES", "5"))
+OLLAMA_HOT_WINDOW = float(os.getenv("OLLAMA_HOT_WINDOW", "3600"))
+# 모든 요청에 같은 컨텍스트 크기 사용 (0이면 보내지 않고 모델 기본값 사용 - 크게 잡을수록 모델별 메모리가 늘어난다)
+OLLAMA_NUM_CTX = int(os.getenv("OLLAMA_NUM_CTX", "0"))
+# load_duration이 이보다 길면 콜드 로드로 본다(ms)
+OLLAMA_COLD_LOAD_MS = float(os.getenv("OLLAMA_COLD_LOAD_MS", "500"))
+# 최근 이벤트 보관 개수
+RECENT_EVENTS = 50
+
+NS_PER_MS = 1_000_000
+
+
+def _keep_alive_value(value: str):
+    """"-1", "0" 같은 숫자는 정수로, "30m" 같은 기간 문자열은 그대로"""
+    try:
+        return int(value)
+    except ValueError:
+        return value
+
+
+class ModelStats:
+    def __init__(self):
+        self.requests = 0
+        self.cold_loads = 0
+        self.load_ms = 0.0
+        self.prompt_eval_tokens = 0
+        self.prompt_eval_ms = 0.0
+        self.eval_tokens = 0
+        self.eval_ms = 0.0
+        self.uses: Deque[float] = deque()
+
+    def to_dict(self) -> Dict[str, Any]:
+        requests = self.requests or 1
+        return {
+            "requests": self.requests,
+            "cold_loads": self.cold_loads,
+            "avg_load_ms": round(self.load_ms / requests, 2),
+            "avg_prompt_eval_tokens": round(self.prompt_eval_tokens / requests, 1),
+            "avg_prompt_eval_ms": round(self.prompt_eval_ms / requests, 2),
+            "prompt_tokens_per_sec": round(self.prompt_eval_tokens / (self.prompt_eval_ms / 1000), 1) if self.prompt_eval_ms else 0.0,
+            "eval_tokens_per_sec": round(self.eval_tokens / (self.eval_ms / 1000), 1) if self.eval_ms else 0.0,
+        }
+
+
+class OllamaMetricsHandler(BaseCallbackHandler):
+    """Ollama 응답 메타데이터를 세션 관리자에 전달"""
+
+    run_inline = True
+
+    def __init__(self, manager: "OllamaSessionManager", model: str):
+        self.manager = manager
+        self.model = model
+
+    def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
+        for generations in response.generations:
+            for generation in generations:
+                message = getattr(generation, "message", None)
+                metadata = getattr(message, "response_metadata", None) or generation.generation_info or {}
+                if "prompt_eval_count" in metadata or "load_duration" in metadata:
+                    self.manager.record(self.model, metadata)
+                    return
+
+
+class OllamaSessionManager:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats: Dict[str, ModelStats] = {}
+        self.events: Deque[Dict[str, Any]] = deque(maxlen=RECENT_EVENTS)
+        self.llms: Dict[Tuple[str, float, Any], ChatOllama] = {}
+
+    def _stats(self, model: str) -> ModelStats:
+        if model not in self.stats:
+            self.stats[model] = ModelStats()
+        return self.stats[model]
+
+    def note_use(self, model: str):
+        """논리적 호출 1건 기록 (재시도마다 부르지 않는다)"""
+        with self.lock:
+            self._stats(model).uses.append(time.monotonic())
+
+    def recent_uses(self, model: str) -> int:
+        now = time.monotonic()
+        with self.lock:
+            uses = self._stats(model).uses
+            while uses and now - uses[0] > OLLAMA_HOT_WINDOW:
+                uses.popleft()
+            return len(uses)
+
+    def is_pinned(self, model: str) -> bool:
+        return model in OLLAMA_PINNED_MODELS
+
+    def is_hot(self, recent_uses: int) -> bool:
+        return recent_uses >= OLLAMA_HOT_USES
+
+    def keep_alive_for(self, model: str):
+        if self.is_pinned(model):
+            return _keep_alive_value(OLLAMA_PIN_KEEP_ALIVE)
+        if self.is_hot(self.recent_uses(model)):
+            return _keep_alive_value(OLLAMA_HOT_KEEP_ALIVE)
+        return _keep_alive_value(OLLAMA_KEEP_ALIVE)
+
+    def get_llm(self, model: str, temperature: float = 0.7) -> ChatOllama:
+        """keep_alive / num_ctx가 고정된 ChatOllama (같은 설정이면 인스턴스 재사용)"""
+        keep_alive = self.keep_alive_for(model)
+        key = (model, temperature, keep_alive)
+        with self.lock:
+            llm = self.llms.get(key)
+            if llm is None:
+                llm = ChatOllama(
+                    model=model,
+                    temperature=temperature,
+                    base_url=OLLAMA_BASE_URL,
+                    keep_alive=keep_alive,
+                    num_ctx=OLLAMA_NUM_CTX or None,
+                    callbacks=[OllamaMetricsHandler(self, model)],
+                )
+                self.llms[key] = llm
+        return llm
+
+    def record(self, model: str, metadata: Dict[str, Any]):
+        load_ms = (metadata.get("load_duration") or 0) / NS_PER_MS
+        prompt_eval_tokens = metadata.get("prompt_eval_count") or 0
+        prompt_eval_ms = (metadata.get("prompt_eval_duration") or 0) / NS_PER_MS
+        eval_tokens = metadata.get("eval_count") or 0
+        eval_ms = (metadata.get("eval_duration") or 0) / NS_PER_MS
+        cold = load_ms >= OLLAMA_COLD_LOAD_MS
+
+        with self.lock:
+            stats = self._stats(model)
+            stats.requests += 1
+            stats.cold_loads += int(cold)
+            stats.load_ms += load_ms
+            stats.prompt_eval_tokens += prompt_eval_tokens
+            stats.prompt_eval_ms += prompt_eval_ms
+            stats.eval_tokens += eval_tokens
+            stats.eval_ms += eval_ms
+            self.events.append({
+                "model": model,
+                "at": time.time(),
+                "cold_load": cold,
+                "load_ms": round(load_ms, 2),
+                "prompt_eval_tokens": prompt_eval_tokens,
+                "prompt_eval_ms": round(prompt_eval_ms, 2),
+                "eval_tokens": eval_tokens,
+                "eval_ms": round(eval_ms, 2),
+                "total_ms": round((metadata.get("total_duration") or 0) / NS_PER_MS, 2),
+            })
+        if cold:
+            print(f"Ollama cold load: {model} ({load_ms:.0f}ms)")
+
+    async def preload(self):
+        """고정 모델을 미리 로드 (빈 프롬프트 generate 요청은 모델만 메모리에 올린다)"""
+        if not OLLAMA_PINNED_MODELS:
+            return
+        async with httpx.AsyncClient(base_url=OLLAMA_BASE_URL, timeout=300) as client:
+            for model in OLLAMA_PINNED_MODELS:
+                try:
+                    response = await client.post("/api/generate", json={
+                        "model": model,
+                        "keep_alive": _keep_alive_value(OLLAMA_PIN_KEEP_ALIVE),
+                        "options": {"num_ctx": OLLAMA_NUM_CTX} if OLLAMA_NUM_CTX else {},
+                    })
+                    response.raise_for_status()
+                    self.record(model, response.json())
+                    print(f"Ollama model pinned: {model}")
+                except Exception as e:
+                    print(f"Ollama preload failed ({model}): {e}")
+
+    async def loaded_models(self) -> Optional[list]:
+        """Ollama에 현재 올라가 있는 모델 (/api/ps), 연결할 수 없으면 None"""
+        try:
+            async with httpx.AsyncClient(base_url=OLLAMA_BASE_URL, timeout=2) as client:
+                response = await client.get("/api/ps")
+                response.raise_for_status()
+                return [
+                    {"model": m.get("name"), "size_vram": m.get("size_vram"), "expires_at": m.get("expires_at")}
+                    for m in response.json().get("models", [])
+                ]
+        except Exception:
+            return None
+
+    def status(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        with self.lock:
+            models = {}
+            for model, stats in self.stats.items():
+                recent = sum(1 for used in stats.uses if now - used <= OLLAMA_HOT_WINDOW)
+                models[model] = {**stats.to_dict(), "recent_uses": recent, "pinned": self.is_pinned(model), "hot": self.is_hot(recent)}
+            return {"models": models, "recent_events": list(self.events)}
+
+
+# 전역 Ollama 세션 관리자 인스턴스
+ollama_sessions = OllamaSessionManager()
+
+_preload_task: Optional[asyncio.Task] = None
+
+
+def start_preload():
+    global _preload_task
+    if OLLAMA_PINNED_MODELS and _preload_task is None:
+        _preload_task = asyncio.create_task(ollama_sessions.preload())
+
+
+@router.get("/status")
+async def ollama_status():
+    """keep_alive 설정, 모델별 콜드 로드 / 프롬프트 평가 시간, 최근 호출 메타데이터"""
+    return {
+        "base_url": OLLAMA_BASE_URL,
+        "keep_alive": OLLAMA_KEEP_ALIVE,
+        "pin_keep_alive": OLLAMA_PIN_KEEP_ALIVE,
+        "hot_keep_alive": OLLAMA_HOT_KEEP_ALIVE,
+        "pinned_models": OLLAMA_PINNED_MODELS,
+        "hot_uses": OLLAMA_HOT_USES,
+        "hot_window": OLLAMA_HOT_WINDOW,
+        "num_ctx": OLLAMA_NUM_CTX or None,
+        "loaded": await ollama_sessions.loaded_models(),
+        **ollama_sessions.status(),
+    }
@@ -0,0 +1,209 @@
+"""
+PDF 텍스트 추출 단계
+
+- 페이지를 한 장씩 지연(lazy) 추출해 스트리밍하므로 문서 전체를 메모리에 올리지 않는다.
+- 페이지 수가 많은 문서는 프로세스 풀에서 페이지 구간별로 병렬 추출한다 (순서는 유지).
+- 비어 있는 페이지와 내용이 같은 중복 페이지(머리말/간지 등)는 건너뛴다.
+- 추출 결과는 파일 내용 해시(sha256)로 디스크에 캐시되어 같은 파일을 다시 올리면 파싱을 생략한다.
+- 처리 속도(pages/sec)와 프로세스 최대 RSS를 ExtractionStats로 보고한다.
+"""
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from multiprocessing import get_context
+from typing import Iterator, List, Optional
+
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+from pypdf import PdfReader
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+load_dotenv()
+
+# 추출 텍스트 캐시 위치 (빈 값이면 캐시 사용 안 함)
+PDF_TEXT_CACHE_DIR = os.getenv("PDF_TEXT_CACHE_DIR", "../backend/data/pdf_text_cache")
+# 이 페이지 수 이상인 문서는 프로세스 풀에서 병렬 추출
+PDF_PARALLEL_PAGES = int(os.getenv("PDF_PARALLEL_PAGES", "64"))
+# 추출 프로세스 수
+PDF_EXTRACT_WORKERS = int(os.getenv("PDF_EXTRACT_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 프로세스 하나가 한 번에 처리할 페이지 수
+PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "16"))
+
+WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class ExtractionStats:
+    pages_total: int = 0
+    pages_extracted: int = 0
+    empty_skipped: int = 0
+    duplicate_skipped: int = 0
+    cache_hit: bool = False
+    parallel: bool = False
+    elapsed_ms: float = 0.0
+    pages_per_sec: float = 0.0
+    peak_rss_mb: float = 0.0
+
+    def to_dict(self):
+        return asdict(self)
+
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    """
+    추출용 프로세스 풀 (처음 쓸 때 생성)
+    gunicorn preload 이후 워커마다 따로 만들어지도록 지연 생성하고,
+    스레드가 있는 프로세스에서 fork하지 않도록 spawn 방식을 사용한다.
+    """
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=PDF_EXTRACT_WORKERS, mp_context=get_context("spawn"))
+    return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+def peak_rss_mb() -> float:
+    """프로세스 최대 RSS(MB) - 리눅스는 KB, macOS는 바이트 단위"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024) if os.uname().sysname == "Darwin" else peak / 1024, 1)
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _extract_range(path: str, start: int, end: int) -> List[str]:
+    """프로세스 풀 작업 - [start, end) 페이지 텍스트"""
+    reader = PdfReader(path)
+    return [reader.pages[i].extract_text() or "" for i in range(start, end)]
+
+
+def _iter_raw_pages(path: str, stats: ExtractionStats) -> Iterator[tuple]:
+    """(페이지 번호, 텍스트)를 순서대로 스트리밍"""
+    reader = PdfReader(path)
+    total = len(reader.pages)
+    stats.pages_total = total
+
+    if total >= PDF_PARALLEL_PAGES and PDF_EXTRACT_WORKERS > 1:
+        stats.parallel = True
+        del reader
+        starts = range(0, total, PDF_PAGES_PER_TASK)
+        pool = _get_pool()
+        # 한꺼번에 모두 제출하면 결과가 메모리에 쌓이므로 워커 수의 2배만큼만 앞서 제출
+        window = PDF_EXTRACT_WORKERS * 2
+        futures = []
+        for start in starts:
+            futures.append((start, pool.submit(_extract_range, path, start, min(start + PDF_PAGES_PER_TASK, total))))
+            if len(futures) >= window:
+                first, future = futures.pop(0)
+                for offset, text in enumerate(future.result()):
+                    yield first + offset, text
+        for first, future in futures:
+            for offset, text in enumerate(future.result()):
+                yield first + offset, text
+        return
+
+    for number, page in enumerate(reader.pages):
+        yield number, page.extract_text() or ""
+
+
+def _cache_path(content_hash: str) -> str:
+    return os.path.join(PDF_TEXT_CACHE_DIR, content_hash[:2], f"{content_hash}.jsonl")
+
+
+def _iter_cached(path: str) -> Iterator[tuple]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            record = json.loads(line)
+            yield record["page"], record["text"]
+
+
+def extract_pages(path: str, source: Optional[str] = None, content_hash: Optional[str] = None,
+                  stats: Optional[ExtractionStats] = None) -> Iterator[Document]:
+    """
+    PDF 페이지를 Document로 하나씩 스트리밍 (빈 페이지/중복 페이지 제외)
+    - content_hash: 파일 sha256 (호출자가 이미 계산했다면 전달, 없으면 파일을 읽어 계산)
+    - stats: 추출 통계를 채울 객체
+    """
+    stats = stats if stats is not None else ExtractionStats()
+    started = time.perf_counter()
+    source = source or path
+
+    cache_file = None
+    if PDF_TEXT_CACHE_DIR:
+        cache_file = _cache_path(content_hash or file_hash(path))
+
+    if cache_file and os.path.exists(cache_file):
+        stats.cache_hit = True
+        pages = _iter_cached(cache_file)
+        writer = None
+    else:
+        pages = _iter_raw_pages(path, stats)
+        writer = None
+        if cache_file:
+            os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+            temp_cache = f"{cache_file}.{os.getpid()}.{threading.get_ident()}.tmp"
+            writer = open(temp_cache, "w", encoding="utf-8")
+
+    seen = set()
+    completed = False
+    try:
+        for number, text in pages:
+            if not stats.cache_hit:
+                normalized = WHITESPACE.sub(" ", text).strip()
+                if not normalized:
+                    stats.empty_skipped += 1
+                    continue
+                fingerprint = hashlib.sha1(normalized.encode("utf-8")).digest()
+                if fingerprint in seen:
+                    stats.duplicate_skipped += 1
+                    continue
+                seen.add(fingerprint)
+                if writer:
+                    writer.write(json.dumps({"page": number, "text": text}, ensure_ascii=False) + "\n")
+            stats.pages_extracted += 1
+            yield Document(page_content=text, metadata={"source": source, "page": number})
+        completed = True
+    finally:
+        if writer:
+            writer.close()
+            if completed:
+                os.replace(writer.name, cache_file)
+            else:
+                os.remove(writer.name)
+
+        elapsed = time.perf_counter() - started
+        if stats.cache_hit:
+            stats.pages_total = stats.pages_extracted
+        stats.elapsed_ms = round(elapsed * 1000, 2)
+        stats.pages_per_sec = round(stats.pages_total / elapsed, 1) if elapsed > 0 else 0.0
+        stats.peak_rss_mb = peak_rss_mb()
@@ -0,0 +1,277 @@
+"""
+실행 중인 워커의 온디맨드 CPU / 메모리 프로파일링 (관리자 전용)
+
+- ADMIN_TOKEN이 설정되어 있을 때만 동작하며, X-Admin-Token 헤더가 일치해야 한다 (없으면 404).
+- CPU: 샘플링 스레드가 PROFILE_INTERVAL_MS마다 모든 스레드의 파이썬 스택(sys._current_frames)을 기록한다.
+  run_in_threadpool에서 실행되는 pypdf / 토크나이저 / FAISS / pickle 로딩도 잡힌다.
+  네이티브 코드(torch, FAISS 내부) 시간은 그 함수를 호출한 파이썬 프레임에 쌓인다.
+  결과는 flamegraph.pl / speedscope에서 바로 열 수 있는 folded stack 형식으로 내려준다.
+- 메모리: tracemalloc을 켜고 시작 시점 대비 할당이 가장 많이 늘어난 위치를 보여준다.
+- 꺼져 있을 때는 샘플링 스레드도 tracemalloc도 없으므로 요청 처리 경로에 추가 비용이 없다.
+- 워커가 여러 개면 요청을 받은 워커 하나만 프로파일링한다 (응답의 pid로 확인).
+"""
+
+import os
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+from starlette.concurrency import run_in_threadpool
+
+from controller.admin_auth import require_admin
+
+
+load_dotenv()
+
+
+# 샘플링 간격(ms)
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "10"))
+# 프로파일링 최대 시간(초) - 멈추는 것을 잊어도 이 시간이 지나면 자동으로 종료
+PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+# tracemalloc이 할당 위치마다 보관할 프레임 수
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "25"))
+
+# 대기 중인 스레드(이벤트 루프 select, 스레드 풀 대기)로 보고 제외할 스택 끝 함수
+IDLE_LEAVES = {
+    ("selectors.py", "select"),
+    ("threading.py", "wait"),
+    ("queue.py", "get"),
+    ("thread.py", "_worker"),
+}
+
+
+router = APIRouter(
+    prefix = "/api/admin/profile",
+    tags = ["admin"],
+    responses={404:{"description": "Not Found"}},
+    dependencies=[Depends(require_admin)],
+)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """모든 스레드의 스택을 주기적으로 샘플링해 folded stack 별 횟수를 센다"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread: Optional[threading.Thread] = None
+        self.stop_event = threading.Event()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.interval = PROFILE_INTERVAL_MS / 1000
+        self.started_at = 0.0
+        self.stopped_at = 0.0
+        self.include_idle = False
+
+    @property
+    def running(self) -> bool:
+        return self.thread is not None and self.thread.is_alive()
+
+    def start(self, interval_ms: float, max_seconds: float, include_idle: bool):
+        with self.lock:
+            if self.running:
+                raise HTTPException(status_code=409, detail="CPU 프로파일링이 이미 실행 중입니다")
+            self.stacks = Counter()
+            self.samples = 0
+            self.idle_samples = 0
+            self.interval = max(interval_ms, 1.0) / 1000
+            self.include_idle = include_idle
+            self.started_at = time.time()
+            self.stopped_at = 0.0
+            self.stop_event.clear()
+            self.thread = threading.Thread(target=self._run, args=(max_seconds,), name="cpu-profiler", daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        thread = self.thread
+        if thread is not None:
+            thread.join(timeout=5)
+
+    def _run(self, max_seconds: float):
+        own_id = threading.get_ident()
+        names = {}
+        deadline = time.monotonic() + max_seconds
+        while not self.stop_event.wait(self.interval):
+            if time.monotonic() > deadline:
+                break
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                leaf = (os.path.basename(frame.f_code.co_filename), frame.f_code.co_name)
+                if not self.include_idle and leaf in IDLE_LEAVES:
+                    self.idle_samples += 1
+                    continue
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, f"thread-{thread_id}"))
+                self.stacks[";".join(reversed(stack))] += 1
+            self.samples += 1
+        self.stopped_at = time.time()
+
+    def folded(self) -> str:
+        """flamegraph.pl / speedscope 입력 형식 ("root;...;leaf count" 한 줄에 하나)"""
+        # 샘플링 중에도 읽을 수 있도록 복사본 사용
+        stacks = Counter(dict(self.stacks))
+        return "\n".join(f"{stack} {count}" for stack, count in stacks.most_common()) + "\n"
+
+    def summary(self, limit: int = 20) -> Dict[str, Any]:
+        own: Counter = Counter()
+        total: Counter = Counter()
+        stacks = dict(self.stacks)
+        for stack, count in stacks.items():
+            frames = stack.split(";")[1:]
+            if frames:
+                own[frames[-1]] += count
+            for label in set(frames):
+                total[label] += count
+        stack_samples = sum(stacks.values()) or 1
+        return {
+            "running": self.running,
+            "pid": os.getpid(),
+            "interval_ms": round(self.interval * 1000, 2),
+            "started_at": self.started_at or None,
+            "elapsed_s": round((self.stopped_at or time.time()) - self.started_at, 2) if self.started_at else 0.0,
+            "ticks": self.samples,
+            "stack_samples": sum(stacks.values()),
+            "idle_samples_skipped": self.idle_samples,
+            "top_self": [{"frame": label, "samples": count, "ratio": round(count / stack_samples, 4)} for label, count in own.most_common(limit)],
+            "top_total": [{"frame": label, "samples": count, "ratio": round(count / stack_samples, 4)} for label, count in total.most_common(limit)],
+        }
+
+
+class MemoryProfiler:
+    """tracemalloc 시작 시점 스냅샷 대비 할당 증가 위치"""
+
+    def __init__(self):
+        self.baseline: Optional[tracemalloc.Snapshot] = None
+        self.started_at = 0.0
+
+    @property
+    def running(self) -> bool:
+        return tracemalloc.is_tracing()
+
+    def start(self, frames: int):
+        if self.running:
+            raise HTTPException(status_code=409, detail="메모리 프로파일링이 이미 실행 중입니다")
+        tracemalloc.start(max(1, frames))
+        self.baseline = tracemalloc.take_snapshot()
+        self.started_at = time.time()
+
+    def stop(self):
+        tracemalloc.stop()
+        self.baseline = None
+
+    @staticmethod
+    def _filter(snapshot: tracemalloc.Snapshot) -> tracemalloc.Snapshot:
+        return snapshot.filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+
+    def snapshot(self, limit: int, group_by: str) -> Dict[str, Any]:
+        if not self.running:
+            raise HTTPException(status_code=409, detail="메모리 프로파일링이 실행 중이 아닙니다")
+        snapshot = self._filter(tracemalloc.take_snapshot())
+        stats = snapshot.compare_to(self._filter(self.baseline), group_by) if self.baseline else snapshot.statistics(group_by)
+        current, peak = tracemalloc.get_traced_memory()
+        top = []
+        for stat in stats[:limit]:
+            frames = stat.traceback.format() if group_by == "traceback" else [str(stat.traceback[0])]
+            top.append({
+                "location": frames,
+                "size_kb": round(stat.size / 1024, 1),
+                "size_diff_kb": round(getattr(stat, "size_diff", stat.size) / 1024, 1),
+                "count": stat.count,
+                "count_diff": getattr(stat, "count_diff", stat.count),
+            })
+        return {
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "traced_current_mb": round(current / (1024 * 1024), 2),
+            "traced_peak_mb": round(peak / (1024 * 1024), 2),
+            "group_by": group_by,
+            "top": top,
+        }
+
+
+# 워커별 프로파일러 인스턴스
+cpu_profiler = SamplingProfiler()
+memory_profiler = MemoryProfiler()
+
+
+@router.get("/status")
+async def profile_status():
+    return {
+        "pid": os.getpid(),
+        "cpu": {"running": cpu_profiler.running, "interval_ms": PROFILE_INTERVAL_MS, "max_seconds": PROFILE_MAX_SECONDS},
+        "memory": {"running": memory_profiler.running, "frames": PROFILE_TRACEMALLOC_FRAMES},
+    }
+
+
+@router.post("/cpu/start")
+async def start_cpu_profile(interval_ms: float = PROFILE_INTERVAL_MS, max_seconds: float = PROFILE_MAX_SECONDS,
+                            include_idle: bool = False):
+    """
+    CPU 샘플링 시작
+    - interval_ms: 샘플링 간격
+    - max_seconds: 자동 종료 시간 (PROFILE_MAX_SECONDS 이하)
+    - include_idle: 이벤트 루프 / 스레드 풀의 대기 스택도 포함할지 여부
+    """
+    cpu_profiler.start(interval_ms, min(max_seconds, PROFILE_MAX_SECONDS), include_idle)
+    return {"status": "started", "pid": os.getpid(), "interval_ms": max(interval_ms, 1.0)}
+
+
+@router.post("/cpu/stop")
+async def stop_cpu_profile(limit: int = 20):
+    """CPU 샘플링 종료 - 자기 시간(self) / 누적 시간(total) 상위 프레임 요약"""
+    await run_in_threadpool(cpu_profiler.stop)
+    return cpu_profiler.summary(limit)
+
+
+@router.get("/cpu/flamegraph", response_class=PlainTextResponse)
+async def cpu_flamegraph():
+    """마지막(또는 진행 중인) 프로파일의 folded stack - flamegraph.pl / speedscope 입력"""
+    return PlainTextResponse(await run_in_threadpool(cpu_profiler.folded))
+
+
+@router.post("/memory/start")
+async def start_memory_profile(frames: int = PROFILE_TRACEMALLOC_FRAMES):
+    await run_in_threadpool(memory_profiler.start, frames)
+    return {"status": "started", "pid": os.getpid(), "frames": frames}
+
+
+@router.get("/memory/snapshot")
+async def memory_snapshot(limit: int = 20, group_by: str = "lineno"):
+    """
+    시작 시점 대비 할당이 많이 늘어난 위치
+    - group_by: lineno(코드 줄) / filename(파일) / traceback(호출 경로 전체)
+    """
+    if group_by not in ("lineno", "filename", "traceback"):
+        raise HTTPException(status_code=400, detail="group_by는 lineno, filename, traceback 중 하나여야 합니다")
+    # 스냅샷 비교는 무거우므로 이벤트 루프 밖에서 실행
+    return await run_in_threadpool(memory_profiler.snapshot, limit, group_by)
+
+
+@router.post("/memory/stop")
+async def stop_memory_profile(limit: int = 20):
+    """마지막 스냅샷을 반환하고 tracemalloc 종료"""
+    result = await run_in_threadpool(memory_profiler.snapshot, limit, "lineno")
+    memory_profiler.stop()
+    return result
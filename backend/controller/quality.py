@@ -1,13 +1,17 @@
 import os
 import json
+import time
+import asyncio
 
 from dotenv import load_dotenv
 from fastapi import APIRouter, HTTPException, Form
+from fastapi.responses import StreamingResponse
 
 from typing_extensions import TypedDict, Annotated
+from langchain_core.messages import HumanMessage, AIMessage
 
-from langchain_openai import ChatOpenAI
-
+from controller.call_policy import call_policy
+from controller.coalescing import call_key, single_flight
 
 
 load_dotenv()
@@ -22,6 +26,47 @@ router = APIRouter(
 )
 
 
+# 초안 / 향상 모델 (벤치마크에서는 "mock"으로 지정해 가짜 모델로 실행)
+DRAFT_MODEL = os.getenv("QUALITY_DRAFT_MODEL", "gpt-3.5-turbo")
+ENHANCE_MODEL = os.getenv("QUALITY_ENHANCE_MODEL", "gpt-4o")
+
+# System prompt for enhancing existing answers
+ENHANCE_SYSTEM_PROMPT = """당신은 사용자의 질문과 이전에 답변했던 내용을 분석하여 더욱 향상된 답변을 제공하는 AI 어시스턴트입니다.
+
+        사용자의 원래 질문과 기존 AI 답변을 모두 고려하여 다음과 같이 개선해주세요:
+
+        1. **질문 맞춤형 개선**: 사용자가 실제로 궁금해하는 부분에 더 집중하여 답변
+        2. **구체성 향상**: 추상적인 설명을 구체적인 예시와 함께 제시
+        3. **구조화**: 정보를 논리적 순서로 정리하고 단계별로 설명
+        4. **실용성**: 실제 적용 가능한 방법과 팁 추가
+        5. **완성도**: 사용자 질문에서 요구하는 정보가 누락되었다면 보완
+        6. **가독성**: 복잡한 개념을 사용자가 이해하기 쉽게 설명
+
+        기존 답변의 장점은 유지하면서, 사용자의 원래 질문 의도에 더 부합하는 유용하고 실용적인 정보를 제공하세요.
+        답변은 마크다운 형식으로 작성하고, 필요시 목록, 강조, 코드 예시 등을 활용하세요."""
+
+
+def build_draft_messages(conv_history, message: str):
+    """대화 히스토리 + 현재 질문을 LangChain 메시지로 변환"""
+    messages = []
+    for msg in conv_history:
+        if msg.get("role") == "user":
+            messages.append(HumanMessage(content=msg.get("content", "")))
+        elif msg.get("role") == "assistant":
+            messages.append(AIMessage(content=msg.get("content", "")))
+    messages.append(HumanMessage(content=message))
+    return messages
+
+
+def build_enhance_messages(org_question: str, org_answer: str):
+    """원래 질문과 기존 답변으로 향상 요청 메시지 생성"""
+    return [
+        {"role": "system", "content": ENHANCE_SYSTEM_PROMPT},
+        {"role": "user", "content": f"사용자 질문: {org_question}\n\n기존 AI 답변: {org_answer}\n\n위 질문과 답변을 바탕으로 더욱 향상된 답변을 제공해주세요."}
+    ]
+
+
+
 @router.post("/gpt35")
 async def quality_chat_gpt35(
     message: str = Form(...),
@@ -42,9 +87,15 @@ async def quality_chat_gpt35(
 
         
 
-        llm = ChatOpenAI(model = "gpt-3.5-turbo", temperature = 0.5)
-        
-        response = llm.invoke(message)
+        # 이전 대화 맥락을 포함하여 답변 생성
+        draft_messages = build_draft_messages(conv_history, message)
+        response, _ = await single_flight.do(
+            "llm", call_key(True, DRAFT_MODEL, 0.5, draft_messages),
+            lambda: call_policy.ainvoke(
+                True, DRAFT_MODEL, lambda llm: llm.ainvoke(draft_messages), temperature = 0.5,
+                hedge_input = draft_messages,
+            ),
+        )
         
         ai_response = response.content
 
@@ -83,30 +134,15 @@ async def quality_chat_gpt4o(
 
         
 
-        llm = ChatOpenAI(model = "gpt-4o", temperature = 0.5)
+        messages = build_enhance_messages(orgQuestion, orgAnswer)
         
-        # System prompt for enhancing existing answers
-        system_prompt = """당신은 사용자의 질문과 이전에 답변했던 내용을 분석하여 더욱 향상된 답변을 제공하는 AI 어시스턴트입니다.
-
-        사용자의 원래 질문과 기존 AI 답변을 모두 고려하여 다음과 같이 개선해주세요:
-
-        1. **질문 맞춤형 개선**: 사용자가 실제로 궁금해하는 부분에 더 집중하여 답변
-        2. **구체성 향상**: 추상적인 설명을 구체적인 예시와 함께 제시
-        3. **구조화**: 정보를 논리적 순서로 정리하고 단계별로 설명
-        4. **실용성**: 실제 적용 가능한 방법과 팁 추가
-        5. **완성도**: 사용자 질문에서 요구하는 정보가 누락되었다면 보완
-        6. **가독성**: 복잡한 개념을 사용자가 이해하기 쉽게 설명
-
-        기존 답변의 장점은 유지하면서, 사용자의 원래 질문 의도에 더 부합하는 유용하고 실용적인 정보를 제공하세요.
-        답변은 마크다운 형식으로 작성하고, 필요시 목록, 강조, 코드 예시 등을 활용하세요."""
-
-        # Create messages with system prompt and user message
-        messages = [
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": f"사용자 질문: {orgQuestion}\n\n기존 AI 답변: {orgAnswer}\n\n위 질문과 답변을 바탕으로 더욱 향상된 답변을 제공해주세요."}
-        ]
-        
-        response = llm.invoke(messages)
+        response, _ = await single_flight.do(
+            "llm", call_key(True, ENHANCE_MODEL, 0.5, messages),
+            lambda: call_policy.ainvoke(
+                True, ENHANCE_MODEL, lambda llm: llm.ainvoke(messages), temperature = 0.5,
+                hedge_input = messages,
+            ),
+        )
         
         ai_response = response.content
 
@@ -126,3 +162,138 @@ async def quality_chat_gpt4o(
     except Exception as e:
         print(f"Quality 채팅 오류: {str(e)}")
         raise HTTPException(status_code=500, detail=f"내부 서버 오류: {str(e)}")
+
+
+def _ndjson(event: dict) -> str:
+    return json.dumps(event, ensure_ascii=False) + "\n"
+
+
+async def _produce_stage(model: str, messages, emit):
+    """
+    정책을 적용한 스트리밍 호출 - 토큰 / reset 이벤트를 emit으로 내보내고 (전체 응답, 사용된 Candidate) 반환
+    LLM_HEDGE_MODELS에 포함된 모델이면 헤지 모드로 실행하고 채택된 시도의 토큰만 흘려보낸다
+    """
+    current = None
+
+    def forward(source, chunk):
+        nonlocal current
+        if not chunk.content:
+            return
+        if current is not None and source is not current:
+            # 재시도/폴백으로 다른 호출이 응답하는 경우 클라이언트가 받은 부분 응답을 버리도록 알림
+            emit({"type": "reset"})
+        current = source
+        emit({"type": "token", "content": chunk.content})
+
+    async def call(llm):
+        source = object()
+        parts = []
+        async for chunk in llm.astream(messages):
+            if chunk.content:
+                parts.append(chunk.content)
+            forward(source, chunk)
+        return "".join(parts)
+
+    result, used = await call_policy.ainvoke(
+        True, model, call, temperature = 0.5, hedge_input = messages, hedge_on_chunk = forward,
+    )
+    # 헤지 모드에서는 합쳐진 메시지 청크가 돌아온다
+    return (result if isinstance(result, str) else str(result.content)), used
+
+
+async def _stream_stage(stage: str, model: str, messages, queue: asyncio.Queue) -> str:
+    """
+    한 단계의 응답을 토큰 단위로 큐에 흘려보내고 전체 응답과 타이밍을 반환
+    같은 모델 / 메시지의 스트림이 이미 진행 중이면 그 스트림을 함께 구독한다
+    """
+    started = time.monotonic()
+    ttft_ms = None
+    await queue.put({"type": "stage_start", "stage": stage, "model": model})
+
+    async with single_flight.stream(
+        "stream", call_key(True, model, 0.5, messages), lambda emit: _produce_stage(model, messages, emit)
+    ) as events:
+        async for event in events:
+            if event["type"] == "token" and ttft_ms is None:
+                ttft_ms = round((time.monotonic() - started) * 1000, 1)
+            await queue.put({**event, "stage": stage})
+        content, used = await events.result()
+
+    await queue.put({
+        "type": "stage_end",
+        "stage": stage,
+        "model": used.model,
+        "response": content,
+        "ttft_ms": ttft_ms,
+        "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+    })
+    return content
+
+
+@router.post("/pipeline")
+async def quality_pipeline(
+    message: str = Form(...),
+    conversationId: str = Form(""),
+    conversationHistory: str = Form("[]"),
+    enhance: str = Form("false"),
+):
+    """
+    초안(gpt-3.5-turbo) → 향상(gpt-4o) 2단계를 한 요청에서 처리하는 스트리밍 엔드포인트
+    - enhance: true이면 초안이 끝나는 즉시 서버에서 향상 단계를 이어서 실행
+    - 응답: NDJSON 이벤트 스트림 (stage_start / token / reset / stage_end / error / done)
+    """
+    try:
+        conv_history = json.loads(conversationHistory) if conversationHistory else []
+    except json.JSONDecodeError as e:
+        print(f"JSON 파싱 오류: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"대화 히스토리 형식이 잘못되었습니다: {str(e)}")
+
+    run_enhance = enhance.lower() == "true"
+    conversation_id = conversationId or f"quality_{len(conv_history)}"
+
+    print("===================")
+    print(" Quality Pipeline Request:")
+    print(f" Message: {message}")
+    print(f" Enhance: {run_enhance}")
+    print(f" Conversation ID: {conversationId}")
+    print(f" Conversation History: {len(conv_history)} messages")
+
+    queue: asyncio.Queue = asyncio.Queue()
+
+    async def run_pipeline():
+        started = time.monotonic()
+        timings = {}
+        stage = "draft"
+        try:
+            stage_started = time.monotonic()
+            draft = await _stream_stage("draft", DRAFT_MODEL, build_draft_messages(conv_history, message), queue)
+            timings["draft_ms"] = round((time.monotonic() - stage_started) * 1000, 1)
+
+            if run_enhance:
+                stage = "enhance"
+                stage_started = time.monotonic()
+                await _stream_stage("enhance", ENHANCE_MODEL, build_enhance_messages(message, draft), queue)
+                timings["enhance_ms"] = round((time.monotonic() - stage_started) * 1000, 1)
+        except HTTPException as e:
+            await queue.put({"type": "error", "stage": stage, "status": e.status_code, "detail": e.detail})
+        except Exception as e:
+            print(f"Quality pipeline 오류 ({stage}): {str(e)}")
+            await queue.put({"type": "error", "stage": stage, "status": 500, "detail": str(e)})
+        finally:
+            timings["total_ms"] = round((time.monotonic() - started) * 1000, 1)
+            await queue.put({"type": "done", "conversation_id": conversation_id, "timings": timings})
+
+    async def event_stream():
+        task = asyncio.create_task(run_pipeline())
+        try:
+            while True:
+                event = await queue.get()
+                yield _ndjson(event)
+                if event["type"] == "done":
+                    break
+        finally:
+            # 클라이언트 연결이 끊기면 진행 중인 단계도 중단
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(event_stream(), media_type="application/x-ndjson")
@@ -2,15 +2,19 @@
 from fastapi import APIRouter, HTTPException, UploadFile, File, Form
 from typing import List
 import json
-from langchain_community.document_loaders import PyPDFLoader
-from langchain.embeddings import HuggingFaceEmbeddings
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_openai import ChatOpenAI
-from langchain_ollama import ChatOllama
+import hashlib
+import uuid
 from langchain_community.vectorstores import FAISS
 import tempfile
 import os
+from starlette.concurrency import run_in_threadpool
+
+from controller.chat_engine import HistoryConflictError, chat_engine, history_conflict, parse_history_form
+from controller.chunking import CHUNK_OVERLAP_TOKENS, CHUNK_TOKENS, TokenChunker, validate_chunk_params
+from controller.index_cache import COMPRESSION_TYPES, VECTOR_COMPRESSION, get_embeddings, index_path, load_vector_store, save_vector_store
+from controller.pdf_extract import ExtractionStats, extract_pages
+from controller.retrieval import RETRIEVAL_MAX_K, AdaptiveRetriever
+from controller.vector_store import UPLOAD_TEMP_PREFIX, remove_temp_file, validate_rag_key, vector_store_manager
 
 router = APIRouter(
     prefix = "/api/chat",
@@ -19,6 +23,17 @@ router = APIRouter(
 )
 
 
+# 업로드 파일을 임시 파일로 복사할 때 한 번에 읽는 크기
+UPLOAD_BLOCK_SIZE = 1024 * 1024
+
+
+def load_and_split(pdf_path: str, chunk_tokens: int = CHUNK_TOKENS, chunk_overlap: int = CHUNK_OVERLAP_TOKENS,
+                   source: str = None, content_hash: str = None, stats: ExtractionStats = None):
+    """PDF 페이지를 스트리밍으로 추출해 토큰 기준 청크로 분할 (페이지/오프셋 메타데이터 포함)"""
+    pages = extract_pages(pdf_path, source=source, content_hash=content_hash, stats=stats)
+    return TokenChunker(chunk_tokens, chunk_overlap).split_documents(pages)
+
+
 def get_rag_key():
     import datetime
     import random
@@ -38,7 +53,9 @@ async def rag_chat(
     selectedModel: str = Form(...),
     conversationId: str = Form(""),
     conversationHistory: str = Form("[]"),
-    ragKey: str = Form("")
+    ragKey: str = Form(""),
+    historyVersion: str = Form(""),
+    newMessages: str = Form("[]")
 ):
     """
     RAG 채팅 엔드포인트
@@ -48,11 +65,14 @@ async def rag_chat(
     - conversationId: 대화 ID
     - conversationHistory: 대화 히스토리 (JSON 문자열)
     - ragKey: VectorDB 위치
+    - historyVersion: 마지막으로 받은 history_version (0이면 newMessages로 전체 재동기화)
+    - newMessages: historyVersion 이후 새 메시지 (JSON 문자열)
     """
     try:
         # Form 데이터 파싱
         use_openai = useOpenAI.lower() == "true"
         conv_history = json.loads(conversationHistory) if conversationHistory else []
+        history_version, new_messages = parse_history_form(historyVersion, newMessages)
         
         print("===================")
         print(f"RAG Chat Request:")
@@ -70,8 +90,10 @@ async def rag_chat(
                 detail="RAG Key가 필요합니다. 먼저 문서를 임베딩해주세요."
             )
         
+        validate_rag_key(ragKey)
+        
         # VectorDB 경로 설정 및 확인
-        DB_INDEX = f"../backend/vectors/{ragKey}"
+        DB_INDEX = index_path(ragKey)
         
         # VectorDB 디렉토리가 존재하는지 확인
         if not os.path.exists(DB_INDEX):
@@ -81,8 +103,8 @@ async def rag_chat(
             )
         
         try:
-            embeddings = HuggingFaceEmbeddings(model_name="dragonkue/BGE-m3-ko")
-            vector_db = FAISS.load_local(DB_INDEX, embeddings, allow_dangerous_deserialization=True)
+            # 프로세스별 LRU 캐시 + mmap 로딩 (워커 간 페이지 캐시 공유)
+            vector_db = await run_in_threadpool(load_vector_store, ragKey)
             print(f"VectorDB 로딩 성공: {DB_INDEX}")
         except Exception as e:
             print(f"VectorDB 로딩 실패: {str(e)}")
@@ -91,46 +113,48 @@ async def rag_chat(
                 detail=f"VectorDB 로딩에 실패했습니다: {str(e)}"
             )
         
-        retriever = vector_db.as_retriever(search_kwargs={"k": 5})
+        await run_in_threadpool(vector_store_manager.touch, ragKey)
         
-        # RAG 시스템 프롬프트 설정
-        system_prompt = """당신은 문서 기반 질의응답을 도와주는 AI 어시스턴트입니다. 
-        제공된 문서 내용을 바탕으로 정확하고 유용한 답변을 제공하세요.
-        문서에 없는 내용에 대해서는 "문서에서 해당 내용을 찾을 수 없습니다"라고 답변하세요.
+        # 점수 분포로 청크 수를 정하고, 관련 문서가 없으면 LLM 호출 없이 종료
+        retriever = AdaptiveRetriever(vector_db)
         
-        ### Context
-        {docs}
-        """
-        
-        rag_prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("user", "{question}")
-        ])
-        
-        find_docs = retriever.invoke(message)
-        
-        
-        if use_openai:
-            llm = ChatOpenAI(model=selectedModel, temperature=0)
-        else:
-            llm = ChatOllama(model=selectedModel, temperature=0)
-            
-        chain = rag_prompt | llm
+        # 새 대화는 고유 ID를 발급 (서버 측 대화 상태가 다른 클라이언트와 섞이지 않도록) - 응답으로 돌려준다
+        conversation_id = conversationId or f"rag_{uuid.uuid4().hex}"
         
-        response = chain.invoke({"question": message, "docs": find_docs})
-        ai_response = response.content
+        # 검색 → 생성 그래프 실행 (타임아웃 / 재시도 / 서킷 브레이커 / 폴백 체인 적용)
+        try:
+            result = await chat_engine.run_turn(
+                tab_type="rag",
+                conversation_id=conversation_id,
+                message=message,
+                use_openai=use_openai,
+                select_model=selectedModel,
+                retriever=retriever,
+                retriever_key=f"{ragKey}:{RETRIEVAL_MAX_K}",
+                history_version=history_version,
+                new_messages=new_messages,
+            )
+        except HistoryConflictError as e:
+            raise history_conflict(e)
+        ai_response = result["response"]
+        retrieval = result["retrieval"]
 
-        print(f"RAG 응답 생성 완료: {len(ai_response)} 문자")
+        if retrieval.early_exit:
+            print(f"RAG early exit (LLM 호출 생략): top score {retrieval.top_score:.3f}")
+        else:
+            print(f"RAG 응답 생성 완료: {len(ai_response)} 문자 (k={len(retrieval.docs)}, top score {retrieval.top_score:.3f})")
         
         return {
             "response": ai_response,
-            "conversation_id": conversationId or f"rag_{len(conv_history)}",
+            "conversation_id": conversation_id,
             "model_info": {
-                "provider": "OpenAI" if use_openai else "Local",
-                "model": selectedModel
+                "provider": {"openai": "OpenAI", "none": "None"}.get(result["provider_used"], "Local"),
+                "model": result["model_used"]
             },
             "status": "success",
-            "rag_key": ragKey
+            "rag_key": ragKey,
+            "retrieval": retrieval.to_dict(),
+            "history_version": result["history_version"]
         }
         
     except json.JSONDecodeError as e:
@@ -145,15 +169,29 @@ async def rag_chat(
 
 @router.post("/embed")
 async def embed_documents(
-    files: List[UploadFile] = File([])
+    files: List[UploadFile] = File([]),
+    chunkTokens: int = Form(CHUNK_TOKENS),
+    chunkOverlap: int = Form(CHUNK_OVERLAP_TOKENS),
+    compression: str = Form(VECTOR_COMPRESSION)
 ):
     """
     문서 임베딩 엔드포인트
     - files: 임베딩할 파일들
+    - chunkTokens: 청크당 최대 토큰 수
+    - chunkOverlap: 인접 청크 간 겹치는 토큰 수
+    - compression: 벡터 저장 형식 (none / fp16 / sq8)
     """
+    temp_file_paths = []
     try:
         if not files:
             raise HTTPException(status_code=400, detail="No files provided")
+        try:
+            validate_chunk_params(chunkTokens, chunkOverlap)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        compression = compression.lower()
+        if compression not in COMPRESSION_TYPES:
+            raise HTTPException(status_code=400, detail=f"지원하지 않는 compression입니다: '{compression}' ({', '.join(COMPRESSION_TYPES)})")
         
         # Form 데이터 파싱
         
@@ -163,19 +201,24 @@ async def embed_documents(
         
         for file in files:
             
-            content = await file.read()
-            file.seek(0)
+            # 파일 전체를 메모리에 올리지 않고 블록 단위로 복사하면서 내용 해시 계산
+            digest = hashlib.sha256()
+            size = 0
+            with tempfile.NamedTemporaryFile(delete=False, prefix=UPLOAD_TEMP_PREFIX, suffix='.pdf') as temp_file:
+                while block := await file.read(UPLOAD_BLOCK_SIZE):
+                    digest.update(block)
+                    size += len(block)
+                    temp_file.write(block)
+                temp_file_paths.append(temp_file.name)
+            await file.seek(0)
             
             file_info.append({
                 "filename": file.filename,
                 "content_type": file.content_type,
-                "size": len(content)
+                "size": size,
+                "sha256": digest.hexdigest()
             })
             
-        with tempfile.NamedTemporaryFile(delete=False, suffix='.pdf') as temp_file:
-            temp_file.write(content)
-            temp_file_path = temp_file.name
-            
         print
         
         print(f"Document Embedding Request:")
@@ -187,21 +230,26 @@ async def embed_documents(
         rag_key = get_rag_key()
         
         
-        for file in files:
-            loader = PyPDFLoader(temp_file_path)
-            docs = loader.load()
-            
-            chunk = RecursiveCharacterTextSplitter(chunk_size = 1000, chunk_overlap = 50)
-            
-            split_docs.extend(chunk.split_documents(docs))
+        extraction = []
+        for info, temp_file_path in zip(file_info, temp_file_paths):
+            stats = ExtractionStats()
+            split_docs.extend(await run_in_threadpool(
+                load_and_split, temp_file_path, chunkTokens, chunkOverlap, info["filename"], info["sha256"], stats
+            ))
+            print(f"  Extracted {info['filename']}: {stats.pages_extracted}/{stats.pages_total} pages, "
+                  f"{stats.pages_per_sec} pages/sec, cache_hit={stats.cache_hit}, peak RSS {stats.peak_rss_mb} MB")
+            extraction.append({"filename": info["filename"], **stats.to_dict()})
             
-        embed_model = HuggingFaceEmbeddings(model_name ="dragonkue/BGE-m3-ko")
+        embed_model = get_embeddings()
         
-        vector_db = FAISS.from_documents(split_docs, embed_model)
+        vector_db = await run_in_threadpool(FAISS.from_documents, split_docs, embed_model)
         
         
-        DB_INDEX = f"../backend/vectors/{rag_key}"
-        vector_db.save_local(DB_INDEX)
+        index_meta = await run_in_threadpool(
+            save_vector_store, vector_db, rag_key, compression,
+            {"chunk_tokens": chunkTokens, "chunk_overlap": chunkOverlap},
+        )
+        await run_in_threadpool(vector_store_manager.register, rag_key, [info["filename"] for info in file_info], len(split_docs))
         
         # 임시 응답 (실제 구현 시 교체 필요)
         embedding_result = {
@@ -210,6 +258,11 @@ async def embed_documents(
             "files_processed": len(files),
             "vector_db": "Faiss",
             "files": [info["filename"] for info in file_info],
+            "chunks": len(split_docs),
+            "chunk_tokens": chunkTokens,
+            "chunk_overlap": chunkOverlap,
+            "compression": index_meta["compression"],
+            "extraction": extraction,
             "rag_key": rag_key
         }
         
@@ -218,6 +271,12 @@ async def embed_documents(
         
         return embedding_result
         
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Embedding failed: {str(e)}")
-        raise HTTPException(status_code=500, detail=f"Embedding failed: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Embedding failed: {str(e)}")
+    finally:
+        # 업로드 임시 파일은 성공/실패와 관계없이 삭제
+        for temp_file_path in temp_file_paths:
+            remove_temp_file(temp_file_path)
\ No newline at end of file
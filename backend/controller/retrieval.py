@@ -0,0 +1,124 @@
+"""
+점수 기반 적응형 검색
+
+- RETRIEVAL_MAX_K개 후보를 유사도 점수와 함께 가져온 뒤 점수 분포에 따라 실제로 쓸 청크 수(k)를 정한다.
+  최고 점수에서 RETRIEVAL_SCORE_MARGIN 이상 떨어지거나 RETRIEVAL_MIN_SCORE보다 낮은 후보는 버리되
+  최소 RETRIEVAL_MIN_K개는 남긴다.
+- 최고 점수가 RETRIEVAL_EARLY_EXIT_SCORE보다 낮으면 문서에 관련 내용이 없다고 보고
+  LLM을 호출하지 않고 바로 "찾을 수 없음" 답변을 돌려준다 (RETRIEVAL_EARLY_EXIT=false로 끌 수 있음).
+- 점수는 코사인 유사도다. FAISS(L2) 거리에서 환산하지 않고 질문 벡터와 인덱스에 저장된 벡터(reconstruct)로
+  직접 계산하므로, 정규화하지 않고 만든 이전 인덱스나 fp16 / sq8 압축 인덱스에서도 [-1, 1] 범위의 코사인 값이 나온다.
+"""
+
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+from langchain_core.documents import Document
+
+
+load_dotenv()
+
+# 가져올 후보 수 / 최소로 남길 청크 수
+RETRIEVAL_MAX_K = int(os.getenv("RETRIEVAL_MAX_K", "8"))
+RETRIEVAL_MIN_K = int(os.getenv("RETRIEVAL_MIN_K", "2"))
+# 이 점수보다 낮은 후보는 (최소 개수를 채울 때 외에는) 버림
+RETRIEVAL_MIN_SCORE = float(os.getenv("RETRIEVAL_MIN_SCORE", "0.35"))
+# 최고 점수와의 차이가 이보다 큰 후보는 버림
+RETRIEVAL_SCORE_MARGIN = float(os.getenv("RETRIEVAL_SCORE_MARGIN", "0.15"))
+# 최고 점수가 이보다 낮으면 LLM 호출 없이 "찾을 수 없음" 답변
+RETRIEVAL_EARLY_EXIT = os.getenv("RETRIEVAL_EARLY_EXIT", "true").lower() == "true"
+RETRIEVAL_EARLY_EXIT_SCORE = float(os.getenv("RETRIEVAL_EARLY_EXIT_SCORE", "0.25"))
+
+
+def cosine(query: np.ndarray, vector: np.ndarray) -> float:
+    """벡터 크기와 무관한 코사인 유사도"""
+    norm = float(np.linalg.norm(query) * np.linalg.norm(vector))
+    return float(np.dot(query, vector)) / norm if norm else 0.0
+
+
+def search_with_cosine(vector_db, question: str, k: int) -> List[Tuple[Document, float]]:
+    """FAISS 후보 k개를 (문서, 코사인 유사도)로 반환 - 점수 내림차순"""
+    query = np.asarray(vector_db.embeddings.embed_query(question), dtype="float32")
+    _, ids = vector_db.index.search(query.reshape(1, -1), k)
+    scored = []
+    for i in ids[0]:
+        if i == -1:
+            continue
+        doc = vector_db.docstore.search(vector_db.index_to_docstore_id[int(i)])
+        scored.append((doc, cosine(query, vector_db.index.reconstruct(int(i)))))
+    return sorted(scored, key=lambda item: item[1], reverse=True)
+
+
+@dataclass
+class RetrievalResult:
+    docs: List[Document] = field(default_factory=list)
+    scores: List[float] = field(default_factory=list)
+    candidate_scores: List[float] = field(default_factory=list)
+    # 점수 내림차순 후보 전체 (recall@k 측정용, 응답에는 포함하지 않음)
+    candidates: List[Document] = field(default_factory=list)
+    early_exit: bool = False
+
+    @property
+    def top_score(self) -> float:
+        return self.candidate_scores[0] if self.candidate_scores else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        """응답에 넣을 검색 정보 (임계값 튜닝용)"""
+        return {
+            "k": len(self.docs),
+            "top_score": round(self.top_score, 4),
+            "early_exit": self.early_exit,
+            "candidate_scores": [round(score, 4) for score in self.candidate_scores],
+            "chunks": [
+                {
+                    "source": doc.metadata.get("source"),
+                    "page": doc.metadata.get("page"),
+                    "chunk_index": doc.metadata.get("chunk_index"),
+                    "score": round(score, 4),
+                }
+                for doc, score in zip(self.docs, self.scores)
+            ],
+            "thresholds": {
+                "min_score": RETRIEVAL_MIN_SCORE,
+                "score_margin": RETRIEVAL_SCORE_MARGIN,
+                "early_exit_score": RETRIEVAL_EARLY_EXIT_SCORE if RETRIEVAL_EARLY_EXIT else None,
+                "min_k": RETRIEVAL_MIN_K,
+                "max_k": RETRIEVAL_MAX_K,
+            },
+        }
+
+
+def select_depth(scores: List[float]) -> int:
+    """점수 분포(내림차순)로 사용할 청크 수 결정"""
+    if not scores:
+        return 0
+    cutoff = max(RETRIEVAL_MIN_SCORE, scores[0] - RETRIEVAL_SCORE_MARGIN)
+    k = sum(1 for score in scores if score >= cutoff)
+    return min(len(scores), max(k, RETRIEVAL_MIN_K))
+
+
+class AdaptiveRetriever:
+    """VectorDB에서 점수와 함께 검색해 k를 동적으로 정하는 retriever (retriever.invoke와 같은 호출 형태)"""
+
+    def __init__(self, vector_db, max_k: int = RETRIEVAL_MAX_K):
+        self.vector_db = vector_db
+        self.max_k = max_k
+
+    def invoke(self, question: str) -> RetrievalResult:
+        scored = search_with_cosine(self.vector_db, question, self.max_k)
+        candidate_scores = [score for _, score in scored]
+        candidates = [doc for doc, _ in scored]
+
+        if RETRIEVAL_EARLY_EXIT and (not scored or candidate_scores[0] < RETRIEVAL_EARLY_EXIT_SCORE):
+            return RetrievalResult(candidate_scores=candidate_scores, candidates=candidates, early_exit=True)
+
+        k = select_depth(candidate_scores)
+        return RetrievalResult(
+            docs=[doc for doc, _ in scored[:k]],
+            scores=candidate_scores[:k],
+            candidate_scores=candidate_scores,
+            candidates=candidates,
+        )
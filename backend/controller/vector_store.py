@@ -0,0 +1,313 @@
+"""
+VectorDB(ragKey 인덱스) 수명 관리
+
+- 카탈로그: ragKey별 크기, 생성 시각, 마지막 사용 시각, 파일 목록을 SQLite에 기록 (워커 간 공유)
+- TTL: 마지막 사용 후 VECTOR_TTL_HOURS가 지난 인덱스 삭제
+- 용량 한도: 전체 크기가 VECTOR_QUOTA_MB를 넘으면 가장 오래 사용하지 않은 인덱스부터 삭제
+- 백그라운드 GC: VECTOR_GC_INTERVAL초마다 위 정리와 카탈로그/디스크 동기화, 남은 임시 업로드 파일 정리
+- /api/vectors 관리 엔드포인트는 관리자 전용 (ADMIN_TOKEN + X-Admin-Token 헤더)
+"""
+
+import asyncio
+import glob
+import json
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+from fastapi import APIRouter, Depends, HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from controller import index_cache
+from controller.admin_auth import require_admin
+
+
+load_dotenv()
+
+router = APIRouter(
+    prefix = "/api/vectors",
+    tags = ["vectors"],
+    responses={404:{"description": "Not Found"}},
+    # 다른 사용자의 ragKey 목록 조회 / 삭제 / GC가 가능하므로 관리자만 허용
+    dependencies=[Depends(require_admin)],
+)
+
+
+# 카탈로그 DB 위치
+VECTOR_CATALOG_DB = os.getenv("VECTOR_CATALOG_DB", "../backend/data/vector_catalog.db")
+# 마지막 사용 후 보관 시간(시간), 0이면 만료 없음
+VECTOR_TTL_HOURS = float(os.getenv("VECTOR_TTL_HOURS", "72"))
+# 전체 인덱스 용량 한도(MB), 0이면 한도 없음
+VECTOR_QUOTA_MB = float(os.getenv("VECTOR_QUOTA_MB", "2048"))
+# GC 주기(초), 0이면 백그라운드 GC 끔
+VECTOR_GC_INTERVAL = float(os.getenv("VECTOR_GC_INTERVAL", "600"))
+# 마지막 사용 시각 갱신 최소 간격(초) - 질문마다 DB에 쓰지 않도록
+TOUCH_INTERVAL = 60
+# 업로드 임시 파일 접두사 / 남은 임시 파일을 지울 기준 시간(초)
+UPLOAD_TEMP_PREFIX = "ragupload_"
+UPLOAD_TEMP_MAX_AGE = 3600
+
+RAG_KEY_PATTERN = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def directory_size(path: str) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def validate_rag_key(rag_key: str):
+    if not RAG_KEY_PATTERN.match(rag_key or ""):
+        raise HTTPException(status_code=400, detail=f"잘못된 RAG Key입니다: '{rag_key}'")
+
+
+def remove_temp_file(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        print(f"Failed to remove temp file {path}: {e}")
+
+
+class VectorStoreManager:
+    """ragKey 인덱스 카탈로그와 TTL / 용량 기반 정리"""
+
+    def __init__(self, path: str, ttl_hours: float, quota_mb: float):
+        self.path = path
+        self.ttl = ttl_hours * 3600
+        self.quota = int(quota_mb * 1024 * 1024)
+        self.local = threading.local()
+        self.touched: Dict[str, float] = {}
+        self.gc_lock = threading.Lock()
+        self.last_gc: Optional[Dict] = None
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS vector_stores ("
+                " rag_key TEXT PRIMARY KEY,"
+                " size_bytes INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " last_used_at REAL NOT NULL,"
+                " files TEXT NOT NULL DEFAULT '[]',"
+                " chunks INTEGER NOT NULL DEFAULT 0)"
+            )
+
+    def _connect(self) -> sqlite3.Connection:
+        # sqlite3 연결은 스레드 간 공유할 수 없으므로 스레드별로 하나씩 연다
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def _row(row) -> Dict:
+        rag_key, size_bytes, created_at, last_used_at, files, chunks = row
+        return {
+            "rag_key": rag_key,
+            "size_bytes": size_bytes,
+            "created_at": created_at,
+            "last_used_at": last_used_at,
+            "files": json.loads(files),
+            "chunks": chunks,
+        }
+
+    def register(self, rag_key: str, files: List[str], chunks: int):
+        """저장이 끝난 인덱스를 카탈로그에 등록"""
+        now = time.time()
+        size = directory_size(index_cache.index_path(rag_key))
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO vector_stores (rag_key, size_bytes, created_at, last_used_at, files, chunks)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (rag_key, size, now, now, json.dumps(files, ensure_ascii=False), chunks),
+            )
+
+    def touch(self, rag_key: str):
+        """마지막 사용 시각 갱신 (프로세스별로 TOUCH_INTERVAL마다 한 번만 기록)"""
+        now = time.time()
+        if now - self.touched.get(rag_key, 0.0) < TOUCH_INTERVAL:
+            return
+        self.touched[rag_key] = now
+        with self._connect() as conn:
+            conn.execute("UPDATE vector_stores SET last_used_at = ? WHERE rag_key = ?", (now, rag_key))
+
+    def get(self, rag_key: str) -> Optional[Dict]:
+        row = self._connect().execute(
+            "SELECT rag_key, size_bytes, created_at, last_used_at, files, chunks FROM vector_stores WHERE rag_key = ?",
+            (rag_key,),
+        ).fetchone()
+        return self._row(row) if row else None
+
+    def list(self) -> List[Dict]:
+        rows = self._connect().execute(
+            "SELECT rag_key, size_bytes, created_at, last_used_at, files, chunks FROM vector_stores ORDER BY last_used_at DESC"
+        ).fetchall()
+        return [self._row(row) for row in rows]
+
+    def delete(self, rag_key: str) -> bool:
+        """인덱스 디렉터리와 카탈로그 항목 삭제"""
+        path = index_cache.index_path(rag_key)
+        existed = os.path.exists(path)
+        index_cache.evict(rag_key)
+        shutil.rmtree(path, ignore_errors=True)
+        with self._connect() as conn:
+            deleted = conn.execute("DELETE FROM vector_stores WHERE rag_key = ?", (rag_key,)).rowcount
+        self.touched.pop(rag_key, None)
+        return existed or deleted > 0
+
+    def sync(self) -> Dict[str, int]:
+        """카탈로그와 디스크 상태 맞추기 - 카탈로그에 없는 디렉터리는 등록, 디렉터리가 없는 항목은 제거"""
+        on_disk = set()
+        if os.path.isdir(index_cache.VECTOR_DIR):
+            with os.scandir(index_cache.VECTOR_DIR) as entries:
+                on_disk = {entry.name for entry in entries if entry.is_dir()}
+        cataloged = {row[0] for row in self._connect().execute("SELECT rag_key FROM vector_stores").fetchall()}
+
+        added = 0
+        with self._connect() as conn:
+            for rag_key in on_disk - cataloged:
+                path = index_cache.index_path(rag_key)
+                mtime = os.path.getmtime(path)
+                conn.execute(
+                    "INSERT OR IGNORE INTO vector_stores (rag_key, size_bytes, created_at, last_used_at) VALUES (?, ?, ?, ?)",
+                    (rag_key, directory_size(path), mtime, mtime),
+                )
+                added += 1
+            missing = cataloged - on_disk
+            conn.executemany("DELETE FROM vector_stores WHERE rag_key = ?", [(rag_key,) for rag_key in missing])
+        return {"added": added, "removed": len(missing)}
+
+    def collect(self) -> Dict:
+        """만료 / 용량 초과 인덱스 삭제 및 남은 임시 업로드 파일 정리"""
+        with self.gc_lock:
+            started = time.time()
+            synced = self.sync()
+            expired, evicted = [], []
+
+            if self.ttl > 0:
+                rows = self._connect().execute(
+                    "SELECT rag_key FROM vector_stores WHERE last_used_at < ?", (started - self.ttl,)
+                ).fetchall()
+                for (rag_key,) in rows:
+                    self.delete(rag_key)
+                    expired.append(rag_key)
+
+            rows = self._connect().execute(
+                "SELECT rag_key, size_bytes FROM vector_stores ORDER BY last_used_at ASC"
+            ).fetchall()
+            total = sum(size for _, size in rows)
+            if self.quota > 0:
+                for rag_key, size in rows:
+                    if total <= self.quota:
+                        break
+                    self.delete(rag_key)
+                    evicted.append(rag_key)
+                    total -= size
+
+            temp_removed = 0
+            for path in glob.glob(os.path.join(tempfile.gettempdir(), f"{UPLOAD_TEMP_PREFIX}*")):
+                try:
+                    if started - os.path.getmtime(path) > UPLOAD_TEMP_MAX_AGE:
+                        remove_temp_file(path)
+                        temp_removed += 1
+                except OSError:
+                    pass
+
+            self.last_gc = {
+                "ran_at": started,
+                "elapsed_ms": round((time.time() - started) * 1000, 2),
+                "synced": synced,
+                "expired": expired,
+                "evicted": evicted,
+                "temp_files_removed": temp_removed,
+                "total_bytes": total,
+            }
+            if expired or evicted or temp_removed:
+                print(f"Vector GC: expired={len(expired)}, evicted={len(evicted)}, temp_files={temp_removed}, total={total} bytes")
+            return self.last_gc
+
+
+# 전역 VectorDB 관리자 인스턴스
+vector_store_manager = VectorStoreManager(VECTOR_CATALOG_DB, VECTOR_TTL_HOURS, VECTOR_QUOTA_MB)
+
+_gc_task: Optional[asyncio.Task] = None
+
+
+async def _gc_loop():
+    while True:
+        try:
+            await run_in_threadpool(vector_store_manager.collect)
+        except Exception as e:
+            print(f"Vector GC failed: {e}")
+        await asyncio.sleep(VECTOR_GC_INTERVAL)
+
+
+def start_gc():
+    global _gc_task
+    if VECTOR_GC_INTERVAL > 0 and _gc_task is None:
+        _gc_task = asyncio.create_task(_gc_loop())
+
+
+async def stop_gc():
+    global _gc_task
+    if _gc_task is not None:
+        _gc_task.cancel()
+        try:
+            await _gc_task
+        except asyncio.CancelledError:
+            pass
+        _gc_task = None
+
+
+@router.get("")
+async def list_vector_stores():
+    """저장된 VectorDB 목록 (최근 사용 순)"""
+    stores = await run_in_threadpool(vector_store_manager.list)
+    return {
+        "stores": stores,
+        "count": len(stores),
+        "total_bytes": sum(store["size_bytes"] for store in stores),
+        "quota_bytes": vector_store_manager.quota,
+        "ttl_hours": VECTOR_TTL_HOURS,
+        "last_gc": vector_store_manager.last_gc,
+    }
+
+
+@router.get("/{rag_key}")
+async def get_vector_store(rag_key: str):
+    validate_rag_key(rag_key)
+    store = await run_in_threadpool(vector_store_manager.get, rag_key)
+    if store is None:
+        raise HTTPException(status_code=404, detail=f"VectorDB를 찾을 수 없습니다: '{rag_key}'")
+    store["metadata"] = await run_in_threadpool(index_cache.read_metadata, rag_key)
+    return store
+
+
+@router.delete("/{rag_key}")
+async def delete_vector_store(rag_key: str):
+    validate_rag_key(rag_key)
+    if not await run_in_threadpool(vector_store_manager.delete, rag_key):
+        raise HTTPException(status_code=404, detail=f"VectorDB를 찾을 수 없습니다: '{rag_key}'")
+    return {"status": "deleted", "rag_key": rag_key}
+
+
+@router.post("/gc")
+async def run_vector_gc():
+    """GC 즉시 실행"""
+    return await run_in_threadpool(vector_store_manager.collect)
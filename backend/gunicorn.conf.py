@@ -0,0 +1,46 @@
+"""
+운영 모드 gunicorn 설정 (python run.py --prod 또는 gunicorn -c gunicorn.conf.py main:app)
+
+- preload_app: 마스터 프로세스에서 앱과 임베딩 모델을 먼저 로드한 뒤 fork하므로
+  워커들이 모델 가중치 메모리를 copy-on-write로 공유한다.
+- FAISS 인덱스는 controller/index_cache.py에서 mmap으로 열어 OS 페이지 캐시를 공유한다.
+- 승인 제어 한도(LLM_MAX_CONCURRENCY_*, LLM_QUEUE_MAX)는 서버 전체 값으로 보고, post_fork에서
+  실제 워커 수(-w 옵션 포함)로 나눠 워커마다 적용한다.
+- 대화 상태와 제목/요약을 워커 간에 공유하려면 CONVERSATION_STORE=sqlite를 사용한다 (Docker 이미지 기본값).
+  memory 저장소를 쓸 경우 앞단 프록시에서 conversation_id 기준 sticky 라우팅을 설정한다.
+"""
+
+import multiprocessing
+import os
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8001')}"
+workers = int(os.getenv("WEB_CONCURRENCY", multiprocessing.cpu_count()))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+# LLM 응답이 오래 걸릴 수 있으므로 넉넉하게 설정
+timeout = int(os.getenv("WORKER_TIMEOUT", "300"))
+graceful_timeout = 30
+keepalive = 5
+loglevel = "info"
+
+
+def on_starting(server):
+    if server.cfg.workers > 1 and os.getenv("CONVERSATION_STORE", "memory").lower() != "sqlite":
+        server.log.warning(
+            "CONVERSATION_STORE=memory로 워커 %d개를 실행합니다 - 대화 상태가 워커마다 따로 저장되므로 "
+            "CONVERSATION_STORE=sqlite 또는 conversation_id 기준 sticky 라우팅이 필요합니다", server.cfg.workers,
+        )
+    # fork 전에 임베딩 모델을 로드해 워커들이 가중치를 공유하도록 한다
+    if os.getenv("PRELOAD_EMBEDDINGS", "true").lower() == "true":
+        from controller.index_cache import get_embeddings
+        get_embeddings()
+
+
+def post_fork(server, worker):
+    # 서버 전체 승인 제어 한도를 실제 워커 수로 나눠 이 워커의 한도로 사용 (요청을 받기 전에 설정)
+    from controller.admission import admission_controller
+    admission_controller.set_workers(server.cfg.workers)
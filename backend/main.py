@@ -1,5 +1,6 @@
 from fastapi import FastAPI, HTTPException, UploadFile, File, Form
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import List, Optional, Dict, Any
 import os
@@ -11,11 +12,30 @@ from controller import qna
 from controller import rag
 from controller import compare
 from controller import quality
+from controller import admission
+from controller import call_policy
+from controller import pdf_extract
+from controller import vector_store
+from controller import ollama_session
+from controller import coalescing
+from controller import profiling
+from controller import conversation_summary
+from controller.compression import CompressionMiddleware
+
+try:
+    # orjson이 설치되어 있으면 더 빠른 orjson으로 응답 직렬화
+    import orjson  # noqa: F401
+    from fastapi.responses import ORJSONResponse as DefaultResponse
+except ImportError:
+    DefaultResponse = JSONResponse
 
 # 환경 변수 로드
 load_dotenv()
 
-app = FastAPI(title="AI Chat API", version="1.0.0")
+app = FastAPI(title="AI Chat API", version="1.0.0", default_response_class=DefaultResponse)
+
+# 큰 응답은 br/gzip으로 압축 (스트리밍 응답 제외)
+app.add_middleware(CompressionMiddleware)
 
 # CORS 설정
 app.add_middleware(
@@ -30,6 +50,31 @@ app.include_router(qna.router)
 app.include_router(rag.router)
 app.include_router(compare.router)
 app.include_router(quality.router)
+app.include_router(admission.router)
+app.include_router(call_policy.router)
+app.include_router(vector_store.router)
+app.include_router(ollama_session.router)
+app.include_router(coalescing.router)
+app.include_router(profiling.router)
+app.include_router(conversation_summary.router)
+
+
+@app.on_event("startup")
+async def startup():
+    # VectorDB TTL / 용량 정리 작업 시작
+    vector_store.start_gc()
+    # 고정할 Ollama 모델 미리 로드
+    ollama_session.start_preload()
+    # 대화 제목 / 요약 백그라운드 작업 시작
+    conversation_summary.start_summary_workers()
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    await vector_store.stop_gc()
+    await conversation_summary.stop_summary_workers()
+    # PDF 추출 프로세스 풀 정리
+    pdf_extract.shutdown_pool()
 
 
 @app.get("/")
@@ -42,4 +87,4 @@ async def health_check():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8002)
+    uvicorn.run(app, host=os.getenv("HOST", "0.0.0.0"), port=int(os.getenv("PORT", "8001")))
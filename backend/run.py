@@ -1,21 +1,54 @@
 #!/usr/bin/env python3
 """
 FastAPI + LangGraph 백엔드 서버 실행 스크립트
+
+    python run.py            # 개발 모드 (단일 프로세스, 코드 변경 시 자동 재시작)
+    python run.py --prod     # 운영 모드 (gunicorn + uvicorn 워커 N개, gunicorn.conf.py 참고)
 """
 
+import argparse
+import os
+import sys
+
 import uvicorn
-from main import app
+from dotenv import load_dotenv
 
-if __name__ == "__main__":
+load_dotenv()
+
+HOST = os.getenv("HOST", "0.0.0.0")
+PORT = int(os.getenv("PORT", "8001"))
+
+
+def run_dev():
     print("🚀 AI Chat Backend 서버를 시작합니다...")
-    print("📍 서버 주소: http://localhost:8001")
-    print("📚 API 문서: http://localhost:8001/docs")
+    print(f"📍 서버 주소: http://localhost:{PORT}")
+    print(f"📚 API 문서: http://localhost:{PORT}/docs")
     print("🔧 LangGraph 워크플로우가 활성화되었습니다.")
     
     uvicorn.run(
-        app,
-        host="0.0.0.0",
-        port=8001,
+        "main:app",
+        host=HOST,
+        port=PORT,
         reload=True,  # 개발 모드에서 코드 변경 시 자동 재시작
         log_level="info"
     )
+
+
+def run_prod(workers=None):
+    # gunicorn 프로세스로 교체 - 설정은 gunicorn.conf.py에서 읽는다
+    if workers:
+        os.environ["WEB_CONCURRENCY"] = str(workers)
+    print(f"🚀 운영 모드로 시작합니다 (workers={os.getenv('WEB_CONCURRENCY', 'auto')}, port={PORT})")
+    os.execvp(sys.executable, [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AI Chat Backend")
+    parser.add_argument("--prod", action="store_true", help="운영 모드 (멀티 워커)")
+    parser.add_argument("--workers", type=int, default=None, help="워커 프로세스 수 (기본값: WEB_CONCURRENCY 또는 CPU 코어 수)")
+    args = parser.parse_args()
+
+    if args.prod:
+        run_prod(args.workers)
+    else:
+        run_dev()
@@ -0,0 +1,15 @@
+from controller.admission import AdmissionController
+
+
+def test_set_workers_splits_server_wide_limits():
+    controller = AdmissionController({"openai": 16, "ollama": 2}, model_limit=4, queue_max=32, queue_timeout=1)
+
+    controller.set_workers(4)
+
+    assert controller.provider_limits == {"openai": 4, "ollama": 1}
+    assert controller.model_limit == 1
+    assert controller.queue_max == 8
+    assert controller._provider_semaphore("openai")._value == 4
+    # 서버 전체 값은 그대로 남아 다시 나눌 수 있다
+    controller.set_workers(2)
+    assert controller.provider_limits["openai"] == 8
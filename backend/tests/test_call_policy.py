@@ -0,0 +1,61 @@
+import asyncio
+
+from controller.call_policy import Candidate, CallPolicy, CircuitBreaker
+
+
+def test_cancelled_half_open_trial_releases_breaker():
+    async def scenario():
+        policy = CallPolicy()
+        candidate = Candidate("mock", "mock")
+        breaker = policy.breaker(candidate)
+        # 열린 지 reset_timeout이 지난 상태 - 다음 호출이 half_open 시험 호출이 된다
+        breaker.state = "open"
+        breaker.opened_at = -breaker.reset_timeout - 1
+
+        started = asyncio.Event()
+
+        async def hang(llm):
+            started.set()
+            await asyncio.sleep(3600)
+
+        task = asyncio.create_task(policy._call_candidate(candidate, hang, 0.7))
+        await started.wait()
+        assert breaker.state == "half_open" and breaker.trial_in_progress
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+
+        assert not breaker.trial_in_progress
+        assert breaker.allow()
+
+    asyncio.run(scenario())
+
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+
+def test_summary_policy_does_not_share_user_admission_or_breakers():
+    from controller.admission import admission_controller
+    from controller.call_policy import call_policy
+    from controller.conversation_summary import summary_policy
+
+    user_admitted = admission_controller.admitted.get("mock", 0)
+
+    async def scenario():
+        result, _ = await summary_policy.ainvoke(False, "mock", lambda llm: llm.ainvoke("요약"))
+        assert result.content
+
+    asyncio.run(scenario())
+
+    assert summary_policy.admission is not admission_controller
+    assert summary_policy.admission.admitted.get("mock") == 1
+    assert admission_controller.admitted.get("mock", 0) == user_admitted
+    assert "mock:mock" in summary_policy.breakers and "mock:mock" not in call_policy.breakers
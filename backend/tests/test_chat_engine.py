@@ -0,0 +1,61 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from controller.chat_engine import SqliteConversationStore
+
+
+def _contents(conversation):
+    return [m.content for m in conversation.messages[conversation.base:]]
+
+
+def test_reset_by_other_worker_is_detected_even_with_longer_history(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "conversations.db")
+        worker_a, worker_b = SqliteConversationStore(path), SqliteConversationStore(path)
+
+        conv_a = worker_a.get_or_create("qna", "c1")
+        conv_a.append(HumanMessage(content="old question"))
+        conv_a.append(AIMessage(content="old answer"))
+        await worker_a.persist(conv_a)
+
+        # 다른 워커가 historyVersion=0으로 초기화하고 더 긴 히스토리로 다시 채운다
+        conv_b = worker_b.get_or_create("qna", "c1")
+        await worker_b.refresh(conv_b)
+        await worker_b.reset(conv_b)
+        conv_b.seed([
+            {"role": "user", "content": "q1"}, {"role": "assistant", "content": "a1"},
+            {"role": "user", "content": "q2"}, {"role": "assistant", "content": "a2"},
+        ])
+        await worker_b.persist(conv_b)
+
+        await worker_a.refresh(conv_a)
+        assert _contents(conv_a) == ["q1", "a1", "q2", "a2"]
+
+    asyncio.run(scenario())
+
+
+def test_persist_after_concurrent_reset_does_not_leave_gaps(tmp_path):
+    async def scenario():
+        path = str(tmp_path / "conversations.db")
+        worker_a, worker_b = SqliteConversationStore(path), SqliteConversationStore(path)
+
+        conv_a = worker_a.get_or_create("qna", "c1")
+        conv_a.append(HumanMessage(content="q1"))
+        await worker_a.persist(conv_a)
+
+        conv_b = worker_b.get_or_create("qna", "c1")
+        await worker_b.reset(conv_b)
+
+        # A는 초기화를 모른 채 새 메시지를 저장 - 이전 세대의 위치(seq 1)에 쓰지 않아야 한다
+        conv_a.append(AIMessage(content="a1"))
+        await worker_a.persist(conv_a)
+
+        reader = SqliteConversationStore(path)
+        fresh = reader.get_or_create("qna", "c1")
+        await reader.refresh(fresh)
+        assert _contents(fresh) == ["a1"]
+        seqs = [row[0] for row in reader._connect().execute("SELECT seq FROM messages ORDER BY seq")]
+        assert seqs == [0]
+
+    asyncio.run(scenario())
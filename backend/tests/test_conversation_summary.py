@@ -0,0 +1,41 @@
+import asyncio
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from controller import chat_engine as chat_engine_module
+from controller.chat_engine import ChatEngine
+from controller.conversation_summary import SummaryQueue, SummaryStore, summary_policy
+
+
+def test_summary_uses_snapshot_not_later_messages():
+    async def scenario():
+        queue = SummaryQueue(SummaryStore(), "mock", 1, 8, summary_policy)
+        queue.start()
+        messages = [HumanMessage(content="q1"), AIMessage(content="a1")]
+        queue.schedule("c1", messages)
+        # 스냅샷을 넘긴 뒤 다음 턴의 (아직 답이 없는) 질문이 추가되어도 요약에는 들어가지 않는다
+        messages.append(HumanMessage(content="q2"))
+        await queue.queue.join()
+        await queue.stop()
+        return queue.store.get("c1")
+
+    record = asyncio.run(scenario())
+    assert record["message_count"] == 2
+
+
+def test_compare_turn_schedules_model_and_shared_summaries(monkeypatch):
+    scheduled = {}
+
+    class Recorder:
+        def schedule(self, conversation_id, messages):
+            scheduled[conversation_id] = [m.content for m in messages]
+
+    monkeypatch.setattr(chat_engine_module, "summary_queue", Recorder())
+    engine = ChatEngine()
+    asyncio.run(engine.run_turn(
+        tab_type="compare", conversation_id="compare_x:mock", message="질문", use_openai=False,
+        select_model="mock", summary_id="compare_x:mock", shared_summary_id="compare_x",
+    ))
+
+    assert len(scheduled["compare_x:mock"]) == 2
+    assert scheduled["compare_x"] == ["질문"]
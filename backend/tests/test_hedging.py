@@ -0,0 +1,101 @@
+import asyncio
+
+from controller import hedging
+from controller.admission import AdmissionController
+from controller.hedging import HedgeManager
+
+
+class FakeChunk:
+    def __init__(self, content):
+        self.content = content
+
+    def __add__(self, other):
+        return FakeChunk(self.content + other.content)
+
+
+class SlowThenFastLLM:
+    """첫 호출은 첫 토큰이 늦고, 두 번째 호출(헤지)은 바로 응답"""
+
+    def __init__(self, first_delay):
+        self.calls = 0
+        self.first_delay = first_delay
+
+    async def astream(self, input):
+        self.calls += 1
+        await asyncio.sleep(self.first_delay if self.calls == 1 else 0.01)
+        yield FakeChunk("ok")
+
+
+def test_try_slot_does_not_wait_when_saturated():
+    async def scenario():
+        controller = AdmissionController({"mock": 1}, 1, 8, 30)
+        async with controller.slot("mock", "m"):
+            async with controller.try_slot("mock", "m") as acquired:
+                assert not acquired
+        async with controller.try_slot("mock", "m") as acquired:
+            assert acquired
+
+    asyncio.run(asyncio.wait_for(scenario(), timeout=1))
+
+
+def test_hedge_skipped_without_free_slot(monkeypatch):
+    async def scenario():
+        controller = AdmissionController({"mock": 1}, 1, 8, 30)
+        monkeypatch.setattr(hedging, "admission_controller", controller)
+        manager = HedgeManager()
+        stats = manager._stats("mock:m")
+        stats.ttft_samples.extend([0.01] * hedging.HEDGE_MIN_SAMPLES)
+        stats.requests = 100
+
+        llm = SlowThenFastLLM(first_delay=0.3)
+        async with controller.slot("mock", "m"):
+            result = await manager.run("mock", "m", llm, "hi")
+        assert result.content == "ok"
+        assert llm.calls == 1
+        assert stats.hedges_fired == 0 and stats.slot_unavailable == 1
+
+    asyncio.run(scenario())
+
+
+def test_losing_primary_ttft_is_recorded(monkeypatch):
+    async def scenario():
+        controller = AdmissionController({"mock": 4}, 4, 8, 30)
+        monkeypatch.setattr(hedging, "admission_controller", controller)
+        manager = HedgeManager()
+        stats = manager._stats("mock:m")
+        stats.ttft_samples.extend([0.01] * hedging.HEDGE_MIN_SAMPLES)
+        stats.requests = 100
+
+        await manager.run("mock", "m", SlowThenFastLLM(first_delay=1.0), "hi")
+        assert stats.hedges_won == 1
+        # 진 첫 시도는 헤지 지연(0.2초 하한) 이상 기다렸으므로 그만큼의 표본이 남아야 한다
+        assert max(stats.ttft_samples) >= hedging.HEDGE_MIN_DELAY
+
+    asyncio.run(scenario())
+
+
+def test_winning_attempt_chunks_are_streamed(monkeypatch):
+    class TwoChunkLLM(SlowThenFastLLM):
+        async def astream(self, input):
+            self.calls += 1
+            call = self.calls
+            await asyncio.sleep(self.first_delay if call == 1 else 0.01)
+            yield FakeChunk(f"{call}a")
+            yield FakeChunk(f"{call}b")
+
+    async def scenario():
+        controller = AdmissionController({"mock": 4}, 4, 8, 30)
+        monkeypatch.setattr(hedging, "admission_controller", controller)
+        manager = HedgeManager()
+        stats = manager._stats("mock:m")
+        stats.ttft_samples.extend([0.01] * hedging.HEDGE_MIN_SAMPLES)
+        stats.requests = 100
+
+        streamed = []
+        result = await manager.run("mock", "m", TwoChunkLLM(first_delay=1.0), "hi",
+                                   on_chunk=lambda attempt, chunk: streamed.append(chunk.content))
+        # 헤지(두 번째 호출)가 이겼으므로 그 청크만 순서대로 전달된다
+        assert streamed == ["2a", "2b"]
+        assert result.content == "2a2b"
+
+    asyncio.run(scenario())
@@ -0,0 +1,38 @@
+import asyncio
+
+from controller import call_policy as call_policy_module
+from controller import ollama_session
+from controller.call_policy import Candidate, CallPolicy
+from controller.ollama_session import OllamaSessionManager
+
+
+def test_hot_models_get_finite_keep_alive(monkeypatch):
+    monkeypatch.setattr(ollama_session, "OLLAMA_PINNED_MODELS", ["pinned:latest"])
+    manager = OllamaSessionManager()
+    for _ in range(ollama_session.OLLAMA_HOT_USES):
+        manager.note_use("busy:latest")
+
+    assert manager.keep_alive_for("pinned:latest") == -1
+    assert manager.keep_alive_for("busy:latest") == ollama_session.OLLAMA_HOT_KEEP_ALIVE
+    assert manager.keep_alive_for("idle:latest") == ollama_session.OLLAMA_KEEP_ALIVE
+    assert manager.get_llm("idle:latest").num_ctx is None
+
+
+def test_retries_count_as_one_use(monkeypatch):
+    manager = OllamaSessionManager()
+    monkeypatch.setattr(call_policy_module, "ollama_sessions", manager)
+    monkeypatch.setattr(call_policy_module, "MAX_RETRIES", 2)
+    policy = CallPolicy()
+    monkeypatch.setattr(policy, "backoff", lambda attempt: 0)
+    attempts = []
+
+    async def flaky(llm):
+        attempts.append(llm)
+        if len(attempts) < 3:
+            raise ConnectionError("temporary")
+        return "ok"
+
+    result = asyncio.run(policy._call_candidate(Candidate("ollama", "busy:latest"), flaky, 0.7))
+
+    assert result == "ok" and len(attempts) == 3
+    assert manager.recent_uses("busy:latest") == 1
@@ -0,0 +1,52 @@
+import pytest
+from langchain_community.vectorstores import FAISS
+from langchain_core.embeddings import Embeddings
+
+from controller.index_cache import compress_index
+from controller.retrieval import AdaptiveRetriever, search_with_cosine
+
+
+class ScaledEmbeddings(Embeddings):
+    """크기가 제각각인(정규화하지 않은) 벡터를 돌려주는 임베딩"""
+
+    VECTORS = {
+        "query": [1.0, 0.0, 0.0, 0.0],
+        "same direction": [10.0, 0.0, 0.0, 0.0],
+        "diagonal": [1.5, 1.5, 0.0, 0.0],
+        "orthogonal": [0.0, 0.2, 0.0, 0.0],
+    }
+
+    def embed_documents(self, texts):
+        return [self.VECTORS[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.VECTORS[text]
+
+
+def build_store():
+    return FAISS.from_texts(["same direction", "diagonal", "orthogonal"], ScaledEmbeddings())
+
+
+def test_scores_are_cosine_for_unnormalized_vectors():
+    scored = search_with_cosine(build_store(), "query", 3)
+
+    assert [doc.page_content for doc, _ in scored] == ["same direction", "diagonal", "orthogonal"]
+    assert [score for _, score in scored] == pytest.approx([1.0, 0.7071, 0.0], abs=1e-3)
+
+
+def test_scores_stay_cosine_on_quantized_index():
+    store = build_store()
+    store.index = compress_index(store.index, "sq8")
+
+    scores = dict((doc.page_content, score) for doc, score in search_with_cosine(store, "query", 3))
+
+    assert scores["same direction"] == pytest.approx(1.0, abs=0.02)
+    assert all(-1.0 <= score <= 1.0 for score in scores.values())
+
+
+def test_adaptive_retriever_keeps_relevant_unnormalized_match():
+    result = AdaptiveRetriever(build_store(), max_k=3).invoke("query")
+
+    assert not result.early_exit
+    assert result.top_score == pytest.approx(1.0, abs=1e-3)
+    assert result.docs[0].page_content == "same direction"
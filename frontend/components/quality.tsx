@@ -13,19 +13,21 @@ import { Sparkles, ChevronDown, ChevronUp } from "lucide-react"
 interface QualityProps {
     messages: Message[]
     isLoading: boolean
-    onSendQualityMessage: (content: string) => void
+    onSendQualityMessage: (content: string, enhance?: boolean) => void
     onSendHighQualityMessage: (orgQuestion: string, orgAnswer: string) => Promise<string>
 }
 
 export function Quality({ messages, isLoading, onSendQualityMessage, onSendHighQualityMessage }: QualityProps) {
     const [inputValue, setInputValue] = useState("")
+    // 자동 향상: 켜면 초안 직후 서버에서 gpt-4o 향상 단계까지 실행 (기본 꺼짐 - 필요할 때만 추가 호출)
+    const [autoEnhance, setAutoEnhance] = useState(false)
     const [enhancedMessages, setEnhancedMessages] = useState<{[key: string]: string}>({})
     const [expandedMessages, setExpandedMessages] = useState<{[key: string]: boolean}>({})
     const [enhancingMessages, setEnhancingMessages] = useState<{[key: string]: boolean}>({})
 
     const handleSendMessage = () => {
         if (inputValue.trim() && !isLoading) {
-            onSendQualityMessage(inputValue)
+            onSendQualityMessage(inputValue, autoEnhance)
             setInputValue("")
         }
     }
@@ -317,6 +319,17 @@ export function Quality({ messages, isLoading, onSendQualityMessage, onSendHighQ
                             </svg>
                         </Button>
                     </form>
+                    <label className="mt-2 flex items-center gap-2 text-xs text-gray-600 select-none">
+                        <input
+                            type="checkbox"
+                            checked={autoEnhance}
+                            onChange={(e) => setAutoEnhance(e.target.checked)}
+                            disabled={isLoading}
+                            className="h-3.5 w-3.5 accent-blue-600"
+                        />
+                        <Sparkles className="w-3 h-3 text-blue-600" />
+                        자동 향상 (초안 후 gpt-4o 향상 답변을 미리 생성)
+                    </label>
                 </div>
             </div>
         </div>
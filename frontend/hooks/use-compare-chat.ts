@@ -1,4 +1,4 @@
-import { useState, useCallback } from "react"
+import { useState, useCallback, useRef } from "react"
 import type { Message, ChatRequest } from "@/types/chat"
 import {chatApi} from "@/lib/api-client"
 import {useBaseChat} from "./use-base-chat"
@@ -9,6 +9,8 @@ export function useCompareChat() {
     
     // 3열 UI를 위한 비교 메시지 상태
     const [comparisonMessages, setComparisonMessages] = useState<any[]>([])
+    // 모델별 서버 대화의 히스토리 버전 (없으면 아직 동기화 전)
+    const historyVersions = useRef<Record<string, number>>({})
 
     const sendCompareMessage = useCallback(
         async(content: string,
@@ -51,19 +53,36 @@ export function useCompareChat() {
                     timestamp: msg.timestamp.toISOString()
                 }))
 
+                // 새 대화면 3개 모델 요청이 같은 대화 ID를 쓰도록 여기서 한 번만 만든다
+                // (비워 보내면 서버가 요청마다 다른 ID를 발급한다)
+                const conversationId = currentChatId || `compare_${Date.now().toString(36)}${Math.random().toString(36).slice(2, 10)}`
+
                 // 3개 모델을 동시에 요청하고 응답이 오는 순서대로 스트리밍
                 const modelRequests = Object.entries(modelConfig?.selectedModels || {}).map(async ([modelKey, modelName], index) => {
-                    const formData = new FormData()
-                    formData.append('message', content)
-                    formData.append('conversationId', currentChatId || '')
-                    formData.append('conversationHistory', JSON.stringify(conversationHistory))
-                    formData.append('selectedModel', modelName)
-
-                    const apiUrl = process.env.NEXT_PUBLIC_API_URL  
-                    const response = await fetch(`${apiUrl}/chat/compare`, {
-                        method: 'POST',
-                        body: formData,
-                    })
+                    // 전체 히스토리 대신 히스토리 버전과 그 이후 새 메시지만 전송 (버전 0이면 전체 재동기화)
+                    const send = (version: number, newMessages: typeof conversationHistory) => {
+                        const formData = new FormData()
+                        formData.append('message', content)
+                        formData.append('conversationId', conversationId)
+                        formData.append('historyVersion', version.toString())
+                        formData.append('newMessages', JSON.stringify(newMessages))
+                        formData.append('selectedModel', modelName)
+
+                        const apiUrl = process.env.NEXT_PUBLIC_API_URL  
+                        return fetch(`${apiUrl}/chat/compare`, {
+                            method: 'POST',
+                            body: formData,
+                        })
+                    }
+
+                    const knownVersion = historyVersions.current[modelName]
+                    let response = knownVersion === undefined
+                        ? await send(0, conversationHistory)
+                        : await send(knownVersion, [])
+                    if (response.status === 409) {
+                        // 서버와 버전이 다르면 전체 히스토리로 다시 맞춘다
+                        response = await send(0, conversationHistory)
+                    }
 
                     if (!response.ok) {
                         throw new Error(`HTTP error! status: ${response.status}`)
@@ -71,6 +90,9 @@ export function useCompareChat() {
 
                     const data = await response.json()
                     console.log(`Model ${modelName} Response:`, data)
+                    if (typeof data.history_version === "number") {
+                        historyVersions.current[modelName] = data.history_version
+                    }
                     
                     return { modelKey, modelName, data, index }
                 })
@@ -150,6 +172,7 @@ export function useCompareChat() {
     const clearCompareChat = useCallback(() => {
         setMessages([])
         setComparisonMessages([])
+        historyVersions.current = {}
         clearChat()
     }, [clearChat])
 
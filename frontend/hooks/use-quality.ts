@@ -1,16 +1,18 @@
 "use client"
 
-import { useState, useCallback } from "react"
+import { useState, useCallback, useRef } from "react"
 import type { Message, ChatRequest } from "@/types/chat"
 import { useBaseChat } from "./use-base-chat"
 
 export function useQuality() {
   const { isLoading, currentChatId, setIsLoading, clearChat, setChatId } = useBaseChat()
   const [messages, setMessages] = useState<Message[]>([])
+  // 파이프라인에서 서버가 미리 만들어 둔 향상된 답변 (key: 초안 답변)
+  const enhancedAnswers = useRef<{ [draft: string]: string }>({})
 
 
   const sendQualityMessage = useCallback(
-    async (content: string ) => {
+    async (content: string, enhance: boolean = false) => {
       if (!content.trim()) return
 
       setIsLoading(true)
@@ -37,44 +39,92 @@ export function useQuality() {
         formData.append('message', content)
         formData.append('conversationId', currentChatId || '')
         formData.append('conversationHistory', JSON.stringify(conversationHistory))
+        // 자동 향상을 켠 경우에만 초안이 끝나면 서버에서 바로 gpt-4o 향상 단계를 이어서 실행
+        formData.append('enhance', enhance ? 'true' : 'false')
 
         const apiUrl = process.env.NEXT_PUBLIC_API_URL 
-        const response = await fetch(`${apiUrl}/quality/gpt35`, {
+        const response = await fetch(`${apiUrl}/quality/pipeline`, {
             method: 'POST',
             body: formData,
         })
 
-        if (!response.ok) {
+        if (!response.ok || !response.body) {
             throw new Error(`HTTP error! status: ${response.status}`)
         }
 
+        const aiMessageId = `assistant_${Date.now()}`
+        let draft = ""
+        let draftDone = false
+
+        const updateDraft = (text: string) => {
+          setMessages((prev) => {
+            const exists = prev.some((msg) => msg.id === aiMessageId)
+            if (!exists) {
+              return [...prev, {
+                id: aiMessageId,
+                role: "assistant",
+                content: text,
+                timestamp: new Date(),
+                chatId: currentChatId || "",
+              }]
+            }
+            return prev.map((msg) => msg.id === aiMessageId ? { ...msg, content: text } : msg)
+          })
+        }
 
-        const data = await response.json()
-        
-        console.log("QNA API Response:", data)
-
-        if (data.response) {
-          const aiMessage: Message = {
-            id: `assistant_${Date.now()}`,
-            role: "assistant",
-            content: data.response,
-            timestamp: new Date(),
-            chatId: data.conversation_id || currentChatId || "",
-          }
-          
-          const aiMessageWithModelInfo = {
-            ...aiMessage,
-            modelInfo: data.model_info ? {
-              provider: data.model_info.provider,
-              model: data.model_info.model
-            } : undefined
+        // NDJSON 이벤트 스트림 처리
+        const reader = response.body.getReader()
+        const decoder = new TextDecoder()
+        let buffer = ""
+
+        while (true) {
+          const { done, value } = await reader.read()
+          if (done) break
+
+          buffer += decoder.decode(value, { stream: true })
+          const lines = buffer.split("\n")
+          buffer = lines.pop() || ""
+
+          for (const line of lines) {
+            if (!line.trim()) continue
+            const event = JSON.parse(line)
+
+            if (event.stage === "draft" && event.type === "token") {
+              draft += event.content
+              updateDraft(draft)
+            } else if (event.stage === "draft" && event.type === "reset") {
+              draft = ""
+            } else if (event.stage === "draft" && event.type === "stage_end") {
+              draft = event.response
+              draftDone = true
+              updateDraft(draft)
+              // 초안이 도착하면 입력을 다시 받을 수 있도록 로딩 해제 (향상 단계는 백그라운드로 계속 수신)
+              setIsLoading(false)
+            } else if (event.stage === "enhance" && event.type === "stage_end") {
+              enhancedAnswers.current[draft] = event.response
+            } else if (event.type === "error") {
+              console.error(`Quality pipeline error (${event.stage}):`, event.detail)
+              if (!draftDone) {
+                // 초안 단계 실패 - 부분/빈 답변 대신 오류를 대화에 표시
+                const detail = typeof event.detail === "string" ? event.detail : JSON.stringify(event.detail)
+                updateDraft(`${draft ? `${draft}\n\n` : ""}⚠️ 답변 생성 중 오류가 발생했습니다: ${detail}`)
+              }
+              // 향상 단계 실패는 캐시하지 않으므로 "답변 향상하기" 버튼이 gpt-4o를 다시 요청한다
+            } else if (event.type === "done") {
+              console.log("Quality pipeline timings:", event.timings)
+              setChatId(event.conversation_id || currentChatId || "")
+            }
           }
-          
-          setMessages((prev) => [...prev, aiMessageWithModelInfo])
-          setChatId(data.conversation_id || currentChatId || "")
         }
       } catch (error) {
         console.error("Failed to send QNA message:", error)
+        setMessages((prev) => [...prev, {
+          id: `assistant_error_${Date.now()}`,
+          role: "assistant",
+          content: `⚠️ 답변 생성 중 오류가 발생했습니다: ${error instanceof Error ? error.message : String(error)}`,
+          timestamp: new Date(),
+          chatId: currentChatId || "",
+        }])
       } finally {
         setIsLoading(false)
       }
@@ -87,6 +137,12 @@ export function useQuality() {
   const sendHighQualityMessage = useCallback(
     async (orgQuestion: string, orgAnswer: string ) => {
 
+      // 파이프라인에서 이미 향상된 답변이 도착했다면 재요청 없이 바로 사용
+      const prefetched = enhancedAnswers.current[orgAnswer]
+      if (prefetched) {
+        return prefetched
+      }
+
       try {
         
         const formData = new FormData()
@@ -123,6 +179,7 @@ export function useQuality() {
 
   const clearQnaChat = useCallback(() => {
     setMessages([])
+    enhancedAnswers.current = {}
     clearChat()
   }, [clearChat])
 
@@ -1,6 +1,6 @@
 "use client"
 
-import { useState, useCallback } from "react"
+import { useState, useCallback, useRef } from "react"
 import type { Message } from "@/types/chat"
 import { useBaseChat } from "./use-base-chat"
 
@@ -9,6 +9,8 @@ export function useRagChat() {
   const [messages, setMessages] = useState<Message[]>([])
   const [uploadedFiles, setUploadedFiles] = useState<File[]>([])
   const [ragKey, setRagKey] = useState<string>("")
+  // 서버 대화의 히스토리 버전 (null이면 아직 동기화 전)
+  const historyVersion = useRef<number | null>(null)
 
   const sendRagMessage = useCallback(
     async (
@@ -44,21 +46,32 @@ export function useRagChat() {
           timestamp: msg.timestamp.toISOString()
         }))
         
-        // FormData를 사용하여 파일과 함께 전송
-        const formData = new FormData()
-        formData.append('message', content)
-        formData.append('useOpenAI', useOpenAI.toString())
-        formData.append('selectedModel', selectedModel)
-        formData.append('conversationId', currentChatId || '')
-        formData.append('conversationHistory', JSON.stringify(conversationHistory))
-        formData.append('ragKey', ragKey)
-
-        // RAG API 엔드포인트로 전송
-        const apiUrl = process.env.NEXT_PUBLIC_API_URL 
-        const response = await fetch(`${apiUrl}/chat/rag`, {
-          method: 'POST',
-          body: formData,
-        })
+        // 전체 히스토리 대신 히스토리 버전과 그 이후 새 메시지만 전송 (버전 0이면 전체 재동기화)
+        const send = (version: number, newMessages: typeof conversationHistory) => {
+          const formData = new FormData()
+          formData.append('message', content)
+          formData.append('useOpenAI', useOpenAI.toString())
+          formData.append('selectedModel', selectedModel)
+          formData.append('conversationId', currentChatId || '')
+          formData.append('historyVersion', version.toString())
+          formData.append('newMessages', JSON.stringify(newMessages))
+          formData.append('ragKey', ragKey)
+
+          // RAG API 엔드포인트로 전송
+          const apiUrl = process.env.NEXT_PUBLIC_API_URL 
+          return fetch(`${apiUrl}/chat/rag`, {
+            method: 'POST',
+            body: formData,
+          })
+        }
+
+        let response = historyVersion.current === null
+          ? await send(0, conversationHistory)
+          : await send(historyVersion.current, [])
+        if (response.status === 409) {
+          // 서버와 버전이 다르면 전체 히스토리로 다시 맞춘다
+          response = await send(0, conversationHistory)
+        }
 
         if (!response.ok) {
           throw new Error(`HTTP error! status: ${response.status}`)
@@ -68,6 +81,10 @@ export function useRagChat() {
         
         console.log("RAG API Response:", data)
 
+        if (typeof data.history_version === "number") {
+          historyVersion.current = data.history_version
+        }
+
         if (data.response) {
           const aiMessage: Message = {
             id: `assistant_${Date.now()}`,
@@ -101,6 +118,7 @@ export function useRagChat() {
 
   const clearRagChat = useCallback(() => {
     setMessages([])
+    historyVersion.current = null
     clearChat()
   }, [clearChat])
 